@@ -0,0 +1,96 @@
+"""
+Block memory footprint and serialization: dict/JSON versus slots objects and the binary codec.
+
+Builds signed blocks, then compares the memory held by blocks as JSON-parsed dicts (how blocks
+and transactions used to be held) with Block/Transaction objects, and the size and speed of
+JSON against codec.encode/decode.
+Run from the repository root:
+    python -m benchmarks.bench_codec --blocks 1000 --transactions 10 --keys 20
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+import codec
+from blockchain import Block
+from key_signature_generator import generate_key_pair, sign_transaction
+from verification import signing_payload
+
+
+def build_blocks(blocks: int, transactions_per_block: int, keys: int):
+    key_pairs = [generate_key_pair() for _ in range(keys)]
+    result, previous_hash = [], "0" * 64
+    for height in range(blocks):
+        transactions = []
+        for i in range(transactions_per_block):
+            private_pem, public_pem = key_pairs[(height * transactions_per_block + i) % keys]
+            tx = {"sender": f"addr-{i}", "receiver": f"addr-{height}", "amount": 1.5, "public_key": public_pem,
+                  "input_utxos": [{"txid": previous_hash, "index": i, "amount": 1.5}],
+                  "output_utxos": [{"txid": "", "index": 0, "amount": 1.5}]}
+            tx["signature"] = sign_transaction(private_pem, signing_payload(tx).decode())
+            transactions.append(tx)
+        block = Block(height, transactions, time.time(), previous_hash)
+        result.append(block)
+        previous_hash = block.hash
+    return result
+
+
+def retained(build):
+    """Bytes still allocated after `build()` returns, i.e. held by its result."""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(label, function, items, total_transactions):
+    started = time.perf_counter()
+    results = [function(item) for item in items]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:>8.3f}s {len(items) / elapsed:>12,.0f} blocks/s "
+          f"{total_transactions / elapsed:>12,.0f} tx/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=10, help="transactions per block")
+    parser.add_argument("--keys", type=int, default=20, help="distinct signing keys")
+    args = parser.parse_args()
+
+    blocks = build_blocks(args.blocks, args.transactions, args.keys)
+    total = args.blocks * args.transactions
+    documents = [json.dumps(block.to_dict()) for block in blocks]
+
+    dicts, dict_bytes = retained(lambda: [json.loads(document) for document in documents])
+    objects, object_bytes = retained(lambda: [Block.from_dict(json.loads(document)) for document in documents])
+    assert [block.to_dict() for block in objects] == dicts
+    print(f"memory, dicts from JSON:      {dict_bytes / total:>8,.0f} bytes/tx ({dict_bytes / 2 ** 20:,.1f} MiB)")
+    print(f"memory, Block/Transaction:    {object_bytes / total:>8,.0f} bytes/tx ({object_bytes / 2 ** 20:,.1f} MiB) "
+          f"{dict_bytes / object_bytes:.1f}x smaller")
+    del dicts
+
+    encoded = [codec.encode(block) for block in blocks]
+    json_size, binary_size = sum(map(len, map(str.encode, documents))), sum(map(len, encoded))
+    print(f"wire size, JSON:              {json_size / total:>8,.0f} bytes/tx")
+    print(f"wire size, binary:            {binary_size / total:>8,.0f} bytes/tx "
+          f"{json_size / binary_size:.1f}x smaller")
+
+    timed("encode, JSON", lambda block: json.dumps(block.to_dict()), objects, total)
+    timed("encode, binary", codec.encode, objects, total)
+    timed("decode, JSON -> Block", lambda document: Block.from_dict(json.loads(document)), documents, total)
+    decoded = timed("decode, binary -> Block", lambda data: Block.from_dict(codec.decode(data, transactions=True)),
+                    encoded, total)
+    assert all(block.hash == original.hash and block.calculate_hash() == block.hash
+               and block.transaction_hashes() == original.transaction_hashes()
+               for block, original in zip(decoded, blocks))
+
+
+if __name__ == "__main__":
+    main()
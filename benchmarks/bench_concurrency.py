@@ -0,0 +1,137 @@
+"""
+Concurrent submitters, miners and readers against one Blockchain; checks nothing is lost.
+
+Every accepted transaction must end up in exactly one block, the resulting chain must
+validate, and reads must keep flowing while blocks are mined.
+Run from the repository root:
+    python -m benchmarks.bench_concurrency --submitters 8 --transactions 200 --miners 2 --readers 4
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from blockchain import Blockchain, StaleBlockError
+from key_signature_generator import generate_key_pair, key_id, sign_transaction
+from merkle import transaction_hash
+from validation import ChainVerifier
+from verification import signing_payload
+
+
+def signed(private_pem: str, public_pem: str, tx):
+    tx = dict(tx, sender=key_id(public_pem), public_key=public_pem)
+    tx["signature"] = sign_transaction(private_pem, signing_payload(tx).decode())
+    return tx
+
+
+def fund(blockchain: Blockchain, keys, count: int):
+    """
+    Mines a block rewarding a funding key, then splits the reward into `count` outputs for each
+    of `keys`, in order. Returns the splitting transaction's txid and the amount of each output.
+    """
+    private_pem, public_pem = generate_key_pair()
+    coinbase = blockchain.mine_block(miner_address=key_id(public_pem)).transactions[0]
+    amount = blockchain.mining_reward / (len(keys) * count + 1)
+    outputs = [{"txid": "", "index": index, "amount": amount, "address": key_id(key[1])}
+               for index, key in enumerate(key for key in keys for _ in range(count))]
+    tx = signed(private_pem, public_pem, {
+        "receiver": key_id(public_pem), "amount": amount * len(outputs),
+        "input_utxos": [{"txid": transaction_hash(coinbase), "index": 0, "amount": blockchain.mining_reward}],
+        "output_utxos": outputs})
+    txid = blockchain.add_transaction(tx)
+    blockchain.mine_block()
+    return txid, amount
+
+
+def make_transactions(key, funding_txid: str, first: int, count: int, amount: float, tag: str):
+    """Transactions spending the key's `count` funding outputs, starting at output `first`."""
+    return [signed(*key, {
+        "receiver": f"{tag}-{i}", "amount": amount,
+        "input_utxos": [{"txid": funding_txid, "index": first + i, "amount": amount}],
+        "output_utxos": [{"txid": "", "index": 0, "amount": amount}]}) for i in range(count)]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submitters", type=int, default=8)
+    parser.add_argument("--transactions", type=int, default=200, help="transactions per submitter")
+    parser.add_argument("--miners", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--difficulty", type=int, default=3)
+    parser.add_argument("--block-size", type=int, default=50, help="max transactions per block")
+    parser.add_argument("--block-interval", type=float, default=0.05, help="target seconds between blocks")
+    args = parser.parse_args()
+
+    blockchain = Blockchain(mining_workers=1, max_block_transactions=args.block_size,
+                            difficulty=args.difficulty, block_interval=args.block_interval)
+    keys = [generate_key_pair() for _ in range(args.submitters)]
+    funding_txid, amount = fund(blockchain, keys, args.transactions)
+    batches = [make_transactions(key, funding_txid, i * args.transactions, args.transactions, amount, f"s{i}")
+               for i, key in enumerate(keys)]
+
+    accepted, accepted_lock = [], threading.Lock()
+    submitting_done = threading.Event()
+    stop = threading.Event()
+    read_latencies = []
+
+    def submitter(batch):
+        for tx in batch:
+            txid = blockchain.add_transaction(tx)
+            with accepted_lock:
+                accepted.append(txid)
+
+    def miner():
+        while not (submitting_done.is_set() and not len(blockchain.mempool)):
+            try:
+                if blockchain.mine_block() is None:
+                    time.sleep(0.001)
+            except StaleBlockError:
+                pass  # Another miner extended the chain first
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            with blockchain.lock.read():
+                length = len(blockchain.chain)
+                blockchain.chain[max(0, length - 10):length]
+            read_latencies.append(time.perf_counter() - started)
+            blockchain.get_balance("s0-0")
+
+    started = time.perf_counter()
+    submitters = [threading.Thread(target=submitter, args=(batch,)) for batch in batches]
+    miners = [threading.Thread(target=miner) for _ in range(args.miners)]
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for thread in submitters + miners + readers:
+        thread.start()
+    for thread in submitters:
+        thread.join()
+    submitting_done.set()
+    for thread in miners:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    mined = Counter(txid for block in blockchain.chain for txid in block.transaction_hashes())
+    lost = [txid for txid in accepted if mined[txid] == 0]
+    duplicated = [txid for txid, count in mined.items() if count > 1]
+    report = ChainVerifier(blockchain.difficulty_adjuster, blockchain.verifier, workers=1).verify(blockchain.chain)
+
+    print(f"accepted transactions: {len(accepted):,}  mined: {sum(mined[txid] for txid in accepted):,}  "
+          f"blocks: {len(blockchain.chain) - 1:,}  elapsed: {elapsed:.2f}s "
+          f"({len(accepted) / elapsed:,.0f} tx/s end to end)")
+    print(f"reads: {len(read_latencies):,}  p50 {percentile(read_latencies, 0.5) * 1e6:.0f} us  "
+          f"p99 {percentile(read_latencies, 0.99) * 1e6:.0f} us  max {max(read_latencies) * 1e3:.1f} ms")
+    print(f"lost: {len(lost)}  duplicated: {len(duplicated)}  chain valid: {report['valid']}")
+    if lost or duplicated or not report["valid"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Header-only access (headers.py) versus reading headers out of full blocks.
+
+Builds a synthetic chain in a temporary BlockStore (unmined and unsigned, as only reads are
+measured), then times serving pages of headers from freshly opened stores, as /headers used to,
+and from the packed HeaderChain. Also reports the memory per header, the cost of loading the
+header file against rebuilding it from the blocks, and how many bytes a light client downloads to
+check one payment (every header plus a Merkle proof) compared with the whole chain.
+Run from the repository root:
+    python -m benchmarks.bench_headers --blocks 20000 --transactions 20
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from blockchain import Block, Blockchain, genesis_block
+from difficulty import MAX_TARGET, DifficultyAdjuster
+from export import Snapshot
+from headers import HeaderChain, check_headers, verify_inclusion
+from key_signature_generator import generate_key_pair
+from storage import BlockStore
+from utxo import UTXOSet
+
+
+def build_store(path: str, blocks: int, transactions_per_block: int) -> BlockStore:
+    _, public_pem = generate_key_pair()
+    store = BlockStore(path, sync_every=1000)
+    store.append(genesis_block(MAX_TARGET))
+    previous_hash = store[0].hash
+    for height in range(1, blocks + 1):
+        transactions = [{
+            "sender": f"addr-{height}", "receiver": f"addr-{height}-{i}", "amount": 1.0,
+            "public_key": public_pem, "signature": f"{height * transactions_per_block + i:x}",
+            "input_utxos": [], "output_utxos": [{"txid": "", "index": 0, "amount": 1.0}],
+        } for i in range(transactions_per_block)]
+        block = Block(height, transactions, time.time(), previous_hash)
+        store.append(block)
+        previous_hash = block.hash
+    store.sync()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=20_000)
+    parser.add_argument("--transactions", type=int, default=20, help="transactions per block")
+    parser.add_argument("--page", type=int, default=2000, help="headers per /headers page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        store = build_store(path, args.blocks, args.transactions)
+        print(f"built {len(store):,} blocks in {time.perf_counter() - started:.1f}s")
+        store.close()
+
+        headers_path = os.path.join(path, "headers.dat")
+        store = BlockStore(path)
+        started = time.perf_counter()
+        header_chain = HeaderChain(store, headers_path)
+        rebuild = time.perf_counter() - started
+        header_chain.close()
+        started = time.perf_counter()
+        header_chain = HeaderChain(store, headers_path)
+        load = time.perf_counter() - started
+        print(f"header file:  rebuild from blocks {rebuild:.2f}s, load {load * 1000:.1f} ms "
+              f"({os.path.getsize(headers_path) / 2 ** 20:,.1f} MiB)")
+
+        pages = range(0, len(store), args.page)
+        store.close()
+        store = BlockStore(path)  # A cold block cache, as after a restart
+        started = time.perf_counter()
+        from_blocks = [[block.header() for block in store[start:start + args.page]] for start in pages]
+        block_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        packed = [header_chain.headers(start, args.page) for start in pages]
+        packed_elapsed = time.perf_counter() - started
+        assert packed == from_blocks
+        print(f"all headers, from blocks:  {block_elapsed * 1000:>10,.1f} ms")
+        print(f"all headers, packed:       {packed_elapsed * 1000:>10,.1f} ms  "
+              f"({block_elapsed / packed_elapsed:,.0f}x faster)")
+
+        headers = [header for page in packed for header in page]
+        gc.collect()
+        tracemalloc.start()
+        as_dicts = json.loads(json.dumps(headers))  # Dicts with their own strings, as decoded blocks hold
+        gc.collect()
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del as_dicts
+        print(f"memory per header: {header_chain.nbytes() / len(header_chain):,.0f} bytes packed, "
+              f"{dict_bytes / len(headers):,.0f} bytes as dicts")
+
+        started = time.perf_counter()
+        # The synthetic blocks are unmined: every hash meets the easiest target, which never changes
+        assert check_headers(headers, DifficultyAdjuster(MAX_TARGET, retarget_interval=0)) is None
+        print(f"light client header check: {(time.perf_counter() - started) * 1000:>10,.1f} ms")
+
+        # An empty UTXO set at the tip: the synthetic transactions spend nothing and need not be replayed
+        blockchain = Blockchain(store=store, snapshot=Snapshot(len(store) - 1, store[-1].hash, UTXOSet()))
+        txid = store[len(store) // 2].transaction_hashes()[0]
+        proof = blockchain.get_transaction_proof(txid)
+        assert verify_inclusion(proof, headers[proof["block_index"]])
+        spv_bytes = sum(len(json.dumps({"headers": page}).encode()) for page in packed) + len(json.dumps(proof))
+        chain_bytes = sum(len(json.dumps(block.to_dict()).encode()) for block in store)
+        print(f"payment check downloads: {spv_bytes / 1024:,.0f} KiB of headers and proof, "
+              f"{chain_bytes / 1024:,.0f} KiB for the whole chain ({chain_bytes / spv_bytes:,.0f}x)")
+        blockchain.headers.close()
+        header_chain.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Transaction and address lookups: linear chain scans versus the incremental indexes (index.py).
+
+Builds a large synthetic chain directly (unmined and unsigned, as only lookups are measured),
+then times finding transactions by hash and fetching a page of an address's history both by
+scanning every block, as /proof used to, and through Blockchain's indexes. Also reports the
+cost of building the indexes and the memory they hold.
+Run from the repository root:
+    python -m benchmarks.bench_index --blocks 10000 --transactions 20 --addresses 5000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from blockchain import Block, Blockchain
+from index import ChainIndex, transaction_addresses
+from key_signature_generator import generate_key_pair
+
+
+def build_chain(blocks: int, transactions_per_block: int, addresses: int) -> Blockchain:
+    _, public_pem = generate_key_pair()
+    blockchain = Blockchain()
+    previous_hash = blockchain.chain[0].hash
+    for height in range(1, blocks + 1):
+        transactions = []
+        for i in range(transactions_per_block):
+            n = height * transactions_per_block + i
+            transactions.append({
+                "sender": f"addr-{n % addresses}", "receiver": f"addr-{n * 7919 % addresses}", "amount": 1.0,
+                "public_key": public_pem, "signature": f"{n:x}", "input_utxos": [],
+                "output_utxos": [{"txid": "", "index": 0, "amount": 1.0}],
+            })
+        block = Block(height, transactions, time.time(), previous_hash)
+        # Appended without validation or UTXO updates: lookups only need the blocks and headers
+        blockchain.chain.append(block)
+        blockchain.headers.append(block)
+        previous_hash = block.hash
+    return blockchain
+
+
+def scan_transaction(chain, txid: str):
+    for block in reversed(chain):
+        tx_hashes = block.transaction_hashes()
+        if txid in tx_hashes:
+            return block.index, tx_hashes.index(txid)
+    return None
+
+
+def scan_history(chain, address: str, limit: int):
+    history = []
+    for block in reversed(chain):
+        for position in range(len(block.transactions) - 1, -1, -1):
+            if address in transaction_addresses(block.transactions[position]):
+                history.append((block.index, position))
+    return history[:limit], len(history)
+
+
+def timed(label: str, function, items, unit: str = "lookups"):
+    started = time.perf_counter()
+    results = [function(item) for item in items]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed / len(items) * 1e6:>12,.1f} us/lookup {len(items) / elapsed:>12,.0f} {unit}/s")
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=20, help="transactions per block")
+    parser.add_argument("--addresses", type=int, default=5000, help="distinct addresses")
+    parser.add_argument("--lookups", type=int, default=10_000, help="indexed lookups to time")
+    parser.add_argument("--scans", type=int, default=20, help="linear scans to time")
+    parser.add_argument("--page", type=int, default=100, help="history page size")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    blockchain = build_chain(args.blocks, args.transactions, args.addresses)
+    chain = blockchain.chain
+    total = args.blocks * args.transactions
+    print(f"built {args.blocks:,} blocks, {total:,} transactions in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    ChainIndex().rebuild(chain)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    index = ChainIndex()
+    index.rebuild(chain)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"index build:                     {elapsed:>8.2f}s {total / elapsed:>12,.0f} tx/s "
+          f"{size / total:>6,.0f} bytes/tx ({size / 2 ** 20:,.1f} MiB)")
+    del index
+
+    rng = random.Random(1)
+    txids = [chain[rng.randrange(1, len(chain))].transaction_hashes()[rng.randrange(args.transactions)]
+             for _ in range(args.lookups)]
+    addresses = [f"addr-{rng.randrange(args.addresses)}" for _ in range(args.lookups)]
+    blockchain.get_transaction(txids[0])  # Builds the index outside the timings
+
+    scanned, scan_elapsed = timed("tx by hash, linear scan", lambda txid: scan_transaction(chain, txid),
+                                  txids[:args.scans])
+    found, index_elapsed = timed("tx by hash, index", blockchain.get_transaction, txids)
+    assert all(result == (found[i]["block_index"], found[i]["position"]) for i, result in enumerate(scanned))
+    print(f"{'speedup':<32} {scan_elapsed / args.scans / (index_elapsed / args.lookups):>12,.0f}x")
+
+    scanned, scan_elapsed = timed("address history, linear scan",
+                                  lambda address: scan_history(chain, address, args.page), addresses[:args.scans])
+    pages, index_elapsed = timed("address history, index",
+                                 lambda address: blockchain.get_address_history(address, limit=args.page), addresses)
+    assert all((page, count) == ([(tx["block_index"], tx["position"]) for tx in pages[i]["transactions"]],
+                                 pages[i]["total"]) for i, (page, count) in enumerate(scanned))
+    print(f"{'speedup':<32} {scan_elapsed / args.scans / (index_elapsed / args.lookups):>12,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
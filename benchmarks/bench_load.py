@@ -0,0 +1,291 @@
+"""
+Async HTTP load generator for the API, reporting latency percentiles and throughput as JSON.
+
+Funds a set of keys (a block reward mined to one key, split into one output per transaction),
+pre-signs transactions spending those outputs across all cores
+(key_signature_generator.sign_transactions), then runs one phase per endpoint at the configured
+concurrency:
+  new_transaction  POST /new_transaction for every pre-signed transaction
+  mine_block       POST /mine_block, then polls the job until the block is mined
+  chain            GET /chain (one page of --chain-limit blocks, or the whole chain with 0)
+  mixed            all three at once: submitters and readers while blocks are mined
+Each phase reports p50/p90/p99/max latency in milliseconds, requests/s and errors by status.
+The JSON report goes to stdout (or --output); --baseline compares it against an earlier report
+and exits with status 1 if a p99 or throughput regressed by more than --tolerance.
+
+Needs httpx. Runs against a live node, or with --in-process against main.app in a throwaway
+data directory (client and server then share one core, so absolute numbers are lower).
+Run from the repository root:
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000 --transactions 5000 --concurrency 32
+    python -m benchmarks.bench_load --in-process --phases new_transaction chain --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from key_signature_generator import generate_key_pair, generate_key_pairs, key_id, sign_transaction, sign_transactions
+from merkle import transaction_hash
+from verification import signing_payload
+
+try:
+    import httpx
+except ImportError:  # Only this benchmark needs it
+    httpx = None
+
+PHASES = ("new_transaction", "mine_block", "chain", "mixed")
+
+
+def funding_transaction(coinbase, miner_key, key_pairs, count: int):
+    """
+    Splits a coinbase paid to `miner_key` into `count` outputs, output i belonging to key
+    i % len(key_pairs). Returns the signed transaction and each output's amount.
+    """
+    private_pem, public_pem = miner_key
+    reward = coinbase["output_utxos"][0]["amount"]
+    amount = reward / (count + 1)
+    tx = {"sender": key_id(public_pem), "receiver": key_id(public_pem), "amount": amount * count,
+          "public_key": public_pem,
+          "input_utxos": [{"txid": transaction_hash(coinbase), "index": 0, "amount": reward}],
+          "output_utxos": [{"txid": "", "index": i, "amount": amount, "address": key_id(key_pairs[i % len(key_pairs)][1])}
+                           for i in range(count)]}
+    tx["signature"] = sign_transaction(private_pem, signing_payload(tx).decode())
+    return tx, amount
+
+
+def presign(key_pairs, funding_txid: str, amount: float, count: int):
+    """One transaction per funding output, each signed by the key that owns it."""
+    signing = []
+    for i in range(count):
+        private_pem, public_pem = key_pairs[i % len(key_pairs)]
+        tx = {"sender": key_id(public_pem), "receiver": f"load-{i}", "amount": amount,
+              "input_utxos": [{"txid": funding_txid, "index": i, "amount": amount}],
+              "output_utxos": [{"txid": "", "index": 0, "amount": amount}]}
+        signing.append((private_pem, public_pem, tx))
+    return sign_transactions(signing)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+class PhaseStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+
+    def report(self, elapsed: float):
+        latencies = self.latencies
+        return {
+            "requests": len(latencies) + sum(self.errors.values()),
+            "ok": len(latencies),
+            "errors": dict(self.errors),
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        }
+
+
+async def timed_request(stats: PhaseStats, request, expected: int):
+    started = time.perf_counter()
+    try:
+        response = await request()
+    except httpx.HTTPError as e:
+        stats.errors[type(e).__name__] += 1
+        return None
+    if response.status_code != expected:
+        stats.errors[str(response.status_code)] += 1
+        return None
+    stats.latencies.append(time.perf_counter() - started)
+    return response
+
+
+async def run_workers(concurrency: int, items, handle):
+    """Runs `handle(item)` for every item with at most `concurrency` in flight."""
+    items = iter(items)
+
+    async def worker():
+        for item in items:  # Shared iterator: each item is taken by exactly one worker
+            await handle(item)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+class LoadGenerator:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+
+    async def submit(self, transactions, stats: PhaseStats):
+        await run_workers(self.args.concurrency, transactions, lambda tx: timed_request(
+            stats, lambda: self.client.post("/new_transaction", json=tx), 200))
+
+    async def wait_for_job(self, job_id: str):
+        while True:
+            job = (await self.client.get(f"/mine_block/{job_id}")).json()
+            if job["status"] in ("done", "failed"):
+                return job
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def mine_now(self, params=None):
+        """Mines one block outside the measured phases and returns it."""
+        response = await self.client.post("/mine_block", params=params)
+        response.raise_for_status()
+        job = await self.wait_for_job(response.json()["job_id"])
+        if job["status"] != "done":
+            raise RuntimeError(f"Mining failed: {job['error']}")
+        return job["block"]
+
+    async def fund(self, key_pairs, count: int):
+        """Pre-signs `count` transactions, spending outputs funded by a block mined for the purpose."""
+        started = time.perf_counter()
+        miner_key = generate_key_pair()
+        block = await self.mine_now({"miner_address": key_id(miner_key[1])})
+        funding, amount = funding_transaction(block["transactions"][0], miner_key, key_pairs, count)
+        response = await self.client.post("/new_transaction", json=funding)
+        response.raise_for_status()
+        await self.mine_now()
+        transactions = presign(key_pairs, response.json()["txid"], amount, count)
+        print(f"funded and pre-signed {len(transactions):,} transactions in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+        return transactions
+
+    async def mine(self, count: int, stats: PhaseStats, job_stats: PhaseStats):
+        async def mine_one(_):
+            started = time.perf_counter()
+            response = await timed_request(stats, lambda: self.client.post("/mine_block"), 202)
+            if response is None:
+                return
+            job = await self.wait_for_job(response.json()["job_id"])
+            if job["status"] == "done":
+                job_stats.latencies.append(time.perf_counter() - started)
+            else:
+                job_stats.errors[job["error"] or "failed"] += 1
+
+        await run_workers(min(self.args.concurrency, count), range(count), mine_one)
+
+    async def read_chain(self, count: int, stats: PhaseStats):
+        params = {"limit": self.args.chain_limit} if self.args.chain_limit else {}
+        await run_workers(self.args.concurrency, range(count), lambda _: timed_request(
+            stats, lambda: self.client.get("/chain", params=params), 200))
+
+    async def phase(self, name: str, transactions):
+        args = self.args
+        stats = {name: PhaseStats()}
+        started = time.perf_counter()
+        if name == "new_transaction":
+            await self.submit(transactions, stats[name])
+        elif name == "mine_block":
+            stats["mine_block_job"] = PhaseStats()
+            await self.mine(args.blocks, stats["mine_block"], stats["mine_block_job"])
+        elif name == "chain":
+            await self.read_chain(args.reads, stats[name])
+        else:
+            stats = {"new_transaction": PhaseStats(), "mine_block": PhaseStats(),
+                     "mine_block_job": PhaseStats(), "chain": PhaseStats()}
+            await asyncio.gather(self.submit(transactions, stats["new_transaction"]),
+                                 self.mine(args.blocks, stats["mine_block"], stats["mine_block_job"]),
+                                 self.read_chain(args.reads, stats["chain"]))
+        elapsed = time.perf_counter() - started
+        return {"elapsed": round(elapsed, 3), "endpoints": {key: s.report(elapsed) for key, s in stats.items()}}
+
+
+def compare(report, baseline, tolerance: float):
+    """Lines describing p99 and throughput regressions beyond `tolerance` (a fraction)."""
+    regressions = []
+    for phase, result in report["phases"].items():
+        for endpoint, stats in result["endpoints"].items():
+            before = baseline.get("phases", {}).get(phase, {}).get("endpoints", {}).get(endpoint)
+            if not before or not stats["ok"] or not before["ok"]:
+                continue
+            if stats["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{phase}/{endpoint}: p99 {before['p99_ms']} -> {stats['p99_ms']} ms")
+            if stats["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{phase}/{endpoint}: throughput "
+                                   f"{before['throughput_rps']} -> {stats['throughput_rps']} req/s")
+    return regressions
+
+
+async def run(args, key_pairs):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.in_process:
+        import main  # Imported here: BLOCKCHAIN_DATA_DIR must be set first
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load-test",
+                                   timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+    async with client:
+        generator = LoadGenerator(client, args)
+        submitting = sum(name in ("new_transaction", "mixed") for name in args.phases)
+        remaining = await generator.fund(key_pairs, args.transactions * submitting) if submitting else []
+        phases = {}
+        for name in args.phases:
+            # Each phase that submits gets its own share of the pre-signed transactions
+            share = remaining[:args.transactions] if name in ("new_transaction", "mixed") else []
+            remaining = remaining[len(share):]
+            phases[name] = await generator.phase(name, share)
+            print(f"{name}: {json.dumps(phases[name]['endpoints'])}", file=sys.stderr)
+    if args.in_process:
+        main.block_store.close()
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app directly, in a temporary data dir")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES))
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per endpoint")
+    parser.add_argument("--transactions", type=int, default=2000, help="transactions per submitting phase")
+    parser.add_argument("--keys", type=int, default=64, help="keys the submitted transactions are spread over")
+    parser.add_argument("--blocks", type=int, default=5, help="blocks mined per mining phase")
+    parser.add_argument("--reads", type=int, default=500, help="/chain requests per reading phase")
+    parser.add_argument("--chain-limit", type=int, default=100, help="blocks per /chain page; 0 for the whole chain")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="seconds between mining job polls")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+    if httpx is None:
+        sys.exit("bench_load needs httpx: pip install httpx")
+
+    key_pairs = generate_key_pairs(args.keys)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        if args.in_process:
+            os.environ["BLOCKCHAIN_DATA_DIR"] = data_dir
+        phases = asyncio.run(run(args, key_pairs))
+
+    report = {
+        "benchmark": "load",
+        "timestamp": time.time(),
+        "target": "in-process" if args.in_process else args.url,
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "phases": phases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
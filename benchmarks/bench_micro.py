@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks of the core engine, for regression tracking.
+
+Times Block.calculate_hash, Block.mine_block, transaction hashing, signing, signature
+verification (cold, cached and batched) and chain serialization (JSON and binary). Each case reports the
+median time per operation over several repeats; --json prints the results as one JSON document
+that can be stored and compared between commits.
+Run from the repository root:
+    python -m benchmarks.bench_micro --json > micro.json
+    python -m benchmarks.bench_micro --only verify serialize
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+
+import codec
+from blockchain import Block
+from difficulty import target_from_zeros
+from key_signature_generator import generate_key_pairs, sign_transaction, sign_transactions
+from merkle import transaction_hash
+from verification import SignatureVerifier, signing_payload
+
+
+# Proof-of-work varies a lot from block to block, so mine_block averages over several blocks once
+MINED_BLOCKS = 10
+
+
+def make_signing(count: int, keys: int):
+    """(private_pem, public_pem, unsigned transaction) tuples for sign_transactions."""
+    key_pairs = generate_key_pairs(keys)
+    signing = []
+    for i in range(count):
+        private_pem, public_pem = key_pairs[i % keys]
+        tx = {"sender": f"addr-{i % keys}", "receiver": f"addr-{i}", "amount": 1.0,
+              "input_utxos": [], "output_utxos": [{"txid": "", "index": 0, "amount": 1.0}]}
+        signing.append((private_pem, public_pem, tx))
+    return signing
+
+
+def measure(function, operations: int, repeat: int):
+    """Median seconds per operation of `function`, which performs `operations` operations per call."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) / operations)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=500, help="signed transactions to work with")
+    parser.add_argument("--block-size", type=int, default=100, help="transactions per block")
+    parser.add_argument("--blocks", type=int, default=200, help="blocks in the serialized chain")
+    parser.add_argument("--difficulty", type=int, default=3, help="leading hex zeros for mine_block")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="run only the cases whose names start with these")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    signing = make_signing(args.transactions, keys=20)
+    transactions = sign_transactions(signing, workers=1)
+    payloads = [(private_pem, signing_payload(tx)) for (private_pem, _, _), tx in zip(signing, transactions)]
+    block = Block(1, transactions[:args.block_size], time.time(), "0" * 64, target_from_zeros(args.difficulty))
+    chain = [Block(height, transactions[height * args.block_size % args.transactions:][:args.block_size],
+                   time.time(), "0" * 64) for height in range(args.blocks)]
+    raw = [dict(tx) for tx in transactions]
+
+    def mine():
+        for _ in range(MINED_BLOCKS):
+            block.nonce = 0
+            block.timestamp += 1  # A fresh search each time
+            block.hash = block.calculate_hash()
+            block.mine_block(workers=1)
+
+    def verify_cold():
+        verifier = SignatureVerifier()
+        for tx in raw:
+            verifier.verify(tx)
+
+    warm = SignatureVerifier()
+    warm.verify_batch(raw, workers=1)
+
+    cases = {
+        # name: (function, operations per call, unit)
+        "calculate_hash": (lambda: [block.calculate_hash() for _ in range(10_000)], 10_000, "hash"),
+        "transaction_hash": (lambda: [transaction_hash(tx) for tx in raw], len(raw), "transaction"),
+        "mine_block": (mine, MINED_BLOCKS, "block"),
+        "sign": (lambda: [sign_transaction(pem, payload) for pem, payload in payloads], len(payloads), "transaction"),
+        "verify_cold": (verify_cold, len(raw), "transaction"),
+        "verify_cached": (lambda: [warm.verify(tx) for tx in raw], len(raw), "transaction"),
+        "verify_batch": (lambda: SignatureVerifier().verify_batch(raw), len(raw), "transaction"),
+        "serialize_chain_json": (lambda: json.dumps([b.to_dict() for b in chain]), len(chain), "block"),
+        "serialize_chain_binary": (lambda: codec.encode(chain), len(chain), "block"),
+        "deserialize_chain_json": (
+            lambda data=json.dumps([b.to_dict() for b in chain]): [Block.from_dict(b) for b in json.loads(data)],
+            len(chain), "block"),
+    }
+
+    results = {}
+    for name, (function, operations, unit) in cases.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        repeat = 1 if name == "mine_block" else args.repeat
+        median, best = measure(function, operations, repeat)
+        results[name] = {"unit": unit, "median_us": round(median * 1e6, 3), "best_us": round(best * 1e6, 3),
+                         "ops_per_sec": round(1 / median, 1)}
+        if not args.json:
+            print(f"{name:<26} {median * 1e6:>12,.1f} us/{unit:<12} {1 / median:>12,.1f} ops/s")
+
+    if args.json:
+        print(json.dumps({
+            "benchmark": "micro",
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "parameters": vars(args),
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
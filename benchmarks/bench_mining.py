@@ -0,0 +1,46 @@
+"""
+Proof-of-work throughput by worker count.
+
+Run from the repository root:
+    python -m benchmarks.bench_mining --difficulties 4 5 6 --rounds 3
+"""
+import argparse
+import os
+import time
+
+from difficulty import target_from_zeros
+from mining import find_nonce
+
+
+def bench(difficulty: int, workers: int, rounds: int) -> float:
+    """Returns hashes/sec over `rounds` searches with distinct header prefixes."""
+    attempts = 0
+    started = time.perf_counter()
+    for round_no in range(rounds):
+        prefix = f"bench-{difficulty}-{workers}-{round_no}-{time.time()}".encode()
+        attempts += find_nonce(prefix, target_from_zeros(difficulty), workers=workers).attempts
+    return attempts / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--difficulties", type=int, nargs="+", default=[4, 5, 6])
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="worker counts to compare (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    print(f"{'difficulty':>10} {'workers':>8} {'hashes/sec':>14} {'speedup':>8}")
+    for difficulty in args.difficulties:
+        baseline = None
+        for workers in worker_counts:
+            rate = bench(difficulty, workers, args.rounds)
+            baseline = baseline or rate
+            print(f"{difficulty:>10} {workers:>8} {rate:>14,.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
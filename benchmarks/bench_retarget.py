@@ -0,0 +1,49 @@
+"""
+Difficulty retargeting: how quickly block times converge on the configured interval.
+
+Mines blocks one after another on a single core, starting from a deliberately wrong
+difficulty, and prints the observed interval and difficulty for each retarget window.
+Run from the repository root:
+    python -m benchmarks.bench_retarget --blocks 120 --block-interval 0.2 --difficulty 2
+"""
+import argparse
+import json
+import time
+
+from blockchain import Blockchain
+from key_signature_generator import generate_key_pair, key_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=120)
+    parser.add_argument("--block-interval", type=float, default=0.2, help="target seconds between blocks")
+    parser.add_argument("--retarget-interval", type=int, default=10, help="blocks between retargets")
+    parser.add_argument("--difficulty", type=int, default=2, help="initial leading hex zeros")
+    args = parser.parse_args()
+
+    blockchain = Blockchain(mining_workers=1, difficulty=args.difficulty, block_interval=args.block_interval,
+                            retarget_interval=args.retarget_interval)
+    miner = key_id(generate_key_pair()[1])
+    window = args.retarget_interval
+
+    print(f"{'height':>7} {'difficulty':>12} {'interval':>9} {'hashes/sec':>12}")
+    started = time.perf_counter()
+    for height in range(1, args.blocks + 1):
+        blockchain.mine_block(miner_address=miner)  # Just the coinbase
+        if height % window == 0:
+            chain = blockchain.chain
+            first = max(1, height - window)  # The genesis timestamp is fixed, not mined
+            interval = (chain[height].timestamp - chain[first].timestamp) / max(1, height - first)
+            stats = blockchain.mining_stats.summary(recent=0)
+            print(f"{height:>7} {chain[height].work():>12,} {interval:>8.3f}s {stats['hash_rate']:>12,.0f}")
+    elapsed = time.perf_counter() - started
+
+    stats = blockchain.get_mining_stats()
+    stats["mining"].pop("recent")
+    print(f"mined {args.blocks} blocks in {elapsed:.1f}s (target {args.block_interval}s/block)")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
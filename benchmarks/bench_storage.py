@@ -0,0 +1,71 @@
+"""
+Block store append throughput and cold start time.
+
+Run from the repository root:
+    python -m benchmarks.bench_storage --blocks 100000 --sync-every 1 100 1000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from blockchain import Block
+from storage import BlockStore
+
+
+def make_block(height: int, transactions_per_block: int) -> Block:
+    transactions = [{"sender": f"s{height}", "receiver": f"r{i}", "amount": float(i)}
+                    for i in range(transactions_per_block)]
+    return Block(height, transactions, time.time(), "0" * 64)
+
+
+def bench_append(path: str, blocks, sync_every: int) -> float:
+    store = BlockStore(path, sync_every=sync_every, sync_interval=float("inf"))
+    started = time.perf_counter()
+    for block in blocks:
+        store.append(block)
+    store.close()
+    return len(blocks) / (time.perf_counter() - started)
+
+
+def bench_cold_start(path: str):
+    started = time.perf_counter()
+    store = BlockStore(path)
+    opened = time.perf_counter() - started
+    tip = store[-1]
+    tip_read = time.perf_counter() - started - opened
+    started = time.perf_counter()
+    count = sum(1 for _ in store)
+    scan = time.perf_counter() - started
+    store.close()
+    return opened, tip_read, tip.index, count, scan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=2, help="transactions per block")
+    parser.add_argument("--sync-every", type=int, nargs="+", default=[1, 100, 1000])
+    args = parser.parse_args()
+
+    blocks = [make_block(height, args.transactions) for height in range(args.blocks)]
+    directory = tempfile.mkdtemp(prefix="bench_storage_")
+    try:
+        for sync_every in args.sync_every:
+            path = f"{directory}/sync_{sync_every}"
+            # fsync-per-block is slow enough that a tenth of the blocks gives a stable rate
+            sample = blocks if sync_every > 1 else blocks[:max(1, len(blocks) // 10)]
+            rate = bench_append(path, sample, sync_every)
+            print(f"append, fsync every {sync_every:>5} blocks: {rate:>12,.0f} blocks/s ({len(sample):,} blocks)")
+
+        path = f"{directory}/sync_{max(args.sync_every)}"
+        opened, tip_read, tip_index, count, scan = bench_cold_start(path)
+        print(f"cold start (open + index load):  {opened * 1000:>9.2f} ms for {count:,} blocks")
+        print(f"first tip read (block {tip_index}):   {tip_read * 1000:>9.3f} ms")
+        print(f"full sequential scan:            {scan * 1000:>9.2f} ms ({count / scan:,.0f} blocks/s)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Full-chain validation speed, with and without checkpoints.
+
+Builds a synthetic chain at a low, fixed difficulty (so it can be mined quickly), then validates it.
+Run from the repository root:
+    python -m benchmarks.bench_validation --blocks 50000 --transactions 1
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from blockchain import Block
+from difficulty import DifficultyAdjuster, target_from_zeros
+from key_signature_generator import generate_key_pair, sign_transaction
+from validation import ChainVerifier
+from verification import signing_payload
+
+
+def build_chain(blocks: int, transactions_per_block: int, target: int):
+    private_pem, public_pem = generate_key_pair()
+    chain = [Block(0, [], time.time(), "0", target)]
+    for height in range(1, blocks):
+        transactions = []
+        for i in range(transactions_per_block):
+            tx = {"sender": "alice", "receiver": f"bob-{height}", "amount": float(i), "public_key": public_pem,
+                  "input_utxos": [], "output_utxos": [{"txid": "", "index": 0, "amount": float(i)}]}
+            tx["signature"] = sign_transaction(private_pem, signing_payload(tx).decode())
+            transactions.append(tx)
+        block = Block(height, transactions, time.time(), chain[-1].hash, target)
+        block.mine_block(workers=1)
+        chain.append(block)
+    return chain
+
+
+def report(label, result):
+    assert result["valid"], result["error"]
+    print(f"{label:<36} {result['blocks']:>7,} blocks {result['elapsed']:>8.2f}s "
+          f"{result['blocks_per_sec']:>12,.0f} blocks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=50_000)
+    parser.add_argument("--transactions", type=int, default=1, help="signed transactions per block")
+    parser.add_argument("--difficulty", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    target = target_from_zeros(args.difficulty)
+    # Blocks are mined far faster than any sensible interval, so retargeting is off
+    difficulty = DifficultyAdjuster(target, retarget_interval=0)
+    chain = build_chain(args.blocks, args.transactions, target)
+    print(f"built {len(chain):,} blocks in {time.perf_counter() - started:.1f}s")
+
+    for workers in sorted(set(args.workers)):
+        report(f"headers + PoW only, {workers} worker(s)",
+               ChainVerifier(difficulty, workers=workers).verify(chain, check_signatures=False,
+                                                                      record_checkpoint=False))
+        report(f"full (with signatures), {workers} worker(s)",
+               ChainVerifier(difficulty, workers=workers).verify(chain, record_checkpoint=False))
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_path = os.path.join(directory, "checkpoints.json")
+        ChainVerifier(difficulty, checkpoint_path=checkpoint_path).verify(chain)
+        tail = [Block(len(chain), [], time.time(), chain[-1].hash, target)]
+        tail[0].mine_block(workers=1)
+        report("revalidation after checkpoint (+1)",
+               ChainVerifier(difficulty, checkpoint_path=checkpoint_path).verify(chain + tail))
+
+
+if __name__ == "__main__":
+    main()
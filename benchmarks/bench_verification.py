@@ -0,0 +1,65 @@
+"""
+Signature verification throughput: uncached vs cached vs batched.
+
+Run from the repository root:
+    python -m benchmarks.bench_verification --transactions 10000 --senders 100
+"""
+import argparse
+import time
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives import serialization, hashes
+
+from key_signature_generator import generate_key_pair, sign_transaction
+from verification import SignatureVerifier, signing_payload
+
+
+def make_transactions(count: int, senders: int):
+    keys = [generate_key_pair() for _ in range(senders)]
+    transactions = []
+    for i in range(count):
+        private_pem, public_pem = keys[i % senders]
+        tx = {"sender": f"sender-{i % senders}", "receiver": f"receiver-{i}", "amount": float(i),
+              "public_key": public_pem, "input_utxos": [], "output_utxos": []}
+        tx["signature"] = sign_transaction(private_pem, signing_payload(tx).decode())
+        transactions.append(tx)
+    return transactions
+
+
+def verify_uncached(tx):
+    """The pre-cache path: parse the PEM and verify every time."""
+    key = serialization.load_pem_public_key(tx["public_key"].encode())
+    key.verify(bytes.fromhex(tx["signature"]), signing_payload(tx), ec.ECDSA(hashes.SHA256()))
+    return True
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - started
+    assert all(results), f"{label}: some signatures failed"
+    print(f"{label:<32} {elapsed:>8.3f}s {count / elapsed:>12,.0f} tx/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.transactions, args.senders)
+    n = len(transactions)
+
+    timed("uncached, serial", n, lambda: [verify_uncached(tx) for tx in transactions])
+    verifier = SignatureVerifier()
+    timed("key cache, serial", n, lambda: [verifier.verify(tx) for tx in transactions])
+    timed("result cache hit (re-verify)", n, lambda: [verifier.verify(tx) for tx in transactions])
+    timed("batch, thread pool", n,
+          lambda: SignatureVerifier().verify_batch(transactions, workers=args.workers))
+    timed("batch, process pool", n,
+          lambda: SignatureVerifier().verify_batch(transactions, workers=args.workers, use_processes=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,632 @@
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature, decode_dss_signature
-from cryptography.exceptions import InvalidSignature
 from hashlib import sha256
+import json
 import time
 import requests
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
+from mining import find_nonce, MiningResult, MiningStats
+from difficulty import (DifficultyAdjuster, MAX_TARGET, check_timestamp, format_target, meets_target,
+                        median_time_past, target_from_zeros, target_work)
+from merkle import merkle_root, merkle_proof, transaction_hash
+from verification import SignatureVerifier
+from utxo import (BLOCK_REWARD, UTXOSet, BlockUndo, UTXOEntry, OutPoint, block_undo, coinbase_transaction,
+                  is_coinbase, transaction_outputs)
+from mempool import Mempool
+from locking import RWLock
+from index import ChainIndex
+from headers import HeaderChain
+from metrics import BLOCKS_ADDED, BLOCKS_MINED, HASHES, TRANSACTIONS_VERIFIED, timed
+from transaction import compact_transaction
+
+
+GENESIS_TIMESTAMP = 1704067200.0  # 2024-01-01T00:00:00Z
+
+
+class StaleBlockError(Exception):
+    """A block was mined on a tip that another block replaced meanwhile; it was discarded."""
+    pass
 
 
 class Block:
-    def __init__(self, index: int, transactions: List[Dict[str, Any]], timestamp: float, previous_hash: str):
+    __slots__ = ("index", "transactions", "timestamp", "previous_hash", "target", "merkle_root", "nonce", "hash")
+
+    def __init__(self, index: int, transactions: List[Dict[str, Any]], timestamp: float, previous_hash: str,
+                 target: int = MAX_TARGET):
         self.index = index
-        self.transactions = transactions
+        # Held as compact transaction.Transaction objects; they still read like dicts
+        self.transactions = [compact_transaction(tx) for tx in transactions]
         self.timestamp = timestamp
         self.previous_hash = previous_hash
+        # Proof-of-work target, part of the header so each block's work can be checked on its own
+        self.target = format_target(target)
+        self.merkle_root = merkle_root(self.transaction_hashes())
         self.nonce = 0
         self.hash = self.calculate_hash()
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Block":
+        """
+        Restores a stored block as-is, without recomputing its Merkle root or hash. Unknown keys
+        are ignored; a header without transactions gives a block without them.
+        """
+        block = cls.__new__(cls)
+        for name in cls.__slots__:
+            if name in data:
+                setattr(block, name, data[name])
+        if "transactions" in data:
+            block.transactions = [compact_transaction(tx) for tx in data["transactions"]]
+        return block
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The block's JSON form, with transactions as plain dicts."""
+        return {name: [dict(tx) for tx in self.transactions] if name == "transactions" else getattr(self, name)
+                for name in self.__slots__ if hasattr(self, name)}
+
+    def transaction_hashes(self) -> List[str]:
+        return [transaction_hash(tx) for tx in self.transactions]
+
+    def header(self) -> Dict[str, Any]:
+        """Every field except the transactions, which the header commits to via the Merkle root."""
+        return {name: getattr(self, name) for name in self.__slots__ if name != "transactions" and hasattr(self, name)}
+
+    def header_prefix(self) -> bytes:
+        """
+        Everything that is hashed before the nonce; constant for the whole proof-of-work search.
+        Transactions are committed through the Merkle root, so the header has a fixed size.
+        """
+        return f"{self.index}{self.merkle_root}{self.timestamp}{self.previous_hash}{self.target}".encode()
+
     def calculate_hash(self) -> str:
-        block_string = f"{self.index}{self.transactions}{self.timestamp}{self.previous_hash}{self.nonce}"
-        return sha256(block_string.encode()).hexdigest()
+        return sha256(self.header_prefix() + str(self.nonce).encode()).hexdigest()
+
+    def meets_target(self) -> bool:
+        return meets_target(self.hash, int(self.target, 16))
+
+    def work(self) -> int:
+        """Expected number of hashes it took to mine this block."""
+        return target_work(int(self.target, 16))
+
+    def mine_block(self, workers: Optional[int] = None,
+                   progress: Optional[Callable[[int], None]] = None) -> MiningResult:
+        """Searches for a nonce meeting the block's target across `workers` processes."""
+        if self.meets_target():
+            return MiningResult(self.nonce, self.hash, 0)
+        result = find_nonce(self.header_prefix(), int(self.target, 16), workers=workers,
+                            start_nonce=self.nonce, progress=progress)
+        self.nonce = result.nonce
+        self.hash = result.hash
+        return result
+
 
-    def mine_block(self, difficulty: int):
-        target = "0" * difficulty
-        while not self.hash.startswith(target):
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+def genesis_block(initial_target: int) -> Block:
+    """The genesis block of every chain whose proof-of-work starts at `initial_target`."""
+    return Block(0, [], GENESIS_TIMESTAMP, "0", initial_target)
+
+
+def listed_transactions(blocks_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Every transaction in blocks received from outside, to verify them up front. A `transactions`
+    value that is not a list is skipped here; validating its block rejects it as malformed.
+    """
+    return [tx for data in blocks_data if isinstance(data.get("transactions"), list) for tx in data["transactions"]]
 
 
 class Blockchain:
-    def __init__(self):
-        # Initialize the blockchain with genesis block and difficulty for mining
-        self.chain: List[Block] = [self.create_genesis_block()]
-        self.difficulty = 4
-        self.pending_transactions: List[Dict[str, Any]] = []
+    # How many recent blocks keep UTXO undo data; deeper reorganizations rebuild the UTXO set
+    MAX_UNDO_DEPTH = 1000
+
+    def __init__(self, mining_workers: Optional[int] = None, store=None, mempool: Optional[Mempool] = None,
+                 max_block_transactions: int = 1000, max_block_bytes: int = 1024 * 1024,
+                 difficulty: int = 4, block_interval: float = 10.0, retarget_interval: int = 10,
+                 snapshot=None, headers_path: Optional[str] = None, mining_reward: float = BLOCK_REWARD,
+                 miner_address: Optional[str] = None):
+        # Initialize the blockchain with genesis block and difficulty for mining.
+        # Proof-of-work starts at the target of `difficulty` leading hex zeros and is retargeted
+        # every `retarget_interval` blocks to keep blocks about `block_interval` seconds apart.
+        self.difficulty_adjuster = DifficultyAdjuster(target_from_zeros(difficulty), block_interval,
+                                                      retarget_interval)
+        # `store` is an optional persistent block sequence (see storage.BlockStore); it replaces
+        # the in-memory list and only gets a new genesis block when it is empty.
+        self.chain: List[Block] = store if store is not None else []
+        if not len(self.chain):
+            self.chain.append(self.create_genesis_block())
+        # Processes used for proof-of-work; None means one per CPU core
+        self.mining_workers = mining_workers
+        self.verifier = SignatureVerifier()
+        self.mining_stats = MiningStats()
+        self.mempool = mempool if mempool is not None else Mempool()
+        # Mining takes the best-paying pending transactions that fit within these limits
+        self.max_block_transactions = max_block_transactions
+        self.max_block_bytes = max_block_bytes
+        # Each mined block's coinbase pays `mining_reward` plus the block's fees to `miner_address`
+        # (or to the address given to mine_block); without one, only pending transactions are mined
+        self.mining_reward = mining_reward
+        self.miner_address = miner_address
+        # Every block's header, packed (see headers.py); kept in `headers_path` across restarts if given
+        self.headers = HeaderChain(self.chain, headers_path)
+        # Block hash -> height; built on the first lookup so a persisted chain still loads lazily
+        self._hash_index: Optional[Dict[str, int]] = None
+        # Transaction and address lookups (see index.py); likewise built on first use
+        self._index: Optional[ChainIndex] = None
+        # A snapshot (see export.Snapshot) of the UTXO set at a height of this chain saves replaying
+        # the blocks up to it; one that does not match the chain is ignored
+        if (snapshot is not None and snapshot.height < len(self.chain)
+                and self.chain[snapshot.height].hash == snapshot.block_hash):
+            self.utxos = snapshot.utxos
+            self.utxos.block_reward = mining_reward
+            for block in self.chain[snapshot.height + 1:]:
+                self.utxos.apply_block(block)
+        else:
+            self.utxos = UTXOSet(mining_reward)
+            self.utxos.rebuild(self.chain)
+        self._undo: "OrderedDict[str, BlockUndo]" = OrderedDict()
+        # Guards chain, UTXO and mempool state together. Writers (new transactions, blocks,
+        # reorganizations) hold it only briefly; proof-of-work runs outside it, so reads never
+        # wait on mining. Callers reading several related values should hold lock.read().
+        self.lock = RWLock()
+
+    @property
+    def pending_transactions(self) -> List[Dict[str, Any]]:
+        """Transactions waiting to be mined, highest fee rate first."""
+        return self.mempool.transactions()
 
     def create_genesis_block(self) -> Block:
-        """The genesis block is the first block in the chain, with no transactions."""
-        return Block(0, [], time.time(), "0")
+        """
+        The genesis block is the first block in the chain, with no transactions. Its timestamp is
+        fixed so that independently started nodes share it and can sync with each other.
+        """
+        return genesis_block(self.difficulty_adjuster.initial_target)
 
     def get_last_block(self) -> Block:
         """Returns the last block in the chain."""
-        return self.chain[-1]
+        with self.lock.read():
+            return self.chain[-1]
 
-    def mine_block(self):
-        """Mines a block by adding pending transactions to the block, ensuring proof-of-work."""
-        if not self.pending_transactions:
+    def get_block(self, height: int) -> Optional[Block]:
+        """Returns the block at `height`, or None if the chain is shorter."""
+        with self.lock.read():
+            if not 0 <= height < len(self.chain):
+                return None
+            return self.chain[height]
+
+    def get_block_by_hash(self, block_hash: str) -> Optional[Block]:
+        with self.lock.read():
+            if self._hash_index is None:
+                self._hash_index = {block_hash: height for height, block_hash in self.headers.block_hashes()}
+            height = self._hash_index.get(block_hash)
+            return None if height is None else self.chain[height]
+
+    def next_target(self) -> int:
+        """The proof-of-work target the next block must meet."""
+        with self.lock.read():
+            return self.difficulty_adjuster.target_for(len(self.chain), self.chain.__getitem__)
+
+    def get_headers(self, from_height: int, count: int) -> Dict[str, Any]:
+        """Up to `count` block headers from `from_height`, read from the packed header chain, and the chain length."""
+        with self.lock.read():
+            return {"headers": self.headers.headers(from_height, count), "length": len(self.headers)}
+
+    def get_mining_stats(self) -> Dict[str, Any]:
+        """Current target and observed block cadence, plus telemetry for blocks mined here."""
+        with self.lock.read():
+            height = len(self.chain) - 1
+            target = self.difficulty_adjuster.target_for(height + 1, self.chain.__getitem__)
+            window = min(height - 1, self.difficulty_adjuster.retarget_interval or 10)
+            observed = None
+            if window > 0:
+                observed = (self.chain[height].timestamp - self.chain[height - window].timestamp) / window
+        return {
+            "height": height,
+            "target": format_target(target),
+            "difficulty": target_work(target),
+            "block_interval": self.difficulty_adjuster.block_interval,
+            "retarget_interval": self.difficulty_adjuster.retarget_interval,
+            "mining_reward": self.mining_reward,
+            "miner_address": self.miner_address,
+            "observed_block_interval": None if observed is None else round(observed, 3),
+            "mining": self.mining_stats.summary(),
+        }
+
+    def _append_block(self, block: Block):
+        """
+        Appends a validated block and keeps the UTXO set and lookup indexes current.
+        Raises ValueError (leaving everything unchanged) if the block's transactions
+        spend outputs they are not allowed to.
+        """
+        undo = self.utxos.apply_block(block)
+        try:
+            self.chain.append(block)
+        except Exception:
+            self.utxos.rollback(undo)
+            raise
+        self.headers.append(block)
+        self._undo[block.hash] = undo
+        if len(self._undo) > self.MAX_UNDO_DEPTH:
+            self._undo.popitem(last=False)
+        if self._hash_index is not None:
+            self._hash_index[block.hash] = block.index
+        if self._index is not None:
+            self._index.add_block(block)
+        self.mempool.remove(block.transaction_hashes())
+
+    def _output_at(self, outpoint: OutPoint) -> Optional[UTXOEntry]:
+        """The output `outpoint` names, read from the mined transaction that created it."""
+        location = self._chain_index().locate(outpoint[0])
+        if location is None:
             return None
+        outputs = transaction_outputs(self.chain[location[0]].transactions[location[1]], outpoint[0])
+        return outputs[outpoint[1]][1] if 0 <= outpoint[1] < len(outputs) else None
 
-        new_block = Block(
-            index=len(self.chain),
-            transactions=self.pending_transactions,
-            timestamp=time.time(),
-            previous_hash=self.get_last_block().hash
-        )
-        new_block.mine_block(self.difficulty)
-        self.chain.append(new_block)
-        self.pending_transactions = []  # Clear pending transactions after mining
+    def _restore_reservations(self):
+        """Reserves pending transactions' inputs again after a UTXO rebuild, dropping those that no longer apply."""
+        stale = []
+        for txid, entry in list(self.mempool.entries.items()):
+            try:
+                self.utxos.reserve(entry.transaction, txid)
+            except ValueError:
+                stale.append(txid)
+        self.mempool.remove(stale)
+
+    def _disconnect_to(self, height: int) -> List[Block]:
+        """Removes every block above `height`, reverting their UTXO changes; returns them oldest first."""
+        removed = self.chain[height + 1:]
+        # Undo data is only kept in memory; for older blocks it is reconstructed from the chain
+        undos = [self._undo.pop(block.hash, None) or block_undo(block, self._output_at) for block in removed]
+        del self.chain[height + 1:]
+        self.headers.truncate(height + 1)
+        if self._hash_index is not None:
+            for block in removed:
+                self._hash_index.pop(block.hash, None)
+        if self._index is not None:
+            for block in reversed(removed):
+                self._index.remove_block(block)
+        if any(undo is None for undo in undos):
+            self.utxos.rebuild(self.chain)  # Also forgets which outputs pending transactions reserved
+            self._restore_reservations()
+        else:
+            for undo in reversed(undos):
+                self.utxos.rollback(undo)
+        return removed
+
+    def reorganize(self, fork_height: int, blocks_data: List[Dict[str, Any]]) -> bool:
+        """
+        Replaces the blocks above `fork_height` with `blocks_data`, validating each new block as
+        add_block does. If any new block is invalid, the original blocks are restored and False
+        is returned. Transactions only in the blocks disconnected either way go back to the mempool.
+        """
+        with self.lock.write():
+            if not 0 <= fork_height < len(self.chain):
+                return False
+            self.verify_transactions(listed_transactions(blocks_data))
+            old_blocks = self._disconnect_to(fork_height)
+            for block_data in blocks_data:
+                try:
+                    accepted = self._add_block(block_data)
+                except (KeyError, TypeError, ValueError):
+                    accepted = False
+                if not accepted:
+                    applied = self._disconnect_to(fork_height)
+                    for block in old_blocks:
+                        self._append_block(block)
+                    self._readmit(applied, fork_height)
+                    return False
+            self._readmit(old_blocks, fork_height)
+            return True
+
+    def _readmit(self, blocks: List[Block], fork_height: int):
+        """Returns the transactions of disconnected `blocks` that the chain above `fork_height` lacks to the mempool."""
+        confirmed = {txid for block in self.chain[fork_height + 1:] for txid in block.transaction_hashes()}
+        for block in blocks:
+            for transaction in block.transactions:
+                txid = transaction_hash(transaction)
+                if txid in confirmed or is_coinbase(transaction):
+                    continue
+                try:
+                    self._admit_transaction(transaction, txid)
+                except ValueError:
+                    pass  # No longer spendable on this chain
+
+    def mine_block(self, progress: Optional[Callable[[int], None]] = None, miner_address: Optional[str] = None):
+        """
+        Mines a block by adding pending transactions to the block, ensuring proof-of-work.
+        With a miner address (`miner_address` or the node's own), the block starts with a coinbase
+        paying it the mining reward plus the fees, and is mined even without pending transactions.
+        `progress` is called periodically with the number of hashes tried so far. Returns None if
+        there is nothing to mine; raises StaleBlockError if the tip moved during the search.
+        """
+        miner_address = miner_address or self.miner_address
+        with self.lock.write():
+            candidates = self.mempool.select(self.max_block_transactions, self.max_block_bytes)
+            # Drop pending transactions whose inputs were spent since they were accepted
+            transactions, stale = self.utxos.split_applicable(candidates)
+            for transaction in self.mempool.remove([transaction_hash(tx) for tx in stale]):
+                self.utxos.release(transaction)
+            if not transactions and miner_address is None:
+                return None
+            if miner_address is not None:
+                fees = sum(self.mempool.entries[transaction_hash(tx)].fee for tx in transactions)
+                coinbase = coinbase_transaction(len(self.chain), miner_address, self.mining_reward + fees)
+                transactions = [coinbase] + transactions
+
+            new_block = Block(
+                index=len(self.chain),
+                transactions=transactions,
+                # Never at or before the median of recent blocks, even if peers' clocks run ahead
+                timestamp=max(time.time(), median_time_past(len(self.chain), self.chain.__getitem__) + 0.001),
+                previous_hash=self.get_last_block().hash,
+                target=self.next_target()
+            )
+        # The search itself runs without the lock
+        started = time.perf_counter()
+        with timed("mine"):
+            result = new_block.mine_block(workers=self.mining_workers, progress=progress)
+        elapsed = time.perf_counter() - started
+        HASHES.inc(result.attempts)
+        with self.lock.write():
+            if new_block.previous_hash != self.get_last_block().hash:
+                # The transactions stay pending for the next block
+                raise StaleBlockError("The chain tip moved while mining; the block was discarded.")
+            self._append_block(new_block)  # Also removes the mined transactions from the mempool
+        BLOCKS_MINED.inc()
+        self.mining_stats.record(new_block.index, result.attempts, elapsed, new_block.work())
         return new_block
 
-    def add_transaction(self, transaction: Dict[str, Any]):
-        """Validates and adds a transaction to pending transactions."""
+    def add_transaction(self, transaction: Dict[str, Any]) -> str:
+        """Validates and adds a transaction to pending transactions, returning its txid."""
         if not self.is_valid_transaction(transaction):
             raise ValueError("Invalid transaction signature.")
-        self.pending_transactions.append(transaction)
+        with self.lock.write():
+            return self._admit_transaction(transaction, transaction_hash(transaction))
 
-    def is_valid_transaction(self, transaction: Dict[str, Any]) -> bool:
-        """Validates that the transaction has a valid signature."""
+    def add_transactions(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Adds many transactions at once: signatures are verified as one parallel batch, then every
+        valid transaction is admitted under a single lock. Returns one result per transaction.
+        """
+        signatures = self.verify_transactions(transactions)
+        results = []
+        with self.lock.write():
+            for transaction, valid in zip(transactions, signatures):
+                if not valid:
+                    results.append({"status": "rejected", "detail": "Invalid transaction signature."})
+                    continue
+                try:
+                    txid = self._admit_transaction(transaction, transaction_hash(transaction))
+                    results.append({"status": "accepted", "txid": txid})
+                except ValueError as e:
+                    results.append({"status": "rejected", "detail": str(e)})
+        return results
+
+    def _admit_transaction(self, transaction: Dict[str, Any], txid: str) -> str:
+        """Adds a transaction whose signature was already checked to the mempool."""
+        if txid in self.mempool:
+            raise ValueError("Transaction already in mempool.")
+        fee = self.utxos.reserve(transaction, txid)
         try:
-            sender_public_key = serialization.load_pem_public_key(transaction["public_key"].encode())
-            signature = decode_dss_signature(bytes.fromhex(transaction["signature"]))
-            transaction_data = f"{transaction['sender']}{transaction['receiver']}{transaction['amount']}".encode()
-            sender_public_key.verify(signature, transaction_data, ec.ECDSA(hashes.SHA256()))
-            return True
-        except InvalidSignature:
-            return False
+            evicted = self.mempool.add(txid, transaction, fee)
+        except ValueError:
+            self.utxos.release(transaction, txid)
+            raise
+        for dropped in evicted:
+            self.utxos.release(dropped)
+        return txid
+
+    def is_valid_transaction(self, transaction: Dict[str, Any]) -> bool:
+        """Validates that the transaction has a valid signature. Keys and results are cached."""
+        with timed("verify"):
+            valid = self.verifier.verify(transaction)
+        TRANSACTIONS_VERIFIED.inc(result="valid" if valid else "invalid")
+        return valid
+
+    def verify_transactions(self, transactions: List[Dict[str, Any]], workers: Optional[int] = None) -> List[bool]:
+        """
+        Verifies a batch of transactions in parallel, one result per transaction. Coinbase
+        transactions are unsigned and pass; apply_block checks what they pay.
+        """
+        signed = [position for position, tx in enumerate(transactions) if not is_coinbase(tx)]
+        results = [True] * len(transactions)
+        with timed("verify_batch"):
+            verified = self.verifier.verify_batch([transactions[position] for position in signed], workers=workers)
+        for position, valid in zip(signed, verified):
+            results[position] = valid
+        valid = sum(verified)
+        TRANSACTIONS_VERIFIED.inc(valid, result="valid")
+        TRANSACTIONS_VERIFIED.inc(len(verified) - valid, result="invalid")
+        return results
+
+    def get_balance(self, address: str) -> float:
+        with self.lock.read():
+            return self.utxos.balance(address)
+
+    def get_utxos(self, address: str) -> List[Dict[str, Any]]:
+        with self.lock.read():
+            return self.utxos.utxos_for(address)
+
+    def _chain_index(self) -> ChainIndex:
+        """The transaction and address indexes, built on first use; callers hold the lock."""
+        if self._index is None:
+            index = ChainIndex()
+            index.rebuild(self.chain)
+            self._index = index
+        return self._index
+
+    def get_transaction(self, txid: str) -> Optional[Dict[str, Any]]:
+        """Looks up a transaction by hash, in the chain or else the mempool; None if unknown."""
+        with self.lock.read():
+            location = self._chain_index().locate(txid)
+            if location is None:
+                entry = self.mempool.entries.get(txid)
+                if entry is None:
+                    return None
+                return {"txid": txid, "status": "pending", "fee": entry.fee, "transaction": dict(entry.transaction)}
+            height, position = location
+            block = self.chain[height]
+            return {
+                "txid": txid,
+                "status": "confirmed",
+                "block_index": height,
+                "block_hash": block.hash,
+                "position": position,
+                "timestamp": block.timestamp,
+                "confirmations": len(self.chain) - height,
+                "transaction": dict(block.transactions[position]),
+            }
+
+    def get_address_history(self, address: str, offset: int = 0, limit: int = 100,
+                            newest_first: bool = True) -> Dict[str, Any]:
+        """One page of the confirmed transactions sending to or from `address`, newest first by default."""
+        with self.lock.read():
+            locations, total = self._chain_index().history(address, offset, limit, newest_first)
+            transactions = []
+            for height, position in locations:
+                block = self.chain[height]
+                transaction = block.transactions[position]
+                transactions.append({
+                    "txid": transaction_hash(transaction),
+                    "block_index": height,
+                    "block_hash": block.hash,
+                    "position": position,
+                    "timestamp": block.timestamp,
+                    "transaction": dict(transaction),
+                })
+        return {"address": address, "total": total, "offset": offset, "transactions": transactions}
+
+    def get_transaction_proof(self, txid: str) -> Optional[Dict[str, Any]]:
+        """Finds a transaction by hash and returns its Merkle inclusion proof, or None."""
+        with self.lock.read():
+            return self._find_transaction_proof(txid)
+
+    def _find_transaction_proof(self, txid: str) -> Optional[Dict[str, Any]]:
+        location = self._chain_index().locate(txid)
+        if location is None:
+            return None
+        height, position = location
+        block = self.chain[height]
+        tx_hashes = block.transaction_hashes()
+        return {
+            "txid": txid,
+            "block_index": block.index,
+            "block_hash": block.hash,
+            "merkle_root": block.merkle_root,
+            "position": position,
+            "proof": merkle_proof(tx_hashes, position),
+            # Enough for a light client to check the proof against a header chain it already holds
+            "header": self.headers.header(height),
+            "confirmations": len(self.chain) - height,
+        }
 
     def add_block(self, block_data: Dict[str, Any]) -> bool:
         """Adds a new block to the chain if it is valid."""
+        with self.lock.write():
+            return self._add_block(block_data)
+
+    def _add_block(self, block_data: Dict[str, Any]) -> bool:
+        with timed("validate_block"):
+            accepted = self._validate_and_append(block_data)
+        BLOCKS_ADDED.inc(result="accepted" if accepted else "rejected")
+        return accepted
+
+    def _validate_and_append(self, block_data: Dict[str, Any]) -> bool:
         block = Block(
             index=block_data["index"],
             transactions=block_data["transactions"],
             timestamp=block_data["timestamp"],
-            previous_hash=block_data["previous_hash"]
+            previous_hash=block_data["previous_hash"],
+            target=int(block_data["target"], 16)
         )
         block.nonce = block_data["nonce"]
         block.hash = block.calculate_hash()
+        if block_data.get("merkle_root", block.merkle_root) != block.merkle_root:
+            return False
 
-        if self.is_valid_block(block, self.get_last_block()):
-            self.chain.append(block)
-            return True
-        return False
+        if not self.is_valid_block(block, self.get_last_block()):
+            return False
+        if not all(self.verify_transactions(block.transactions)):
+            return False
+        try:
+            self._append_block(block)
+        except ValueError:
+            return False
+        return True
+
+    def add_blocks(self, blocks_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Adds consecutive blocks in order under a single lock, e.g. when syncing from a peer.
+        All of their signatures are verified up front as one parallel batch. Returns one
+        result per block; blocks after a rejected one usually fail to link and are rejected too.
+        """
+        self.verify_transactions(listed_transactions(blocks_data))  # Warms the result cache that add_block consults
+        results = []
+        with self.lock.write():
+            for block_data in blocks_data:
+                try:
+                    accepted = self.add_block(block_data)
+                except (KeyError, TypeError, ValueError):
+                    results.append({"status": "rejected", "detail": "Malformed block."})
+                    continue
+                if accepted:
+                    results.append({"status": "accepted", "hash": self.get_last_block().hash})
+                else:
+                    results.append({"status": "rejected", "detail": "Invalid block."})
+        return results
 
     def is_valid_block(self, block: Block, previous_block: Block) -> bool:
-        """Validates a block, including checks for the hash, previous hash, and proof-of-work."""
-        if block.previous_hash != previous_block.hash:
+        """
+        Validates a block, including checks for the hash, previous hash, timestamp and proof-of-work.
+        `previous_block` must be the current tip, since the expected target depends on the chain.
+        """
+        if block.previous_hash != previous_block.hash or block.index != previous_block.index + 1:
+            return False
+        if block.merkle_root != merkle_root(block.transaction_hashes()):
             return False
         if block.hash != block.calculate_hash():
             return False
-        if not block.hash.startswith("0" * self.difficulty):
+        if int(block.target, 16) != self.difficulty_adjuster.target_for(block.index, self.chain.__getitem__):
+            return False
+        if check_timestamp(block.timestamp, block.index, self.chain.__getitem__) is not None:
+            return False
+        if not block.meets_target():
             return False
         return True
 
 
 
+# Shared so repeated submissions reuse pooled keep-alive connections
+_session = requests.Session()
+
+
 def submit_transaction(transaction_data):
         url = "http://127.0.0.1:8000/new_transaction"  # FastAPI backend URL
 
         try:
-            response = requests.post(url, json=transaction_data)
+            response = _session.post(url, json=transaction_data)
             # Check if the response is OK (status code 200)
             if response.status_code == 200:
                 return {"status": "success", "data": response.json()}
             else:
                 return {"status": "error", "detail": response.json().get("detail")}
         except requests.exceptions.RequestException as e:
-            return {"status": "error", "detail": str(e)}
\ No newline at end of file
+            return {"status": "error", "detail": str(e)}
+
+
+def submit_transactions(transactions, batch_size=1000, session=None):
+    """
+    Submits many transactions through /new_transactions, `batch_size` per request as NDJSON.
+    Returns one result per transaction, in order; a failed request marks its whole batch as errors.
+    """
+    url = "http://127.0.0.1:8000/new_transactions"
+    session = session or _session
+    results = []
+    for start in range(0, len(transactions), batch_size):
+        batch = transactions[start:start + batch_size]
+        body = "\n".join(json.dumps(tx) for tx in batch)
+        try:
+            response = session.post(url, data=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+            if response.status_code == 200:
+                results.extend(response.json()["results"])
+            else:
+                detail = response.json().get("detail")
+                results.extend({"status": "error", "detail": detail} for _ in batch)
+        except requests.exceptions.RequestException as e:
+            results.extend({"status": "error", "detail": str(e)} for _ in batch)
+    return results
@@ -0,0 +1,132 @@
+"""
+Offline chain maintenance against a node's data directory: streaming export and import, and
+snapshot files. Stop the node first; it must not share the data directory with this tool.
+
+    python cli.py export -o chain.ndjson                  # or --format binary
+    python cli.py import chain.ndjson                     # or - for stdin
+    python cli.py snapshot -o chain.snapshot
+    python cli.py restore chain.snapshot --data-dir new_node
+"""
+import argparse
+import os
+import sys
+
+import export
+from blockchain import Blockchain
+from storage import BlockStore
+from validation import ChainVerifier
+
+
+def open_blockchain(args, snapshot=None) -> Blockchain:
+    return Blockchain(store=BlockStore(args.data_dir), block_interval=args.block_interval, snapshot=snapshot,
+                      headers_path=os.path.join(args.data_dir, "headers.dat"))
+
+
+def read_chunks(path: str, size: int = 1024 * 1024):
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+def run_export(args):
+    blockchain = open_blockchain(args)
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in export.export_blocks(blockchain.chain, args.from_height, args.to_height, args.format):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        blockchain.chain.close()
+        blockchain.headers.close()
+
+
+def run_import(args):
+    blockchain = open_blockchain(args)
+    try:
+        report = export.import_blocks(blockchain, read_chunks(args.input), args.format)
+    finally:
+        blockchain.chain.close()
+        blockchain.headers.close()
+    print(f"imported {report['imported']} blocks, skipped {report['skipped']}, height {report['height']}",
+          file=sys.stderr)
+    if report["error"] is not None:
+        sys.exit(f"stopped at height {report['error']['height']}: {report['error']['detail']}")
+
+
+def run_snapshot(args):
+    blockchain = open_blockchain(args)
+    try:
+        header = export.write_snapshot(blockchain, args.output, include_blocks=not args.state_only)
+    finally:
+        blockchain.chain.close()
+        blockchain.headers.close()
+    print(f"snapshot at height {header['height']}: {header['blocks']} blocks, {header['utxos']} unspent outputs",
+          file=sys.stderr)
+
+
+def run_restore(args):
+    """Fills an empty data directory from a snapshot and trusts it up to its height."""
+    store = BlockStore(args.data_dir)
+    try:
+        snapshot = export.load_snapshot(read_chunks(args.input), store)
+        if len(store) != snapshot.height + 1:
+            raise export.SnapshotError("The snapshot has no blocks; take it without --state-only.")
+        store.sync()
+        blockchain = Blockchain(store=store, block_interval=args.block_interval, snapshot=snapshot,
+                                headers_path=os.path.join(args.data_dir, "headers.dat"))
+        blockchain.headers.close()
+        # The node skips re-validating blocks up to here and replaying them into the UTXO set
+        ChainVerifier(blockchain.difficulty_adjuster, checkpoint_path=os.path.join(args.data_dir, "checkpoints.json")
+                      ).add_checkpoint(snapshot.height, snapshot.block_hash)
+        export.write_snapshot(blockchain, os.path.join(args.data_dir, "state.snapshot"), include_blocks=False)
+    except export.SnapshotError as e:
+        sys.exit(str(e))
+    finally:
+        store.close()
+    print(f"restored {snapshot.height + 1} blocks and {len(snapshot.utxos.utxos)} unspent outputs", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=os.environ.get("BLOCKCHAIN_DATA_DIR", "chain_data"))
+    parser.add_argument("--block-interval", type=float,
+                        default=float(os.environ.get("BLOCKCHAIN_BLOCK_INTERVAL", "10")),
+                        help="must match the node's, as it determines the expected targets")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="stream blocks to a file")
+    export_parser.add_argument("-o", "--output", default="-")
+    export_parser.add_argument("--format", choices=list(export.MEDIA_TYPES), default=export.NDJSON)
+    export_parser.add_argument("--from-height", type=int, default=0)
+    export_parser.add_argument("--to-height", type=int, default=None)
+    export_parser.set_defaults(run=run_export)
+
+    import_parser = commands.add_parser("import", help="validate and append blocks from an export")
+    import_parser.add_argument("input", help="file, or - for stdin")
+    import_parser.add_argument("--format", choices=list(export.MEDIA_TYPES), default=None,
+                               help="detected from the data by default")
+    import_parser.set_defaults(run=run_import)
+
+    snapshot_parser = commands.add_parser("snapshot", help="write a compressed snapshot of the blocks and UTXO set")
+    snapshot_parser.add_argument("-o", "--output", required=True)
+    snapshot_parser.add_argument("--state-only", action="store_true", help="leave out the blocks")
+    snapshot_parser.set_defaults(run=run_snapshot)
+
+    restore_parser = commands.add_parser("restore", help="start a new data directory from a snapshot")
+    restore_parser.add_argument("input", help="file, or - for stdin")
+    restore_parser.set_defaults(run=run_restore)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
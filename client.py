@@ -1,10 +1,22 @@
+import json
+import os
 import streamlit as st
 import requests
-from key_signature_generator import generate_key_pair, sign_transaction 
+import time
+from key_signature_generator import generate_key_pair, key_id, sign_transaction
 from blockchain import submit_transaction
+from difficulty import DifficultyAdjuster, target_from_zeros
+from headers import check_headers, verify_inclusion
+from verification import signing_payload
 
 # Define the API base URL
 API_BASE_URL = "http://127.0.0.1:8000"
+# The local wallet service (uvicorn wallet_api:app --host 127.0.0.1 --port 8100)
+WALLET_API_URL = "http://127.0.0.1:8100"
+# The network's proof-of-work rules that headers are checked against; they must match the node's
+# (the default difficulty and retarget interval, and its BLOCKCHAIN_BLOCK_INTERVAL)
+NETWORK_DIFFICULTY = DifficultyAdjuster(target_from_zeros(4),
+                                        float(os.environ.get("BLOCKCHAIN_BLOCK_INTERVAL", "10")))
 
 def home_page():
      st.title("Welcome to Blockchain Explorer")
@@ -124,25 +136,53 @@ def transaction_page():
         except Exception as e:
             st.error(f"Error: {e}")
 
+def mine(miner_address=None):
+    """Starts a mining job and shows its progress until it finishes; returns the job, or None if it could not start."""
+    params = {"miner_address": miner_address} if miner_address else {}
+    response = requests.post(f"{API_BASE_URL}/mine_block", params=params)
+    if response.status_code != 202:
+        st.error(response.json()["detail"])
+        return None
+
+    # Mining runs as a background job on the server; poll it until it finishes
+    job_id = response.json()["job_id"]
+    status = st.empty()
+    while True:
+        job = requests.get(f"{API_BASE_URL}/mine_block/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        status.info(f"Mining... {job['attempts']:,} hashes tried ({job['hash_rate']:,.0f} H/s)")
+        time.sleep(0.5)
+    status.empty()
+    return job
+
 def mining_page():
     st.title("Mine a Block")
+    # The block's coinbase pays the mining reward plus fees here (the node's own address if empty)
+    miner_address = st.text_input("Miner Address (optional)").strip()
 
     if st.button("Mine Block"):
-        response = requests.post(f"{API_BASE_URL}/mine_block")
-        if response.status_code == 200:
-            block = response.json()["block"]
+        job = mine(miner_address or None)
+        if job is None:
+            return
+        if job["status"] == "done":
             st.success("Block mined successfully!")
-            st.json(block)
+            st.json(job["block"])
         else:
-            st.error(response.json()["detail"])
+            st.error(job["error"])
 
 def blockchain_viewer_page():
     st.title("View Blockchain Ledger")
 
-    response = requests.get(f"{API_BASE_URL}/chain")
+    # Only one page of blocks is downloaded at a time
+    page_size = st.selectbox("Blocks per page", [10, 25, 50, 100], index=1)
+    from_height = st.number_input("Start at block", min_value=0, step=page_size)
+
+    response = requests.get(f"{API_BASE_URL}/chain", params={"from_height": from_height, "limit": page_size})
     if response.status_code == 200:
-        chain = response.json()["chain"]
-        st.write(f"Blockchain contains {len(chain)} blocks:")
+        page = response.json()
+        chain = page["chain"]
+        st.write(f"Blockchain contains {page['length']} blocks, showing {len(chain)}:")
         for block in chain:
             st.subheader(f"Block {block['index']}")
             st.json(block)
@@ -150,136 +190,204 @@ def blockchain_viewer_page():
         st.error("Failed to retrieve the blockchain.")
 
 
+def verify_payment(txid):
+    """
+    Checks a transaction the way a light client would: download and check every header, then
+    check the transaction's Merkle proof against its block's header. Returns (ok, message).
+    """
+    headers, downloaded, length = [], 0, None
+    while length is None or len(headers) < length:
+        response = requests.get(f"{API_BASE_URL}/headers", params={"from": len(headers), "count": 2000})
+        downloaded += len(response.content)
+        page = response.json()
+        length = page["length"]
+        if not page["headers"]:
+            break
+        error = check_headers(page["headers"], NETWORK_DIFFICULTY, headers)
+        if error is not None:
+            return False, f"Header {error[0]} is invalid: {error[1]}."
+        headers.extend(page["headers"])
+    response = requests.get(f"{API_BASE_URL}/proof/{txid}")
+    if response.status_code != 200:
+        return False, "No proof for this transaction."
+    downloaded += len(response.content)
+    proof = response.json()
+    if proof["block_index"] >= len(headers) or not verify_inclusion(proof, headers[proof["block_index"]]):
+        return False, "The proof does not match the header chain."
+    return True, (f"Included in block {proof['block_index']}, {len(headers) - proof['block_index']} confirmations "
+                  f"(checked {len(headers)} headers, {downloaded / 1024:.1f} KiB downloaded).")
+
+
+def search_page():
+    st.title("Search Transactions and Addresses")
+
+    txid = st.text_input("Transaction hash")
+    if txid:
+        response = requests.get(f"{API_BASE_URL}/tx/{txid.strip()}")
+        if response.status_code == 200:
+            found = response.json()
+            if found["status"] == "confirmed":
+                st.write(f"In block {found['block_index']} at position {found['position']}, "
+                         f"{found['confirmations']} confirmations")
+                if st.button("Verify with headers only"):
+                    ok, message = verify_payment(txid.strip())
+                    (st.success if ok else st.error)(message)
+            else:
+                st.write("Pending in the mempool")
+            st.json(found["transaction"])
+        else:
+            st.error("Transaction not found.")
+
+    address = st.text_input("Address")
+    if address:
+        page_size = st.selectbox("Transactions per page", [10, 25, 50, 100], index=1)
+        offset = st.number_input("Skip the newest", min_value=0, step=page_size)
+        response = requests.get(f"{API_BASE_URL}/address/{address.strip()}/history",
+                                params={"offset": offset, "limit": page_size})
+        history = response.json()
+        balance = requests.get(f"{API_BASE_URL}/balance/{address.strip()}").json()["balance"]
+        st.write(f"Balance {balance}, {history['total']} transactions, showing {len(history['transactions'])}:")
+        for entry in history["transactions"]:
+            st.subheader(f"Block {entry['block_index']}, position {entry['position']}")
+            st.caption(entry["txid"])
+            st.json(entry["transaction"])
+
+
 def generate_key_signature_page():
     # Title of the page
     st.title("Generate Public Key & Signature")
+    st.caption("For signing by hand; the Transaction Simulation page keeps keys in the local wallet service instead.")
 
-    # Generate keys button
+    # Generate keys button; the keys stay in the session so the form below can use them
     if st.button("Generate Key Pair"):
         private_pem, public_pem = generate_key_pair()  # Generate key pair using the function
-
-        # Store keys in session state
         st.session_state.private_key = private_pem
         st.session_state.public_key = public_pem
 
-        # Display the keys to the user
-        st.subheader("Private Key (PEM format)")
-        st.text(private_pem)
+    if "private_key" not in st.session_state:
+        st.write("Generate the key pair to continue.")
+        return
 
-        st.subheader("Public Key (PEM format)")
-        st.text(public_pem)
+    # Display the keys to the user; a key's address is its key id
+    sender = key_id(st.session_state.public_key)
+    st.subheader("Private Key (PEM format)")
+    st.text(st.session_state.private_key)
+    st.subheader("Public Key (PEM format)")
+    st.text(st.session_state.public_key)
+    st.write(f"Sender Address: {sender}")
 
-        # Provide the transaction form for users to interact with
-        sender = st.text_input("Sender Address", "Alice")
-        receiver = st.text_input("Receiver Address", "Bob")
-        amount = st.number_input("Amount", min_value=0.0, step=0.01)
+    # The same fields as the Submit Transaction page
+    receiver = st.text_input("Receiver Address")
+    amount = st.number_input("Amount", min_value=0.0, step=0.01)
+    input_utxos = st.text_area("Input UTXOs (as JSON)", "[]")
+    output_utxos = st.text_area("Output UTXOs (as JSON)", "[]")
 
-        # Transaction message based on user input
-        transaction_message = f"{sender} sends {amount} to {receiver}"
+    # Sign the whole transaction (see verification.signing_payload), not just a description of it
+    if st.button("Sign Transaction"):
+        try:
+            transaction = {
+                "sender": sender,
+                "receiver": receiver,
+                "amount": amount,
+                "public_key": st.session_state.public_key,
+                "input_utxos": json.loads(input_utxos),
+                "output_utxos": json.loads(output_utxos),
+            }
+            payload = signing_payload(transaction)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            st.error(f"Error: {e}")
+            return
+        signature_hex = sign_transaction(st.session_state.private_key, payload)
 
-        # Sign the transaction message if button is clicked
-        if st.button("Sign Transaction"):
-            # Ensure that private_key exists in the session state
-            if "private_key" not in st.session_state:
-                st.error("Private key not generated!")
-                return  # Exit early if no private key was generated
-
-            signature_hex = sign_transaction(st.session_state.private_key, transaction_message)
-
-            # Displaying the details to the user
-            st.subheader("Transaction Details")
-            st.write(f"Sender: {sender}")
-            st.write(f"Receiver: {receiver}")
-            st.write(f"Amount: {amount}")
-            st.write(f"Message: {transaction_message}")
-            st.write(f"Signature (hex): {signature_hex}")
-            st.write("**Note**: You can use this signature for validating transactions in the blockchain.")
-
-        # Option for user to copy the signature
-        if 'signature_hex' in locals():
-            st.text_area("Copy the Signature", signature_hex, height=100)
+        # Displaying the details to the user
+        st.subheader("Transaction Details")
+        st.write(f"Signed message: {payload.decode()}")
+        st.text_area("Copy the Signature", signature_hex, height=100)
+        st.write("**Note**: Submit it with the public key and the same details on the Submit Transaction page.")
 
 def simulate_transaction_page():
     st.title("Generate Keys, Sign and Submit a Transaction")
+    st.caption(f"Keys are kept and used by the local wallet service at {WALLET_API_URL} (see wallet_api.py).")
 
-    # Step 1: Generate Public and Private Keys
+    # Step 1: Generate a key pair in the wallet; the private key never leaves it
     if st.button("Generate Key Pair"):
-        private_pem, public_pem = generate_key_pair()  # Call the key generation function
-
-        # Store the keys in session state so they can be accessed later
-        st.session_state.private_key = private_pem
-        st.session_state.public_key = public_pem
-
-        # Display the keys
-        st.subheader("Private Key (PEM format)")
-        st.text(private_pem)
-
-        st.subheader("Public Key (PEM format)")
-        st.text(public_pem)
-
-    # Step 2: Input Transaction Details
-    if 'private_key' in st.session_state:
-        sender = st.text_input("Sender Address", "Alice")
-        receiver = st.text_input("Receiver Address", "Bob")
+        response = requests.post(f"{WALLET_API_URL}/keys", json={"count": 1})
+        if response.status_code == 200:
+            key = response.json()["keys"][0]
+            st.session_state.key_id = key["key_id"]
+            st.session_state.public_key = key["public_key"]
+            st.session_state.pop("signed_transaction", None)
+        else:
+            st.error(f"Wallet error: {response.json().get('detail')}")
+
+    # Step 2: Fund the key (only a block's coinbase issues coins) and input transaction details
+    if 'key_id' in st.session_state:
+        sender = st.session_state.key_id  # A key's address is its key id
+        st.subheader("Key")
+        st.write(f"Address: {sender}")
+        st.text(st.session_state.public_key)
+
+        if st.button("Mine a Block Paying This Address"):
+            job = mine(sender)
+            if job is not None and job["status"] != "done":
+                st.error(job["error"])
+        utxos = requests.get(f"{API_BASE_URL}/utxos/{sender}").json()["utxos"]
+        st.write(f"Balance: {sum(utxo['amount'] for utxo in utxos)}")
+
+        receiver = st.text_input("Receiver Address")
         amount = st.number_input("Amount", min_value=0.0, step=0.01)
 
-        # Prepare the transaction message
-        transaction_message = f"{sender} sends {amount} to {receiver}"
-
-        st.subheader("Transaction Details")
-        st.write(f"Sender: {sender}")
-        st.write(f"Receiver: {receiver}")
-        st.write(f"Amount: {amount}")
-        st.write(f"Message: {transaction_message}")
-
-        # Step 3: Sign the Transaction Message
+        # Spend the address's outputs until they cover the amount; the rest comes back as change
+        inputs, total = [], 0.0
+        for utxo in utxos:
+            if total >= amount:
+                break
+            inputs.append(utxo)
+            total += utxo["amount"]
+        if total < amount:
+            st.warning("The balance does not cover this amount.")
+            return
+        outputs = [{"txid": "", "index": 0, "amount": amount, "address": receiver}]
+        if total > amount:
+            outputs.append({"txid": "", "index": 1, "amount": total - amount, "address": sender})
+        transaction = {
+            "sender": sender,
+            "receiver": receiver,
+            "amount": amount,
+            "input_utxos": inputs,
+            "output_utxos": outputs,
+        }
+
+        # Step 3: Sign the whole transaction (see verification.signing_payload)
         if st.button("Sign Transaction"):
-            if "private_key" not in st.session_state:
-                st.error("Private key is missing. Please generate the key pair first.")
+            response = requests.post(f"{WALLET_API_URL}/sign",
+                                     json={"key_id": st.session_state.key_id, "transaction": transaction})
+            if response.status_code == 200:
+                st.session_state.signed_transaction = response.json()["transaction"]
+            else:
+                st.error(f"Wallet error: {response.json().get('detail')}")
+
+        signed = st.session_state.get("signed_transaction")
+        if signed is not None:
+            spent = [(utxo["txid"], utxo["index"]) for utxo in signed["input_utxos"]]
+            if {key: signed[key] for key in ("sender", "receiver", "amount")} != \
+                    {"sender": sender, "receiver": receiver, "amount": amount} or \
+                    spent != [(utxo["txid"], utxo["index"]) for utxo in inputs]:
+                st.warning("The details changed since signing; sign the transaction again.")
             else:
-                # Sign the transaction with the private key
-                signature_hex = sign_transaction(st.session_state.private_key, transaction_message)
-                
-                # Store the signature in the session state
-                st.session_state.signature = signature_hex
-
                 st.subheader("Signature")
-                st.write(f"Signature (hex): {signature_hex}")
-
-                st.write("Now you can submit the transaction.")
-
-                # Optionally display the keys again for the user
-                st.subheader("Public Key (PEM format)")
-                st.text(st.session_state.public_key)
-
-                st.subheader("Private Key (PEM format)")
-                st.text(st.session_state.private_key)
+                st.write(f"Signature (hex): {signed['signature']}")
 
                 # Step 4: Submit the Signed Transaction
-            if st.button("Submit Transaction"):
-                    # Construct the transaction object to send
-                    transaction = {
-                        "sender": sender,
-                        "receiver": receiver,
-                        "amount": amount,
-                        "public_key": st.session_state.public_key,
-                        "signature": st.session_state.signature,
-                        "input_utxos": [{"txid": "some_txid", "index": 0, "amount": amount}],
-                        "output_utxos": [{"txid": "new_txid", "index": 0, "amount": amount}],
-                    }
-
-                    # Send the transaction to the FastAPI backend
-                    result = submit_transaction(transaction)
+                if st.button("Submit Transaction"):
+                    result = submit_transaction(signed)
 
                     if result["status"] == "success":
                         st.success("Transaction submitted successfully!")
-                        st.write("Transaction Details:", transaction)
+                        st.write("Transaction Details:", signed)
                     else:
                         st.error(f"Transaction failed. {result['detail']}")
 
-            st.write("**Note**: You can submit this transaction to the blockchain now.")
-
-
     else:
         st.write("Generate the key pair to continue.")
 
@@ -291,6 +399,7 @@ PAGES = {
     "Transaction Simulation": simulate_transaction_page,
     "Mine Block": mining_page,
     "View Blockchain": blockchain_viewer_page,
+    "Search": search_page,
     
 }
 
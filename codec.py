@@ -0,0 +1,235 @@
+import struct
+from collections.abc import Mapping
+from typing import Any, List, Tuple
+
+from blockchain import Block
+from transaction import Transaction, compress_public_key, compress_signature, public_key_pem, signature_hex
+
+
+# Media type under which the API serves and accepts this encoding
+CONTENT_TYPE = "application/x-blockchain"
+
+# Every value starts with one of these tags
+NONE, FALSE, TRUE, INT, FLOAT, STR, HASH, LIST, DICT, PUBLIC_KEY, SIGNATURE = range(11)
+
+# Dict keys are written as an index into this table (plus one), or 0 followed by the key itself.
+# Append only: existing positions are part of the format.
+KEYS = ("index", "transactions", "timestamp", "previous_hash", "target", "merkle_root", "nonce", "hash",
+        "sender", "receiver", "amount", "public_key", "signature", "input_utxos", "output_utxos",
+        "txid", "address", "chain", "length", "next_height", "headers")
+_KEY_CODES = {key: code for code, key in enumerate(KEYS, 1)}
+
+_TRANSACTION_FIELDS = frozenset(Transaction.FIELDS)
+_DOUBLE = struct.Struct("<d")
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class Raw:
+    """An already encoded value, spliced into the output as-is (e.g. a cached block)."""
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def encode(value: Any) -> bytes:
+    """
+    Encodes a JSON-like value, Block or Transaction compactly and canonically: dict keys are
+    sorted, 64-digit hex strings take 32 bytes, P-256 PEM public keys take their 33-byte
+    compressed point and DER signatures their raw 64-byte r || s. Every conversion is exact,
+    so decoding gives back strings identical to the originals and transaction hashes match.
+    """
+    out = bytearray()
+    _write(out, value)
+    return bytes(out)
+
+
+def decode(data: bytes, transactions: bool = False) -> Any:
+    """
+    Decodes one value; blocks and transactions come back as their JSON dict forms. With
+    `transactions`, dicts shaped like transactions come back as Transaction objects instead,
+    which skips expanding their keys and signatures to text (and compressing them again).
+    """
+    try:
+        value, position = _read(memoryview(data), 0, transactions)
+    except (IndexError, struct.error, UnicodeDecodeError, RecursionError) as e:
+        raise ValueError(f"Malformed binary data: {e}") from e
+    if position != len(data):
+        raise ValueError("Malformed binary data: trailing bytes")
+    return _expand(value)
+
+
+def _write_varint(out: bytearray, n: int):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _write_key(out: bytearray, key: str):
+    code = _KEY_CODES.get(key)
+    if code is not None:
+        out.append(code)
+    else:
+        out.append(0)
+        _write_str(out, key)
+
+
+def _write_str(out: bytearray, value: str):
+    data = value.encode()
+    _write_varint(out, len(data))
+    out += data
+
+
+def _write_text(out: bytearray, value: str):
+    if len(value) == 64 and _HEX_DIGITS.issuperset(value):
+        out.append(HASH)
+        out += bytes.fromhex(value)
+        return
+    if value.startswith("-----BEGIN PUBLIC KEY-----"):
+        point = compress_public_key(value)
+        if point is not None:
+            out.append(PUBLIC_KEY)
+            out += point
+            return
+    elif value.startswith("30") and len(value) <= 144:
+        raw = compress_signature(value)
+        if raw is not None:
+            out.append(SIGNATURE)
+            out += raw
+            return
+    out.append(STR)
+    _write_str(out, value)
+
+
+def _write_fields(out: bytearray, items: List[Tuple[str, Any]]):
+    out.append(DICT)
+    _write_varint(out, len(items))
+    for key, value in sorted(items, key=lambda item: item[0]):
+        _write_key(out, key)
+        _write(out, value)
+
+
+def _write(out: bytearray, value: Any):
+    if isinstance(value, Raw):
+        out += value.data
+    elif value is None:
+        out.append(NONE)
+    elif value is True or value is False:
+        out.append(TRUE if value else FALSE)
+    elif isinstance(value, int):
+        out.append(INT)
+        _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, float):
+        out.append(FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        _write_text(out, value)
+    elif isinstance(value, bytes):
+        # Only Transaction slots hold bytes: a compressed public key or a raw signature
+        out.append(PUBLIC_KEY if len(value) == 33 else SIGNATURE)
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write(out, item)
+    elif isinstance(value, Transaction):
+        # Straight from the slots, so keys and signatures are never expanded to text
+        _write_fields(out, [(name, getattr(value, name)) for name in Transaction.FIELDS])
+    elif isinstance(value, Block):
+        _write_fields(out, [(name, getattr(value, name)) for name in Block.__slots__ if hasattr(value, name)])
+    elif isinstance(value, Mapping):
+        _write_fields(out, list(value.items()))
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _read_varint(data: memoryview, position: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, position
+        shift += 7
+
+
+def _read_count(data: memoryview, position: int) -> Tuple[int, int]:
+    count, position = _read_varint(data, position)
+    if count > len(data) - position:
+        raise IndexError("count exceeds the remaining data")
+    return count, position
+
+
+def _read_str(data: memoryview, position: int) -> Tuple[str, int]:
+    length, position = _read_count(data, position)
+    return str(data[position:position + length], "utf-8"), position + length
+
+
+def _expand(value: Any) -> Any:
+    """Turns a compact public key or signature left in bytes by _read back into its string."""
+    if isinstance(value, bytes):
+        return public_key_pem(value) if len(value) == 33 else signature_hex(value)
+    return value
+
+
+def _read(data: memoryview, position: int, transactions: bool) -> Tuple[Any, int]:
+    """Keys and signatures are returned as bytes; the containers holding them expand them."""
+    tag = data[position]
+    position += 1
+    if tag == NONE:
+        return None, position
+    if tag == FALSE or tag == TRUE:
+        return tag == TRUE, position
+    if tag == INT:
+        n, position = _read_varint(data, position)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), position
+    if tag == FLOAT:
+        return _DOUBLE.unpack_from(data, position)[0], position + _DOUBLE.size
+    if tag == STR:
+        return _read_str(data, position)
+    if tag == HASH:
+        return data[position:position + 32].hex(), _checked(data, position + 32)
+    if tag == PUBLIC_KEY:
+        end = _checked(data, position + 33)
+        point = bytes(data[position:end])
+        try:
+            public_key_pem(point)  # Rejects points not on the curve now rather than on first use
+        except ValueError as e:
+            raise ValueError(f"Malformed binary data: bad public key ({e})") from e
+        return point, end
+    if tag == SIGNATURE:
+        end = _checked(data, position + 64)
+        return bytes(data[position:end]), end
+    if tag == LIST:
+        count, position = _read_count(data, position)
+        items = []
+        for _ in range(count):
+            item, position = _read(data, position, transactions)
+            items.append(_expand(item))
+        return items, position
+    if tag == DICT:
+        count, position = _read_count(data, position)
+        result = {}
+        for _ in range(count):
+            code = data[position]
+            position += 1
+            if code == 0:
+                key, position = _read_str(data, position)
+            elif code <= len(KEYS):
+                key = KEYS[code - 1]
+            else:
+                raise ValueError(f"Malformed binary data: unknown key code {code}")
+            result[key], position = _read(data, position, transactions)
+        if transactions and result.keys() == _TRANSACTION_FIELDS:
+            return Transaction(**result), position
+        return {key: _expand(value) for key, value in result.items()}, position
+    raise ValueError(f"Malformed binary data: unknown tag {tag}")
+
+
+def _checked(data: memoryview, end: int) -> int:
+    if end > len(data):
+        raise IndexError("value runs past the end of the data")
+    return end
@@ -0,0 +1,93 @@
+import time
+from typing import Any, Callable, Optional
+
+
+# Easiest possible target: every hash meets it
+MAX_TARGET = 2 ** 256 - 1
+
+# A block's timestamp must be later than the median timestamp of this many blocks before it,
+# and at most MAX_FUTURE_DRIFT seconds ahead of the checking node's clock. Otherwise a miner
+# could skew the timestamps retargeting measures and drive the difficulty down.
+MEDIAN_TIME_SPAN = 11
+MAX_FUTURE_DRIFT = 2 * 60 * 60
+
+
+def target_from_zeros(zeros: int) -> int:
+    """The target equivalent to requiring `zeros` leading hex zeros in the block hash."""
+    return (1 << (256 - 4 * zeros)) - 1
+
+
+def format_target(target: int) -> str:
+    """Targets travel as fixed-width hex, like hashes."""
+    return f"{target:064x}"
+
+
+def meets_target(block_hash: str, target: int) -> bool:
+    return int(block_hash, 16) <= target
+
+
+def target_work(target: int) -> int:
+    """Expected number of hashes needed to find one at or below `target`."""
+    return (1 << 256) // (target + 1)
+
+
+def median_time_past(height: int, block_at: Callable[[int], Any]) -> float:
+    """Median timestamp of the (up to) MEDIAN_TIME_SPAN blocks below `height`, which must be at least 1."""
+    timestamps = sorted(block_at(h).timestamp for h in range(max(0, height - MEDIAN_TIME_SPAN), height))
+    return timestamps[len(timestamps) // 2]
+
+
+def check_timestamp(timestamp: Any, height: int, block_at: Callable[[int], Any],
+                    now: Optional[float] = None) -> Optional[str]:
+    """
+    Why the timestamp of a block at `height` is unacceptable, or None if it is fine; `block_at`
+    is as for DifficultyAdjuster.target_for. The genesis block is not checked.
+    """
+    if height <= 0:
+        return None
+    if type(timestamp) not in (int, float):
+        return "timestamp is not a number"
+    if timestamp <= median_time_past(height, block_at):
+        return "timestamp is not after the median of the previous blocks"
+    if timestamp > (time.time() if now is None else now) + MAX_FUTURE_DRIFT:
+        return "timestamp is too far in the future"
+    return None
+
+
+class DifficultyAdjuster:
+    """
+    Picks the proof-of-work target each block must meet.
+
+    Every `retarget_interval` blocks the target is rescaled by how long the last
+    `retarget_interval` blocks actually took compared with `block_interval` seconds each,
+    by at most `max_adjustment` times either way. Other blocks reuse their parent's target.
+    A `retarget_interval` of 0 keeps the initial target forever.
+    """
+
+    def __init__(self, initial_target: int, block_interval: float = 10.0, retarget_interval: int = 10,
+                 max_adjustment: int = 4):
+        self.initial_target = initial_target
+        self.block_interval = block_interval
+        self.retarget_interval = retarget_interval
+        self.max_adjustment = max_adjustment
+
+    def target_for(self, height: int, block_at: Callable[[int], Any]) -> int:
+        """
+        Target for the block at `height`; `block_at(h)` returns the block (anything with
+        `target` and `timestamp`) at each lower height.
+        """
+        if height <= 1:
+            return self.initial_target
+        parent = block_at(height - 1)
+        target = int(parent.target, 16)
+        window = self.retarget_interval
+        # The genesis timestamp is fixed, so windows that would start at it are skipped
+        if not window or height % window or height - 1 - window < 1:
+            return target
+
+        expected = window * self.block_interval
+        actual = parent.timestamp - block_at(height - 1 - window).timestamp
+        actual = min(max(actual, expected / self.max_adjustment), expected * self.max_adjustment)
+        # Millisecond integers keep the result identical on every node
+        target = target * round(actual * 1000) // max(1, round(expected * 1000))
+        return max(1, min(MAX_TARGET, target))
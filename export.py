@@ -0,0 +1,346 @@
+import json
+import os
+import struct
+import zlib
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import codec
+from blockchain import Block
+from utxo import UTXOSet
+
+
+NDJSON = "ndjson"
+BINARY = "binary"
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", BINARY: "application/x-blockchain-stream"}
+
+# A binary block stream is this magic followed by length-prefixed codec records, one per block
+STREAM_MAGIC = b"BLKSTRM1"
+# A snapshot is gzip over this magic and length-prefixed codec records: a header, the blocks
+# (if included) and then one record per unspent output
+SNAPSHOT_MAGIC = b"BLKSNAP1"
+SNAPSHOT_VERSION = 1
+FRAME = struct.Struct("<I")
+# Larger records are treated as corrupt rather than buffered
+MAX_RECORD_SIZE = 64 * 1024 * 1024
+# Blocks read per lock acquisition while exporting
+EXPORT_BATCH = 100
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """The UTXO set at a block height, restored from a snapshot; see Blockchain(snapshot=...)."""
+
+    def __init__(self, height: int, block_hash: str, utxos: UTXOSet):
+        self.height = height
+        self.block_hash = block_hash
+        self.utxos = utxos
+
+
+def iter_blocks(chain, from_height: int = 0, to_height: Optional[int] = None, lock=None) -> Iterator[Block]:
+    """
+    Yields blocks from `from_height` to `to_height` (inclusive, default the tip), taking `lock`
+    (a locking.RWLock) for reading only briefly per batch, so writers are not held up. Raises
+    SnapshotError if the chain is reorganized below the blocks still to come meanwhile.
+    """
+    reading = lock.read if lock is not None else nullcontext
+    with reading():
+        end = len(chain) if to_height is None else min(len(chain), to_height + 1)
+        previous_hash = chain[from_height - 1].hash if 0 < from_height < end else None
+    for start in range(from_height, end, EXPORT_BATCH):
+        stop = min(end, start + EXPORT_BATCH)
+        with reading():
+            blocks = chain[start:stop]
+        if len(blocks) != stop - start:
+            raise SnapshotError("The chain was reorganized during the export.")
+        for block in blocks:
+            if previous_hash is not None and block.previous_hash != previous_hash:
+                raise SnapshotError("The chain was reorganized during the export.")
+            previous_hash = block.hash
+            yield block
+
+
+def encode_record(value: Any) -> bytes:
+    data = codec.encode(value)
+    return FRAME.pack(len(data)) + data
+
+
+def export_blocks(chain, from_height: int = 0, to_height: Optional[int] = None, fmt: str = NDJSON,
+                  lock=None) -> Iterator[bytes]:
+    """Yields a block stream in `fmt`, one block at a time, so memory use does not grow with the chain."""
+    if fmt == BINARY:
+        yield STREAM_MAGIC
+    for block in iter_blocks(chain, from_height, to_height, lock):
+        if fmt == BINARY:
+            yield encode_record(block)
+        else:
+            yield json.dumps(block.to_dict()).encode() + b"\n"
+
+
+class StreamReader:
+    """
+    Incremental parser for block streams fed in arbitrary chunks: NDJSON, or binary records
+    after `magic`. With no `fmt`, the format is detected from the first bytes. Binary records
+    are decoded with transaction objects (see codec.decode).
+    """
+
+    def __init__(self, fmt: Optional[str] = None, magic: bytes = STREAM_MAGIC):
+        self.fmt = fmt
+        self.magic = magic
+        self._buffer = bytearray()
+        self._started = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Adds bytes and returns every record completed by them; raises ValueError on bad data."""
+        self._buffer += chunk
+        if not self._started:
+            if len(self._buffer) < len(self.magic) and self.magic.startswith(bytes(self._buffer)):
+                return []  # Too short to tell yet
+            if self.fmt is None:
+                self.fmt = BINARY if self._buffer.startswith(self.magic) else NDJSON
+            if self.fmt == BINARY:
+                if not self._buffer.startswith(self.magic):
+                    raise ValueError("Not a binary block stream.")
+                del self._buffer[:len(self.magic)]
+            self._started = True
+        return self._read_binary() if self.fmt == BINARY else self._read_lines()
+
+    def close(self) -> List[Any]:
+        """Returns the last record of an NDJSON stream without a trailing newline; raises
+        ValueError if the stream ends partway through a record."""
+        if self.fmt == NDJSON and self._buffer.strip():
+            self._buffer += b"\n"
+            return self._read_lines()
+        if self._buffer.strip():
+            raise ValueError("Stream ends in the middle of a record.")
+        return []
+
+    def _read_lines(self) -> List[Any]:
+        records, start = [], 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = self._buffer[start:end]
+            if line.strip():
+                records.append(json.loads(line))
+            start = end + 1
+        del self._buffer[:start]
+        if len(self._buffer) > MAX_RECORD_SIZE:
+            raise ValueError("Record is too large.")
+        return records
+
+    def _read_binary(self) -> List[Any]:
+        records, start = [], 0
+        while len(self._buffer) - start >= FRAME.size:
+            (length,) = FRAME.unpack_from(self._buffer, start)
+            if length > MAX_RECORD_SIZE:
+                raise ValueError("Record is too large.")
+            end = start + FRAME.size + length
+            if end > len(self._buffer):
+                break
+            records.append(codec.decode(bytes(self._buffer[start + FRAME.size:end]), transactions=True))
+            start = end
+        del self._buffer[:start]
+        return records
+
+
+def read_blocks(chunks: Iterable[bytes], fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Block dicts from a stream read in chunks, e.g. a file opened in binary mode."""
+    reader = StreamReader(fmt)
+    for chunk in chunks:
+        yield from reader.feed(chunk)
+    yield from reader.close()
+
+
+class BlockImporter:
+    """
+    Adds streamed blocks to a Blockchain in batches through add_blocks, so every block is fully
+    validated. Blocks the chain already has are skipped, so an interrupted import can simply be
+    run again. The first rejected block stops the import.
+    """
+
+    def __init__(self, blockchain, batch_size: int = 500):
+        self.blockchain = blockchain
+        self.batch_size = batch_size
+        self.imported = 0
+        self.skipped = 0
+        self.error: Optional[Dict[str, Any]] = None
+        self._batch: List[Dict[str, Any]] = []
+
+    def add(self, blocks: Iterable[Dict[str, Any]]) -> bool:
+        """Queues blocks, importing full batches; returns False once a block has been rejected."""
+        for data in blocks:
+            if self.error is not None:
+                return False
+            if not isinstance(data, dict) or not isinstance(data.get("index"), int):
+                self.error = {"height": None, "detail": "Malformed block."}
+                return False
+            existing = self.blockchain.get_block(data["index"])
+            if existing is not None and existing.hash == data.get("hash") and not self._batch:
+                self.skipped += 1
+                continue
+            self._batch.append(data)
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        return self.error is None
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch or self.error is not None:
+            return
+        for data, result in zip(batch, self.blockchain.add_blocks(batch)):
+            if result["status"] != "accepted":
+                self.error = {"height": data.get("index"), "detail": result["detail"]}
+                return
+            self.imported += 1
+
+    def finish(self, error: Optional[str] = None) -> Dict[str, Any]:
+        """Imports what is still queued and reports; `error` records why the stream was cut short."""
+        if error is None:
+            self.flush()
+        elif self.error is None:
+            self.flush()
+            self.error = {"height": None, "detail": error}
+        return {
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "height": len(self.blockchain.chain) - 1,
+            "error": self.error,
+        }
+
+
+def import_blocks(blockchain, chunks: Iterable[bytes], fmt: Optional[str] = None,
+                  batch_size: int = 500) -> Dict[str, Any]:
+    """Imports a block stream read in chunks; see BlockImporter."""
+    importer = BlockImporter(blockchain, batch_size)
+    reader = StreamReader(fmt)
+    try:
+        for chunk in chunks:
+            if not importer.add(reader.feed(chunk)):
+                break
+        else:
+            importer.add(reader.close())
+    except ValueError as e:
+        return importer.finish(f"Malformed stream: {e}")
+    return importer.finish()
+
+
+def snapshot_chunks(blockchain, include_blocks: bool = True, level: int = 6) -> Iterator[bytes]:
+    """
+    Yields a gzip-compressed snapshot of `blockchain` at its current tip: the UTXO set and,
+    with `include_blocks`, every block up to it. Without blocks it only helps a node that
+    already has them (e.g. on restart) skip replaying them.
+    """
+    with blockchain.lock.read():
+        height = len(blockchain.chain) - 1
+        block_hash = blockchain.chain[height].hash
+        entries = blockchain.utxos.entries()
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    header = {"version": SNAPSHOT_VERSION, "height": height, "hash": block_hash,
+              "blocks": height + 1 if include_blocks else 0, "utxos": len(entries)}
+    yield compressor.compress(SNAPSHOT_MAGIC + encode_record(header))
+    if include_blocks:
+        last = None
+        for block in iter_blocks(blockchain.chain, 0, height, blockchain.lock):
+            last = block
+            chunk = compressor.compress(encode_record(block))
+            if chunk:
+                yield chunk
+        if last is None or last.hash != block_hash:
+            raise SnapshotError("The chain was reorganized during the snapshot.")
+    for (txid, index), amount, address in entries:
+        chunk = compressor.compress(encode_record([txid, index, amount, address]))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def write_snapshot(blockchain, path: str, include_blocks: bool = True) -> Dict[str, Any]:
+    """Writes a snapshot file atomically and returns its header."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in snapshot_chunks(blockchain, include_blocks):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return read_snapshot_header(path)
+
+
+def _snapshot_records(chunks: Iterable[bytes]) -> Iterator[Any]:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    reader = StreamReader(BINARY, magic=SNAPSHOT_MAGIC)
+    try:
+        for chunk in chunks:
+            yield from reader.feed(decompressor.decompress(chunk))
+        yield from reader.feed(decompressor.flush())
+    except zlib.error as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}")
+    except ValueError as e:
+        raise SnapshotError(f"Not a valid snapshot: {e}")
+    if not decompressor.eof:
+        raise SnapshotError("Snapshot is truncated.")
+    yield from reader.close()
+
+
+def _file_chunks(path: str, size: int = 1024 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def read_snapshot_header(path: str) -> Dict[str, Any]:
+    records = _snapshot_records(_file_chunks(path))
+    try:
+        return next(records)
+    except StopIteration:
+        raise SnapshotError("Snapshot is empty.")
+    finally:
+        records.close()
+
+
+def load_snapshot(chunks: Iterable[bytes], store=None, verify: bool = True) -> Snapshot:
+    """
+    Reads a snapshot. If it has blocks, they are appended to `store`, which must be empty;
+    with `verify`, their linkage, hashes and proof-of-work are checked on the way. Signatures
+    and the UTXO set are not re-derived: a snapshot is trusted like a checkpoint.
+    """
+    records = _snapshot_records(chunks)
+    header = next(records, None)
+    if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError("Unsupported snapshot version.")
+
+    if header["blocks"]:
+        if store is None or len(store):
+            raise SnapshotError("Blocks from a snapshot can only be restored into an empty store.")
+        previous_hash = None
+        for height in range(header["blocks"]):
+            data = next(records, None)
+            if not isinstance(data, dict):
+                raise SnapshotError("Snapshot is missing blocks.")
+            block = Block.from_dict(data)
+            if verify and (block.index != height or (previous_hash is not None and block.previous_hash != previous_hash)
+                           or block.hash != block.calculate_hash() or (height and not block.meets_target())):
+                raise SnapshotError(f"Snapshot has an invalid block at height {height}.")
+            store.append(block)
+            previous_hash = block.hash
+        if previous_hash != header["hash"]:
+            raise SnapshotError("Snapshot blocks do not end at its height.")
+
+    utxos = UTXOSet()
+    utxos.load(((txid, index), amount, address) for txid, index, amount, address in records)
+    if len(utxos.utxos) != header["utxos"]:
+        raise SnapshotError("Snapshot is missing unspent outputs.")
+    return Snapshot(header["height"], header["hash"], utxos)
+
+
+def load_snapshot_file(path: str, store=None, verify: bool = True) -> Snapshot:
+    return load_snapshot(_file_chunks(path), store, verify)
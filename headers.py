@@ -0,0 +1,198 @@
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from difficulty import DifficultyAdjuster, check_timestamp, meets_target
+from merkle import verify_proof
+
+
+# A packed header: a flag byte, then timestamp, previous hash, target, Merkle root, nonce and hash.
+# The height is the record's position. A flag of 0 marks a header that does not pack exactly (the
+# genesis block's previous hash "0", an integer timestamp); only its hash is packed and the header
+# itself is read from the chain instead.
+HEADER = struct.Struct("<Bd32s32s32sQ32s")
+PACKED = 1
+
+
+def _hex32(value: Any) -> Optional[bytes]:
+    """The 32 bytes of a 64-digit lowercase hex string, or None if it would not convert back exactly."""
+    if not isinstance(value, str) or len(value) != 64:
+        return None
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        return None
+    return raw if raw.hex() == value else None
+
+
+def pack_header(header: Dict[str, Any]) -> Optional[bytes]:
+    """The packed form of a header (see Block.header), or None if it would not unpack to the same values."""
+    if type(header.get("timestamp")) is not float or type(header.get("nonce")) is not int:
+        return None
+    if not 0 <= header["nonce"] < 1 << 64:
+        return None
+    hashes = [_hex32(header.get(name)) for name in ("previous_hash", "target", "merkle_root", "hash")]
+    if None in hashes:
+        return None
+    return HEADER.pack(PACKED, header["timestamp"], *hashes[:3], header["nonce"], hashes[3])
+
+
+def unpack_header(height: int, record: bytes) -> Dict[str, Any]:
+    _, timestamp, previous_hash, target, root, nonce, block_hash = HEADER.unpack(record)
+    return {"index": height, "timestamp": timestamp, "previous_hash": previous_hash.hex(), "target": target.hex(),
+            "merkle_root": root.hex(), "nonce": nonce, "hash": block_hash.hex()}
+
+
+class HeaderChain:
+    """
+    The headers of every block in `chain` (a list or storage.BlockStore), packed into one
+    fixed-size record per height: about 145 bytes each, so header requests never load block
+    bodies. The owner keeps it in step with the chain via append and truncate.
+
+    With `path`, the records are also written to that file and reloaded on the next start; a file
+    that does not match the chain (torn, shorter, or from another branch) is rebuilt from it.
+    """
+
+    def __init__(self, chain, path: Optional[str] = None):
+        self._chain = chain
+        self._records = bytearray()
+        # Heights whose headers did not pack, and the headers themselves
+        self._irregular: Dict[int, Dict[str, Any]] = {}
+        self.path = path
+        self._file = None
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                self._records = bytearray(f.read())
+            if self._matches_chain():
+                for height in range(len(self)):
+                    if self._records[height * HEADER.size] != PACKED:
+                        self._irregular[height] = chain[height].header()
+                self._file = open(path, "r+b")
+                self._file.seek(0, os.SEEK_END)
+                return
+            self._records = bytearray()
+        for block in chain:
+            self._add(block.header())
+        if path is not None:
+            self._file = open(path, "w+b")
+            self._file.write(self._records)
+            self._file.flush()
+
+    def _matches_chain(self) -> bool:
+        if len(self._records) % HEADER.size or len(self) != len(self._chain):
+            return False
+        return not len(self) or self._hash_at(len(self) - 1) == self._chain[-1].hash
+
+    def _hash_at(self, height: int) -> str:
+        start = (height + 1) * HEADER.size - 32
+        return self._records[start:start + 32].hex()
+
+    def __len__(self) -> int:
+        return len(self._records) // HEADER.size
+
+    def nbytes(self) -> int:
+        return len(self._records)
+
+    def _add(self, header: Dict[str, Any]) -> bytes:
+        record = pack_header(header)
+        if record is None:
+            self._irregular[len(self)] = header
+            record = bytes(HEADER.size - 32) + (_hex32(header.get("hash")) or bytes(32))
+        self._records += record
+        return record
+
+    def append(self, block):
+        if block.index != len(self):
+            raise ValueError(f"Expected the header for height {len(self)}, got {block.index}.")
+        record = self._add(block.header())
+        if self._file is not None:
+            self._file.write(record)
+            self._file.flush()
+
+    def truncate(self, height: int):
+        """Drops the headers from `height` up, as Blockchain does with blocks during a reorganization."""
+        if height >= len(self):
+            return
+        del self._records[height * HEADER.size:]
+        for dropped in [h for h in self._irregular if h >= height]:
+            del self._irregular[dropped]
+        if self._file is not None:
+            self._file.seek(len(self._records))
+            self._file.truncate()
+            self._file.flush()
+
+    def header(self, height: int) -> Dict[str, Any]:
+        if height < 0:
+            height += len(self)
+        if not 0 <= height < len(self):
+            raise IndexError("header height out of range")
+        irregular = self._irregular.get(height)
+        if irregular is not None:
+            return dict(irregular)
+        start = height * HEADER.size
+        return unpack_header(height, self._records[start:start + HEADER.size])
+
+    def headers(self, from_height: int, count: int) -> List[Dict[str, Any]]:
+        return [self.header(height) for height in range(from_height, min(from_height + count, len(self)))]
+
+    def block_hashes(self) -> Iterator[Tuple[int, str]]:
+        """(height, hash) for every block, without building header dicts."""
+        for height in range(len(self)):
+            irregular = self._irregular.get(height)
+            yield height, irregular["hash"] if irregular is not None else self._hash_at(height)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def check_headers(headers: List[Dict[str, Any]], difficulty: DifficultyAdjuster,
+                  checked: Sequence[Dict[str, Any]] = ()) -> Optional[Tuple[int, str]]:
+    """
+    What a light client checks about a run of consecutive headers: heights, linkage, hashes,
+    timestamps, and proof-of-work against the target `difficulty` (the network's rules, as the
+    nodes configure them) expects at each height. `checked` holds every header below the first
+    one, as accepted by earlier calls; when it is empty the run must start with the network's
+    genesis block. Like validation.check_block_range, returns (height, reason) for the first bad
+    header, or None.
+    """
+    from blockchain import Block, genesis_block  # blockchain imports this module
+
+    blocks: List[Block] = []
+
+    def block_at(height: int) -> Block:
+        return Block.from_dict(checked[height]) if height < len(checked) else blocks[height - len(checked)]
+
+    previous_hash = checked[-1]["hash"] if checked else None
+    for header in headers:
+        block = Block.from_dict(header)
+        if block.index != len(checked) + len(blocks):
+            return block.index, "headers are not consecutive"
+        if block.hash != block.calculate_hash():
+            return block.index, "hash does not match header"
+        if block.index == 0:
+            if block.hash != genesis_block(difficulty.initial_target).hash:
+                return 0, "not the network's genesis block"
+        else:
+            if block.previous_hash != previous_hash:
+                return block.index, "previous hash does not match"
+            if int(block.target, 16) != difficulty.target_for(block.index, block_at):
+                return block.index, "unexpected proof-of-work target"
+            reason = check_timestamp(block.timestamp, block.index, block_at)
+            if reason is not None:
+                return block.index, reason
+            if not meets_target(block.hash, int(block.target, 16)):
+                return block.index, "insufficient proof-of-work"
+        previous_hash = block.hash
+        blocks.append(block)
+    return None
+
+
+def verify_inclusion(proof: Dict[str, Any], header: Dict[str, Any]) -> bool:
+    """
+    Checks a GET /proof/{txid} response against a header the client already trusts (e.g. one that
+    passed check_headers): the proof must be for that block and lead from the txid to its Merkle root.
+    """
+    return (proof["block_hash"] == header["hash"] and proof["block_index"] == header["index"]
+            and verify_proof(proof["txid"], proof["proof"], header["merkle_root"]))
@@ -0,0 +1,94 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from merkle import transaction_hash
+
+
+# A transaction's location, (height, position in block), packed into one integer
+POSITION_BITS = 24
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+Location = Tuple[int, int]
+
+
+def pack_location(height: int, position: int) -> int:
+    return height << POSITION_BITS | position
+
+
+def unpack_location(location: int) -> Location:
+    return location >> POSITION_BITS, location & POSITION_MASK
+
+
+def transaction_addresses(transaction) -> List[str]:
+    """Every address a transaction involves: its sender, receiver and output owners, each once."""
+    addresses = [transaction["sender"], transaction["receiver"]]
+    addresses.extend(utxo.get("address") for utxo in transaction.get("output_utxos") or [])
+    return list(dict.fromkeys(address for address in addresses if address))
+
+
+class ChainIndex:
+    """
+    Secondary indexes over the blocks of a chain: transaction hash -> location and
+    address -> locations of the transactions involving it, oldest first.
+
+    Blocks are added and removed at the tip only, as the chain grows or is reorganized, so every
+    address's history stays sorted and removing a block only trims the ends of its histories.
+    Locations are packed into integers and histories into arrays, and hashes are held as bytes,
+    which keeps the indexes to a fraction of the size of the blocks themselves.
+    """
+
+    def __init__(self):
+        self.transactions: Dict[bytes, int] = {}
+        self.addresses: Dict[str, array] = {}
+
+    def rebuild(self, chain: Iterable):
+        self.transactions.clear()
+        self.addresses.clear()
+        for block in chain:
+            self.add_block(block)
+
+    def add_block(self, block):
+        for position, transaction in enumerate(block.transactions):
+            location = pack_location(block.index, position)
+            self.transactions[bytes.fromhex(transaction_hash(transaction))] = location
+            for address in transaction_addresses(transaction):
+                history = self.addresses.get(address)
+                if history is None:
+                    history = self.addresses[address] = array("Q")
+                history.append(location)
+
+    def remove_block(self, block):
+        """Undoes add_block for the block at the tip."""
+        for position, transaction in reversed(list(enumerate(block.transactions))):
+            location = pack_location(block.index, position)
+            txid = bytes.fromhex(transaction_hash(transaction))
+            if self.transactions.get(txid) == location:
+                del self.transactions[txid]
+            for address in transaction_addresses(transaction):
+                history = self.addresses.get(address)
+                if history and history[-1] == location:
+                    history.pop()
+                    if not history:
+                        del self.addresses[address]
+
+    def locate(self, txid: str) -> Optional[Location]:
+        try:
+            location = self.transactions.get(bytes.fromhex(txid))
+        except ValueError:
+            return None
+        return None if location is None else unpack_location(location)
+
+    def history(self, address: str, offset: int = 0, limit: Optional[int] = None,
+                newest_first: bool = True) -> Tuple[List[Location], int]:
+        """One page of the locations of `address`'s transactions, and how many there are in total."""
+        history = self.addresses.get(address, ())
+        total = len(history)
+        if offset >= total:
+            return [], total
+        if newest_first:
+            end = total - offset
+            start = 0 if limit is None else max(0, end - limit)
+            page = reversed(history[start:end])
+        else:
+            page = history[offset:None if limit is None else offset + limit]
+        return [unpack_location(location) for location in page], total
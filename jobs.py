@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from blockchain import Blockchain
+
+
+class MiningJob:
+    """State of one background mining request, as reported by the status endpoints."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued -> running -> done | failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.attempts = 0
+        self.block: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def hash_rate(self) -> float:
+        elapsed = self.elapsed
+        return self.attempts / elapsed if elapsed else 0.0
+
+    def update_progress(self, attempts: int):
+        self.attempts = attempts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "hash_rate": round(self.hash_rate, 1),
+            "elapsed": round(self.elapsed, 3),
+            "block": self.block,
+            "error": self.error,
+        }
+
+
+class MiningJobManager:
+    """
+    Runs Blockchain.mine_block on a background executor so API handlers return immediately.
+    Jobs run one at a time (each one already uses every core); the most recent
+    `max_finished` finished jobs are kept for status queries.
+    """
+
+    def __init__(self, blockchain: Blockchain, max_finished: int = 1000):
+        self.blockchain = blockchain
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, MiningJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="miner")
+
+    def submit(self, miner_address: Optional[str] = None) -> MiningJob:
+        """Queues a mining job; its coinbase pays `miner_address`, or the node's own miner address."""
+        job = MiningJob()
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, miner_address)
+        return job
+
+    def get(self, job_id: str) -> Optional[MiningJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def _run(self, job: MiningJob, miner_address: Optional[str] = None):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            block = self.blockchain.mine_block(progress=job.update_progress, miner_address=miner_address)
+            if block is None:
+                job.error = "No transactions to mine."
+                job.status = "failed"
+            else:
+                job.block = block.to_dict()
+                job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
@@ -1,8 +1,24 @@
 # key_signature_generator.py
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
 
+from verification import LRUCache, address_of, signing_payload
+
+# Parsed private keys by PEM digest; parsing a PEM costs about as much as signing with it
+_private_keys = LRUCache(4096)
+
+# Below this many keys or signatures, a process pool costs more than it saves
+PARALLEL_THRESHOLD = 256
+
+
 def generate_key_pair():
     """
     Generates a new private key and its corresponding public key.
@@ -27,19 +43,184 @@ def generate_key_pair():
 
     return private_pem.decode(), public_pem.decode()
 
+
+def load_private_key(private_key_pem):
+    """
+    Parses a private key PEM, reusing the key object if it was parsed before.
+    Args:
+        private_key_pem (str): Private key in PEM format
+    Returns:
+        The private key object
+    """
+    digest = sha256(private_key_pem.encode()).digest()
+    private_key = _private_keys.get(digest)
+    if private_key is None:
+        private_key = serialization.load_pem_private_key(private_key_pem.encode(), password=None)
+        _private_keys.put(digest, private_key)
+    return private_key
+
+
 def sign_transaction(private_key_pem, transaction_message):
     """
     Signs the transaction message using the private key.
     Args:
         private_key_pem (str): Private key in PEM format
-        transaction_message (str): Transaction message to sign
+        transaction_message (str or bytes): Transaction message to sign, e.g. verification.signing_payload(tx)
     Returns:
         signature_hex (str): The hexadecimal format of the generated signature
     """
-    private_key = serialization.load_pem_private_key(private_key_pem.encode(), password=None)
-    signature = private_key.sign(
-        transaction_message.encode(),
+    if isinstance(transaction_message, str):
+        transaction_message = transaction_message.encode()
+    signature = load_private_key(private_key_pem).sign(
+        transaction_message,
         ec.ECDSA(hashes.SHA256())
     )
 
     return signature.hex()
+
+
+def key_id(public_pem):
+    """
+    A short identifier for a key pair, derived from its public key. It is also the key's
+    address (see verification.address_of): the sender of its transactions and owner of its outputs.
+    Args:
+        public_pem (str): Public key in PEM format
+    Returns:
+        key_id (str): 32 hex digits
+    """
+    return address_of(public_pem)
+
+
+def _generate_chunk(count: int) -> List[Tuple[str, str]]:
+    return [generate_key_pair() for _ in range(count)]
+
+
+def _sign_chunk(items: List[Tuple[str, bytes]]) -> List[str]:
+    return [sign_transaction(private_key_pem, payload) for private_key_pem, payload in items]
+
+
+def _chunks(items: Sequence, workers: int) -> List[Sequence]:
+    size = max(1, -(-len(items) // (workers * 4)))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _pool_size(count: int, workers: Optional[int]) -> int:
+    workers = workers or os.cpu_count() or 1
+    return 1 if count < PARALLEL_THRESHOLD else workers
+
+
+def generate_key_pairs(count, workers=None):
+    """
+    Generates many key pairs, spread over `workers` processes (default: one per core) when
+    there are enough of them to be worth it.
+    Returns:
+        A list of (private_pem, public_pem) tuples
+    """
+    workers = _pool_size(count, workers)
+    if workers == 1:
+        return _generate_chunk(count)
+    sizes = [len(chunk) for chunk in _chunks(range(count), workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [pair for pairs in pool.map(_generate_chunk, sizes) for pair in pairs]
+
+
+def sign_transactions(signing, workers=None):
+    """
+    Signs many transactions, spread over `workers` processes (default: one per core) when there
+    are enough of them to be worth it. Each worker parses every key it uses only once.
+    Args:
+        signing (list): (private_pem, public_pem, transaction) tuples
+    Returns:
+        Copies of the transactions with `public_key` and `signature` filled in, in order
+    """
+    signed = [dict(transaction, public_key=public_pem) for _, public_pem, transaction in signing]
+    items = [(private_pem, signing_payload(transaction)) for (private_pem, _, _), transaction in zip(signing, signed)]
+    workers = _pool_size(len(items), workers)
+    if workers == 1:
+        signatures = _sign_chunk(items)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            signatures = [signature for chunk in pool.map(_sign_chunk, _chunks(items, workers))
+                          for signature in chunk]
+    for transaction, signature in zip(signed, signatures):
+        transaction["signature"] = signature
+    return signed
+
+
+class Wallet:
+    """
+    Key pairs by key id (see key_id), with signing. Private keys are parsed once and then kept as
+    key objects. With `path`, keys are loaded from and saved to that JSON file, readable only by
+    its owner.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._keys: Dict[str, Tuple[str, str]] = {}  # key id -> (private PEM, public PEM)
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for entry in json.load(f):
+                    self._keys[entry["key_id"]] = (entry["private_key"], entry["public_key"])
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key_id: str) -> bool:
+        return key_id in self._keys
+
+    def key_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._keys)
+
+    def public_key(self, key_id: str) -> str:
+        """Raises KeyError for unknown key ids, as do the other lookups."""
+        return self._keys[key_id][1]
+
+    def private_key_pem(self, key_id: str) -> str:
+        return self._keys[key_id][0]
+
+    def add(self, private_pem: str) -> str:
+        """Adds an existing private key and returns its key id; raises ValueError if it is not a P-256 key."""
+        private_key = load_private_key(private_pem)
+        if not isinstance(private_key, ec.EllipticCurvePrivateKey) or not isinstance(private_key.curve, ec.SECP256R1):
+            raise ValueError("Only P-256 ECDSA keys are supported.")
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+        return self._add_pairs([(private_pem, public_pem)])[0]
+
+    def generate(self, count: int = 1, workers: Optional[int] = None) -> List[str]:
+        """Generates `count` new key pairs (in parallel for large counts) and returns their key ids."""
+        return self._add_pairs(generate_key_pairs(count, workers))
+
+    def _add_pairs(self, pairs: List[Tuple[str, str]]) -> List[str]:
+        ids = [key_id(public_pem) for _, public_pem in pairs]
+        with self._lock:
+            self._keys.update(zip(ids, pairs))
+            self._save()
+        return ids
+
+    def _save(self):
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump([{"key_id": kid, "private_key": private_pem, "public_key": public_pem}
+                       for kid, (private_pem, public_pem) in self._keys.items()], f)
+        os.replace(tmp_path, self.path)
+
+    def sign(self, key_id: str, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of `transaction` with the key's `public_key` and a signature over signing_payload."""
+        return self.sign_many(key_id, [transaction], workers=1)[0]
+
+    def sign_many(self, key_ids: Union[str, Sequence[str]], transactions: List[Dict[str, Any]],
+                  workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Signs transactions with one key, or with `key_ids[i]` for transaction i; see sign_transactions."""
+        if isinstance(key_ids, str):
+            key_ids = [key_ids] * len(transactions)
+        if len(key_ids) != len(transactions):
+            raise ValueError("Expected one key id per transaction.")
+        pairs = [self._keys[kid] for kid in key_ids]
+        return sign_transactions([(private_pem, public_pem, transaction)
+                                  for (private_pem, public_pem), transaction in zip(pairs, transactions)], workers)
@@ -1,19 +1,92 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
-from blockchain import Blockchain
+import asyncio
+import json
+import os
+import re
+import time
+from hashlib import sha256
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Any, Optional, Union
+import codec
+import export
+import metrics
+from blockchain import Block, Blockchain
+from difficulty import target_work
+from jobs import MiningJobManager
+from profiler import SamplingProfiler, summary as profile_summary
+from storage import BlockStore
+from sync import NodeSync
+from validation import ChainVerifier
+from verification import LRUCache
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
 from cryptography.exceptions import InvalidSignature
 
 app = FastAPI()
-blockchain = Blockchain()
+# Blocks are persisted here and reloaded on restart
+data_dir = os.environ.get("BLOCKCHAIN_DATA_DIR", "chain_data")
+block_store = BlockStore(data_dir)
+# Target seconds between blocks; proof-of-work is retargeted towards it every few blocks
+block_interval = float(os.environ.get("BLOCKCHAIN_BLOCK_INTERVAL", "10"))
+# Address paid the reward for blocks mined here when POST /mine_block names none (see utxo.py)
+miner_address = os.environ.get("BLOCKCHAIN_MINER_ADDRESS") or None
+# UTXO set saved on shutdown, so a restart need not replay every block (see export.py)
+state_path = os.path.join(data_dir, "state.snapshot")
+try:
+    state = export.load_snapshot_file(state_path) if os.path.exists(state_path) else None
+except export.SnapshotError:
+    state = None
+# Packed block headers for /headers and /proof, so neither has to load block bodies
+blockchain = Blockchain(store=block_store, block_interval=block_interval, snapshot=state,
+                        headers_path=os.path.join(data_dir, "headers.dat"), miner_address=miner_address)
+# Re-validate blocks stored since the last trusted checkpoint before serving them
+chain_verifier = ChainVerifier(blockchain.difficulty_adjuster, blockchain.verifier,
+                               checkpoint_path=os.path.join(data_dir, "checkpoints.json"))
+startup_report = chain_verifier.verify(blockchain.chain)
+if not startup_report["valid"]:
+    raise RuntimeError(f"Stored chain is invalid: {startup_report['error']}")
+mining_jobs = MiningJobManager(blockchain)
+node_sync = NodeSync(blockchain)
+
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 10_000
+MAX_HEADERS = 2000
+# An address: the first 32 hex digits of the SHA-256 of a public key (see verification.address_of)
+ADDRESS_PATTERN = re.compile("[0-9a-f]{32}")
+# Sampling profiler for GET /debug/profile; off unless BLOCKCHAIN_PROFILING=1, as it exposes code paths
+profiling_enabled = os.environ.get("BLOCKCHAIN_PROFILING") == "1"
+profiler_lock = asyncio.Lock()
+
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to handle API requests, including streaming the response.",
+    ["method", "route", "status"])
+metrics.REGISTRY.gauge("blockchain_height", "Height of the chain tip.", function=lambda: len(blockchain.chain) - 1)
+metrics.REGISTRY.gauge("blockchain_mempool_transactions", "Transactions waiting to be mined.",
+                       function=lambda: len(blockchain.mempool))
+metrics.REGISTRY.gauge("blockchain_mempool_bytes", "Serialized size of the transactions waiting to be mined.",
+                       function=lambda: blockchain.mempool.total_bytes)
+metrics.REGISTRY.gauge("blockchain_utxos", "Unspent transaction outputs.", function=lambda: len(blockchain.utxos.utxos))
+metrics.REGISTRY.gauge("blockchain_hash_rate", "Hashes per second over the blocks this node mined recently.",
+                       function=lambda: blockchain.mining_stats.summary(recent=0)["hash_rate"])
+metrics.REGISTRY.gauge("blockchain_difficulty", "Expected hashes to mine the next block.",
+                       function=lambda: target_work(blockchain.next_target()))
+
+# Blocks never change once appended, so each one is serialized only once per format (keyed by hash)
+block_json_cache = LRUCache(10_000)
+block_binary_cache = LRUCache(10_000)
 
 class UTXO(BaseModel):
     txid: str
     index: int
     amount: float
+    # Owner of an output UTXO; defaults to the transaction's receiver
+    address: Optional[str] = None
+
+class Peer(BaseModel):
+    url: str
 
 class Transaction(BaseModel):
     sender: str
@@ -25,35 +98,379 @@ class Transaction(BaseModel):
     output_utxos: List[UTXO]
 
 
+@app.on_event("shutdown")
+def close_block_store():
+    # The store and header file are closed even if the snapshot cannot be written
+    try:
+        export.write_snapshot(blockchain, state_path, include_blocks=False)
+    finally:
+        try:
+            block_store.close()
+        finally:
+            blockchain.headers.close()
+
+
+class RequestMetricsMiddleware:
+    """Records every request in http_request_duration_seconds, streamed response bodies included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Routing stores the matched route in the scope; its template keeps /block/1 and
+            # /block/2 in one series
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"],
+                                    route=route.path if route is not None else "unmatched", status=status)
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def block_json(block: Block) -> str:
+    cached = block_json_cache.get(block.hash)
+    if cached is None:
+        with metrics.timed("serialize"):
+            cached = json.dumps(block.to_dict())
+        block_json_cache.put(block.hash, cached)
+    return cached
+
+
+def block_binary(block: Block) -> bytes:
+    cached = block_binary_cache.get(block.hash)
+    if cached is None:
+        with metrics.timed("serialize_binary"):
+            cached = codec.encode(block)
+        block_binary_cache.put(block.hash, cached)
+    return cached
+
+
+def wants_binary(request: Request) -> bool:
+    """Whether the client asked for the compact binary encoding (see codec.py) instead of JSON."""
+    return codec.CONTENT_TYPE in request.headers.get("accept", "")
+
+
+def cached_response(request: Request, body: Union[str, bytes], etag: str,
+                    media_type: str = "application/json") -> Response:
+    """Sends a pre-serialized body with an ETag, or 304 if the client already has this version."""
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
 @app.get("/chain")
-def get_chain():
-    return {"chain": [block.__dict__ for block in blockchain.chain]}
+def get_chain(request: Request, from_height: int = Query(0, ge=0),
+              limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)):
+    """Returns the chain from `from_height`; with `limit`, one page plus the height of the next page."""
+    with blockchain.lock.read():
+        length = len(blockchain.chain)
+        end = length if limit is None else min(length, from_height + limit)
+        blocks = blockchain.chain[from_height:end]
+    next_height = end if end < length else None
+
+    # The body also carries the chain length, which changes even when this page does not
+    etag = sha256(f"{','.join(block.hash for block in blocks)}|{next_height}|{length}".encode()).hexdigest()
+    if wants_binary(request):
+        body = codec.encode({"chain": [codec.Raw(block_binary(block)) for block in blocks],
+                             "length": length, "next_height": next_height})
+        return cached_response(request, body, f'"{etag}.bin"', codec.CONTENT_TYPE)
+    body = (f'{{"chain":[{",".join(block_json(block) for block in blocks)}],'
+            f'"length":{length},"next_height":{json.dumps(next_height)}}}')
+    return cached_response(request, body, f'"{etag}"')
 
 
-@app.post("/mine_block")
-def mine_block():
-    block = blockchain.mine_block()
+def block_response(request: Request, block: Optional[Block]) -> Response:
     if block is None:
+        raise HTTPException(status_code=404, detail="Block not found.")
+    if wants_binary(request):
+        return cached_response(request, block_binary(block), f'"{block.hash}.bin"', codec.CONTENT_TYPE)
+    return cached_response(request, block_json(block), f'"{block.hash}"')
+
+
+@app.get("/block/{height}")
+def get_block(request: Request, height: int):
+    return block_response(request, blockchain.get_block(height))
+
+
+@app.get("/block/by_hash/{block_hash}")
+def get_block_by_hash(request: Request, block_hash: str):
+    return block_response(request, blockchain.get_block_by_hash(block_hash))
+
+
+@app.get("/headers")
+def get_headers(request: Request, from_height: int = Query(0, ge=0, alias="from"),
+                count: int = Query(MAX_HEADERS, ge=1, le=MAX_HEADERS)):
+    """
+    Block headers only (no transactions), for header-first sync and light clients. They come from
+    the packed header chain, so no block bodies are read.
+    """
+    result = blockchain.get_headers(from_height, count)
+    if wants_binary(request):
+        return Response(codec.encode(result), media_type=codec.CONTENT_TYPE, headers={"Vary": "Accept"})
+    return result
+
+
+@app.get("/peers")
+def get_peers():
+    return {"peers": list(node_sync.peers)}
+
+
+@app.post("/peers")
+def register_peer(peer: Peer):
+    node_sync.register_peer(peer.url)
+    return {"message": "Peer registered.", "peers": list(node_sync.peers)}
+
+
+@app.post("/sync")
+def sync_with_peers():
+    """Catches up with registered peers, switching to any branch with more proof-of-work."""
+    return {"results": node_sync.sync(), "height": len(blockchain.chain) - 1}
+
+
+@app.post("/mine_block", status_code=202)
+def mine_block(miner_address: Optional[str] = None):
+    """Starts mining; the block's coinbase pays `miner_address`, or the node's BLOCKCHAIN_MINER_ADDRESS."""
+    if miner_address is not None and not ADDRESS_PATTERN.fullmatch(miner_address):
+        raise HTTPException(status_code=400, detail="Miner address must be 32 lowercase hex digits.")
+    if not len(blockchain.mempool) and (miner_address or blockchain.miner_address) is None:
         raise HTTPException(status_code=400, detail="No transactions to mine.")
-    return {"message": "Block mined successfully!", "block": block.__dict__}
+    job = mining_jobs.submit(miner_address)
+    return {"message": "Mining started.", "job_id": job.id, "status": job.status}
+
+
+def get_mining_job_or_404(job_id: str):
+    job = mining_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Mining job not found.")
+    return job
+
+
+@app.get("/mine_block/{job_id}")
+def get_mining_job(job_id: str):
+    return get_mining_job_or_404(job_id).to_dict()
+
+
+@app.get("/mine_block/{job_id}/events")
+async def stream_mining_job(job_id: str, interval: float = Query(0.5, gt=0.05, le=10)):
+    """Server-sent events: `progress` with the hash rate while mining, then `done` or `failed`."""
+    job = get_mining_job_or_404(job_id)
+
+    async def events():
+        while not job.finished:
+            yield f"event: progress\ndata: {json.dumps(job.to_dict())}\n\n"
+            await asyncio.sleep(interval)
+        yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/mining/stats")
+def get_mining_stats():
+    """Current proof-of-work target and block cadence, plus per-block telemetry for blocks mined here."""
+    return blockchain.get_mining_stats()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Counters, gauges and latency histograms in the Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/debug/profile")
+async def profile(seconds: float = Query(10.0, gt=0, le=300), interval: float = Query(0.005, ge=0.001, le=1),
+                  format: str = "folded"):
+    """
+    Samples every thread's stack for `seconds` and returns them folded for flame graph tools
+    (format=folded), or the share of samples per function (format=summary). Needs BLOCKCHAIN_PROFILING=1.
+    """
+    if not profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set BLOCKCHAIN_PROFILING=1.")
+    if format not in ("folded", "summary"):
+        raise HTTPException(status_code=400, detail="Format must be folded or summary.")
+    if profiler_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being taken.")
+    async with profiler_lock:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    if format == "summary":
+        return {"samples": profiler.samples, "functions": profile_summary(profiler)}
+    return Response(profiler.folded(), media_type="text/plain")
 
 
 @app.post("/new_transaction")
 def add_transaction(transaction: Transaction):
     try:
-        # Validate transaction's inputs (UTXO)
-        if not blockchain.is_valid_transaction(transaction.dict()):
-            raise HTTPException(status_code=400, detail="Invalid transaction or UTXOs.")
-        
-        blockchain.add_transaction(transaction.dict())
-        return {"message": "Transaction added successfully!"}
+        # add_transaction validates the signature itself; verifying here as well would do it twice
+        txid = blockchain.add_transaction(transaction.dict())
+        return {"message": "Transaction added successfully!", "txid": txid}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def read_batch(request: Request) -> List[Any]:
+    """Reads a request body that is a JSON array, NDJSON (one JSON value per line) or a binary list."""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith(codec.CONTENT_TYPE):
+            items = codec.decode(await request.body())
+        elif "ndjson" in content_type or "jsonl" in content_type:
+            items, buffer = [], b""
+            async for chunk in request.stream():
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                items.extend(json.loads(line) for line in lines if line.strip())
+                if len(items) > MAX_BATCH_SIZE:
+                    break
+            if buffer.strip():
+                items.append(json.loads(buffer))
+        else:
+            items = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed JSON: {e}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array, NDJSON or a binary list.")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} items per request.")
+    return items
+
+
+@app.post("/new_transactions")
+async def add_transactions(request: Request):
+    """Adds a batch of transactions; returns one result per item, in order."""
+    items = await read_batch(request)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    valid_positions, transactions = [], []
+    for position, item in enumerate(items):
+        try:
+            transactions.append(Transaction(**item).dict())
+            valid_positions.append(position)
+        except (ValidationError, TypeError) as e:
+            results[position] = {"status": "rejected", "detail": str(e)}
+
+    added = await run_in_threadpool(blockchain.add_transactions, transactions)
+    for position, result in zip(valid_positions, added):
+        results[position] = result
+    return {"results": [{"index": position, **result} for position, result in enumerate(results)]}
+
+
+@app.post("/add_blocks")
+async def add_blocks(request: Request):
+    """Adds a batch of consecutive blocks in order; returns one result per item."""
+    items = await read_batch(request)
+    if not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="Every block must be a JSON object.")
+    added = await run_in_threadpool(blockchain.add_blocks, items)
+    return {"results": [{"index": position, **result} for position, result in enumerate(added)]}
+
+
+@app.get("/export")
+def export_chain(format: str = export.NDJSON, from_height: int = Query(0, ge=0),
+                 to_height: Optional[int] = Query(None, ge=0)):
+    """Streams blocks as NDJSON or a binary block stream (see export.py), one block at a time."""
+    if format not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(export.MEDIA_TYPES)}.")
+    if from_height >= len(blockchain.chain):
+        raise HTTPException(status_code=404, detail="Height out of range.")
+    return StreamingResponse(export.export_blocks(blockchain.chain, from_height, to_height, format, blockchain.lock),
+                             media_type=export.MEDIA_TYPES[format])
+
+
+@app.post("/import")
+async def import_chain(request: Request, format: Optional[str] = None):
+    """
+    Adds blocks from a streamed export, validating each one; blocks this node already has are
+    skipped. The format is detected from the body unless given.
+    """
+    if format is not None and format not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(export.MEDIA_TYPES)}.")
+    importer = export.BlockImporter(blockchain)
+    reader = export.StreamReader(format)
+    try:
+        async for chunk in request.stream():
+            if not await run_in_threadpool(lambda: importer.add(reader.feed(chunk))):
+                break
+        else:
+            await run_in_threadpool(lambda: importer.add(reader.close()))
+        report = await run_in_threadpool(importer.finish)
+    except ValueError as e:
+        report = await run_in_threadpool(importer.finish, f"Malformed stream: {e}")
+    if report["error"] is not None:
+        raise HTTPException(status_code=400, detail=report)
+    return report
+
+
+@app.get("/snapshot")
+def get_snapshot(include_blocks: bool = True):
+    """Streams a gzip-compressed snapshot of the blocks and UTXO set at the current tip."""
+    return StreamingResponse(export.snapshot_chunks(blockchain, include_blocks), media_type="application/gzip",
+                             headers={"Content-Disposition": 'attachment; filename="chain.snapshot"'})
+
+
+@app.get("/balance/{address}")
+def get_balance(address: str):
+    return {"address": address, "balance": blockchain.get_balance(address)}
+
+
+@app.get("/utxos/{address}")
+def get_utxos(address: str):
+    return {"address": address, "utxos": blockchain.get_utxos(address)}
+
+
+@app.get("/tx/{txid}")
+def get_transaction(txid: str):
+    transaction = blockchain.get_transaction(txid)
+    if transaction is None:
+        raise HTTPException(status_code=404, detail="Transaction not found.")
+    return transaction
+
+
+@app.get("/address/{address}/history")
+def get_address_history(address: str, offset: int = Query(0, ge=0),
+                        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), order: str = "desc"):
+    """Confirmed transactions involving `address`, newest first (or oldest first with order=asc)."""
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Order must be asc or desc.")
+    history = blockchain.get_address_history(address, offset, limit, newest_first=order == "desc")
+    end = offset + len(history["transactions"])
+    history["next_offset"] = end if end < history["total"] else None
+    return history
+
+
+@app.get("/proof/{txid}")
+def get_transaction_proof(txid: str):
+    proof = blockchain.get_transaction_proof(txid)
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Transaction not found.")
+    return proof
 
 
 @app.post("/add_block")
 def add_block(block_data: Dict[str, Any]):
-    success = blockchain.add_block(block_data)
+    try:
+        success = blockchain.add_block(block_data)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Malformed block.")
     if not success:
         raise HTTPException(status_code=400, detail="Invalid block.")
     return {"message": "Block added to the chain successfully!"}
@@ -0,0 +1,139 @@
+import heapq
+import itertools
+import threading
+from typing import List, Dict, Any, Optional
+
+from merkle import serialize_transaction
+
+
+class MempoolEntry:
+    __slots__ = ("txid", "transaction", "fee", "size", "fee_rate", "seq")
+
+    def __init__(self, txid: str, transaction: Dict[str, Any], fee: float, seq: int):
+        self.txid = txid
+        self.transaction = transaction
+        self.fee = fee
+        self.size = len(serialize_transaction(transaction))
+        self.fee_rate = fee / self.size
+        self.seq = seq
+
+
+class Mempool:
+    """
+    Pending transactions ordered by fee rate (fee per serialized byte), oldest first on ties.
+
+    The pool is bounded by `max_count` transactions and `max_bytes` serialized bytes; when it is
+    full, the lowest fee rate transactions are evicted to make room, and a newcomer that would
+    itself be the cheapest is rejected. Two heaps with lazy deletion give O(log n) insertion and
+    cheapest-first eviction; selecting the best k transactions walks the heap in O(k log k).
+    """
+
+    def __init__(self, max_count: int = 50_000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.entries: Dict[str, MempoolEntry] = {}
+        self.total_bytes = 0
+        self._best: List = []      # (-fee_rate, seq, txid)
+        self._cheapest: List = []  # (fee_rate, -seq, txid)
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, txid: str) -> bool:
+        return txid in self.entries
+
+    def add(self, txid: str, transaction: Dict[str, Any], fee: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Adds a transaction and returns the transactions evicted to make room for it.
+        Raises ValueError for duplicates or when the pool is full of better-paying transactions.
+        """
+        with self._lock:
+            if txid in self.entries:
+                raise ValueError("Transaction already in mempool.")
+            entry = MempoolEntry(txid, transaction, fee, next(self._seq))
+            if entry.size > self.max_bytes:
+                raise ValueError("Transaction is larger than the mempool.")
+
+            victims = []
+            count, size = len(self.entries) + 1, self.total_bytes + entry.size
+            while count > self.max_count or size > self.max_bytes:
+                self._compact(self._cheapest)
+                item = heapq.heappop(self._cheapest)
+                victim = self.entries[item[2]]
+                if victim.fee_rate >= entry.fee_rate:
+                    for evicted in victims + [victim]:
+                        heapq.heappush(self._cheapest, (evicted.fee_rate, -evicted.seq, evicted.txid))
+                    raise ValueError("Mempool is full.")
+                victims.append(victim)
+                count, size = count - 1, size - victim.size
+
+            for victim in victims:
+                self._discard(victim.txid)
+            self.entries[txid] = entry
+            self.total_bytes += entry.size
+            heapq.heappush(self._best, (-entry.fee_rate, entry.seq, txid))
+            heapq.heappush(self._cheapest, (entry.fee_rate, -entry.seq, txid))
+            return [victim.transaction for victim in victims]
+
+    def _compact(self, heap: List):
+        # Drop stale heads left behind by removals
+        while heap and heap[0][2] not in self.entries:
+            heapq.heappop(heap)
+        # Rebuild once stale entries dominate so the heaps stay proportional to the pool
+        if len(heap) > 2 * len(self.entries) + 64:
+            live = [item for item in heap if item[2] in self.entries]
+            heapq.heapify(live)
+            heap[:] = live
+
+    def _discard(self, txid: str) -> Optional[MempoolEntry]:
+        entry = self.entries.pop(txid, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        return entry
+
+    def remove(self, txids) -> List[Dict[str, Any]]:
+        """Removes the given txids (e.g. because they were mined) and returns the removed transactions."""
+        with self._lock:
+            removed = [entry.transaction for entry in map(self._discard, txids) if entry is not None]
+            self._compact(self._best)
+            self._compact(self._cheapest)
+            return removed
+
+    def _best_first(self):
+        """Yields the items of the best-first heap in order without changing it, by walking the
+        heap's tree with a second heap of candidate nodes: the first k items cost O(k log k)."""
+        heap = self._best
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            item, position = heapq.heappop(frontier)
+            yield item
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def select(self, max_count: Optional[int] = None, max_bytes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the highest fee rate transactions that fit within `max_count` transactions and
+        `max_bytes` serialized bytes, best first. Transactions that do not fit are skipped so
+        smaller ones behind them can still fill the block. Nothing is removed from the pool.
+        """
+        with self._lock:
+            self._compact(self._best)
+            selected, size = [], 0
+            for _, _, txid in self._best_first():
+                entry = self.entries.get(txid)
+                if entry is None:
+                    continue
+                if max_count is not None and len(selected) >= max_count:
+                    break
+                if max_bytes is not None and size + entry.size > max_bytes:
+                    continue
+                selected.append(entry.transaction)
+                size += entry.size
+            return selected
+
+    def transactions(self) -> List[Dict[str, Any]]:
+        """All pending transactions, best first."""
+        return self.select()
@@ -0,0 +1,67 @@
+import json
+from hashlib import sha256
+from typing import List, Dict, Any, Mapping
+
+
+EMPTY_ROOT = "0" * 64
+
+
+def serialize_transaction(transaction: Mapping[str, Any]) -> bytes:
+    """Canonical byte encoding of a transaction: sorted keys, no insignificant whitespace."""
+    if not isinstance(transaction, dict):
+        transaction = dict(transaction)
+    return json.dumps(transaction, sort_keys=True, separators=(",", ":")).encode()
+
+
+def transaction_hash(transaction: Mapping[str, Any]) -> str:
+    """The transaction id: sha256 over the canonical serialization (cached by transaction.Transaction)."""
+    txid = getattr(transaction, "txid", None)
+    return txid if txid is not None else sha256(serialize_transaction(transaction)).hexdigest()
+
+
+def _hash_pair(left: str, right: str) -> str:
+    return sha256(bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level: List[str]) -> List[str]:
+    if len(level) % 2:
+        level = level + [level[-1]]  # Odd levels duplicate their last node
+    return [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+
+def merkle_root(tx_hashes: List[str]) -> str:
+    """Computes the Merkle root of a list of transaction hashes."""
+    if not tx_hashes:
+        return EMPTY_ROOT
+    level = list(tx_hashes)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(tx_hashes: List[str], position: int) -> List[Dict[str, str]]:
+    """
+    Returns the sibling path from the leaf at `position` up to the root.
+    Each step says which side the sibling sits on, so the root can be rebuilt with verify_proof.
+    """
+    proof = []
+    level = list(tx_hashes)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        sibling = position ^ 1
+        proof.append({"hash": level[sibling], "position": "left" if sibling < position else "right"})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(tx_hash: str, proof: List[Dict[str, str]], root: str) -> bool:
+    """Checks that `tx_hash` is included under `root` given its Merkle proof."""
+    current = tx_hash
+    for step in proof:
+        if step["position"] == "left":
+            current = _hash_pair(step["hash"], current)
+        else:
+            current = _hash_pair(current, step["hash"])
+    return current == root
@@ -0,0 +1,216 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from hashlib import sha256
+from typing import Callable, NamedTuple, Optional, Dict, Any
+
+
+# Number of consecutive nonces a worker tries before checking whether another worker already won
+CHUNK_SIZE = 20_000
+# Seconds between progress callbacks while waiting on worker processes
+PROGRESS_INTERVAL = 0.5
+
+
+class MiningResult(NamedTuple):
+    nonce: int
+    hash: str
+    attempts: int
+
+
+def search_range(base, target: bytes, start: int, stop: int) -> Optional[MiningResult]:
+    """
+    Tries every nonce in [start, stop) against a pre-hashed header prefix (midstate).
+    `target` is the 32-byte big-endian target: comparing raw digests as bytes orders them
+    exactly like the 256-bit integers, without converting every hash.
+    """
+    for nonce in range(start, stop):
+        h = base.copy()
+        h.update(str(nonce).encode())
+        if h.digest() <= target:
+            return MiningResult(nonce, h.hexdigest(), nonce - start + 1)
+    return None
+
+
+def _search(prefix: bytes, target: bytes, start_nonce: int, worker_id: int, workers: int,
+            chunk_size: int, found, attempts) -> Optional[MiningResult]:
+    """Searches chunks worker_id, worker_id + workers, ... until any worker finds a valid nonce."""
+    base = sha256(prefix)
+    chunk = worker_id
+    while not found.is_set():
+        lo = start_nonce + chunk * chunk_size
+        result = search_range(base, target, lo, lo + chunk_size)
+        with attempts.get_lock():
+            attempts.value += result.attempts if result is not None else chunk_size
+        if result is not None:
+            found.set()
+            return result
+        chunk += workers
+    return None
+
+
+def _serve(tasks, found, attempts, results):
+    """A pool worker: runs searches from `tasks` until it gets None, reporting each one's outcome."""
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        search_id, args = task
+        result = _search(*args, found, attempts)
+        results.put((search_id, None if result is None else (result.nonce, result.hash)))
+
+
+class MinerPool:
+    """
+    Long-lived worker processes for parallel nonce searches, so mining a block does not start a
+    process per core. Searches run one at a time. If a worker dies, the pool is shut down and the
+    search raises RuntimeError instead of waiting forever; the next search starts a new pool.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._found = multiprocessing.Event()
+        self._attempts = multiprocessing.Value("q", 0)
+        self._results = multiprocessing.Queue()
+        self._tasks = [multiprocessing.Queue() for _ in range(workers)]
+        self._search_id = 0
+        self.processes = [
+            multiprocessing.Process(target=_serve, args=(tasks, self._found, self._attempts, self._results),
+                                    daemon=True)
+            for tasks in self._tasks
+        ]
+        for process in self.processes:
+            process.start()
+
+    def alive(self) -> bool:
+        return all(process.is_alive() for process in self.processes)
+
+    def search(self, prefix: bytes, target: bytes, start_nonce: int, chunk_size: int,
+               progress: Optional[Callable[[int], None]] = None) -> MiningResult:
+        with self._lock:
+            if not self.alive():
+                raise RuntimeError("The mining pool has stopped.")
+            self._search_id += 1
+            search_id = self._search_id
+            self._found.clear()
+            self._attempts.value = 0
+            for worker_id, tasks in enumerate(self._tasks):
+                tasks.put((search_id, (prefix, target, start_nonce, worker_id, self.workers, chunk_size)))
+            # Wait until every worker has stopped, so none is still searching when the next search starts
+            winner, finished = None, 0
+            while finished < self.workers:
+                try:
+                    reported, result = self._results.get(timeout=PROGRESS_INTERVAL)
+                except queue.Empty:
+                    if not self.alive():
+                        self.close()
+                        raise RuntimeError("A mining worker process died during the search.")
+                    if progress is not None and winner is None:
+                        progress(self._attempts.value)
+                    continue
+                if reported != search_id:
+                    continue  # Left over from a search that failed
+                finished += 1
+                if result is not None and winner is None:
+                    winner = result
+                    self._found.set()
+            return MiningResult(winner[0], winner[1], self._attempts.value)
+
+    def close(self):
+        self._found.set()
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+
+# One pool per worker count, created on first use and kept for the life of the process
+_pools: Dict[int, MinerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: int) -> MinerPool:
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None or not pool.alive():
+            if pool is not None:
+                pool.close()
+            pool = _pools[workers] = MinerPool(workers)
+        return pool
+
+
+@atexit.register
+def _close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def find_nonce(prefix: bytes, target: int, workers: Optional[int] = None,
+               start_nonce: int = 0, chunk_size: int = CHUNK_SIZE,
+               progress: Optional[Callable[[int], None]] = None) -> MiningResult:
+    """
+    Finds a nonce so that sha256(prefix + str(nonce)), read as an integer, is at most `target`.
+    The nonce space is striped across `workers` processes of a MinerPool (defaults to the CPU
+    count); all of them stop as soon as one finds a valid nonce. With a single worker the search
+    runs inline.
+    `progress`, if given, is called periodically with the number of hashes tried so far.
+    """
+    target = target.to_bytes(32, "big")
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        base = sha256(prefix)
+        lo = start_nonce
+        while True:
+            result = search_range(base, target, lo, lo + chunk_size)
+            if result is not None:
+                result = result._replace(attempts=result.nonce - start_nonce + 1)
+                break
+            lo += chunk_size
+            if progress is not None:
+                progress(lo - start_nonce)
+    else:
+        result = _pool(workers).search(prefix, target, start_nonce, chunk_size, progress)
+
+    if progress is not None:
+        progress(result.attempts)
+    return result
+
+
+class MiningStats:
+    """Telemetry for the most recent `window` blocks this node mined."""
+
+    def __init__(self, window: int = 100):
+        self.records = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, height: int, attempts: int, elapsed: float, expected_attempts: int):
+        with self._lock:
+            self.records.append({
+                "height": height,
+                "attempts": attempts,
+                "expected_attempts": expected_attempts,
+                "elapsed": round(elapsed, 4),
+                "hash_rate": round(attempts / elapsed, 1) if elapsed else 0.0,
+            })
+
+    def summary(self, recent: int = 10) -> Dict[str, Any]:
+        """Totals over the window plus the last `recent` per-block records."""
+        with self._lock:
+            records = list(self.records)
+        attempts = sum(record["attempts"] for record in records)
+        elapsed = sum(record["elapsed"] for record in records)
+        return {
+            "blocks_mined": len(records),
+            "attempts": attempts,
+            "hash_rate": round(attempts / elapsed, 1) if elapsed else 0.0,
+            "avg_mining_time": round(elapsed / len(records), 4) if records else 0.0,
+            "recent": records[-recent:] if recent else [],
+        }
@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of every thread in this process every `interval` seconds and counts
+    identical stacks. The result is in the "folded" format (`frame;frame;frame count` per line)
+    read by flamegraph.pl, speedscope and most other flame graph tools.
+
+    Sampling only sees this process: proof-of-work running in worker processes shows up as the
+    thread waiting on them.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            raise RuntimeError("The profiler is already running.")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def profile(self, seconds: float) -> str:
+        """Samples for `seconds` and returns the folded stacks."""
+        self.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            self.stop()
+        return self.folded()
+
+
+def summary(profiler: SamplingProfiler, top: int = 20) -> Dict[str, float]:
+    """The share of samples in which each function was running, for the `top` functions."""
+    leaves: Counter = Counter()
+    for stack, count in profiler.stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+    return {frame: round(count / total, 4) for frame, count in leaves.most_common(top)}
@@ -0,0 +1,198 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from typing import Iterator, Optional
+
+from blockchain import Block
+from verification import LRUCache
+
+
+# Every record in the block log is a 4-byte little-endian length followed by the block's JSON
+RECORD_HEADER = struct.Struct("<I")
+
+
+class BlockStore:
+    """
+    Append-only block log with a height -> offset index, usable as Blockchain.chain.
+
+    `blocks.log` holds length-prefixed JSON records and `blocks.idx` holds one 8-byte offset per
+    height. Opening a store only reads the index and memory-maps the log; blocks are decoded
+    lazily on access and kept in an LRU cache. Appends are fsynced in batches of `sync_every`
+    blocks or, by a background thread, at most `sync_interval` seconds after they were made,
+    whichever comes first. A torn or unindexed tail left by a crash is repaired on open.
+    """
+
+    def __init__(self, path: str, sync_every: int = 100, sync_interval: float = 1.0, cache_size: int = 1024):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._cache = LRUCache(cache_size)
+        self._lock = threading.RLock()
+
+        self._log = open(os.path.join(path, "blocks.log"), "a+b")
+        self._idx = open(os.path.join(path, "blocks.idx"), "a+b")
+        self._offsets = array("Q")
+        self._load_index()
+        self._map: Optional[mmap.mmap] = None
+        self._remap()
+
+        self._unsynced = 0
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if sync_interval < float("inf"):  # An infinite interval syncs only every `sync_every` blocks
+            self._flusher = threading.Thread(target=self._flush_periodically, name="block-store-sync", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                if self._unsynced and not self._closed.is_set():
+                    self.sync()
+
+    def _load_index(self):
+        self._idx.seek(0)
+        data = self._idx.read()
+        usable = len(data) - len(data) % self._offsets.itemsize
+        self._offsets.frombytes(data[:usable])
+        indexed = len(self._offsets)
+
+        self._log.seek(0, os.SEEK_END)
+        log_size = self._log.tell()
+        # Drop index entries that point past the end of the log
+        while self._offsets and self._offsets[-1] + RECORD_HEADER.size > log_size:
+            self._offsets.pop()
+        end = self._record_end(len(self._offsets) - 1, log_size) if self._offsets else 0
+        if end is None:
+            self._offsets.pop()
+            end = self._record_end(len(self._offsets) - 1, log_size) if self._offsets else 0
+
+        # Index records that made it into the log but not into the index
+        self._log.seek(end)
+        while end + RECORD_HEADER.size <= log_size:
+            (length,) = RECORD_HEADER.unpack(self._log.read(RECORD_HEADER.size))
+            if end + RECORD_HEADER.size + length > log_size:
+                break
+            self._offsets.append(end)
+            end += RECORD_HEADER.size + length
+            self._log.seek(end)
+
+        # Anything after the last complete record is a torn write
+        if end < log_size:
+            self._log.truncate(end)
+        self._end = end
+        if len(self._offsets) != indexed or usable != len(data):
+            self._idx.truncate(0)
+            self._idx.write(self._offsets.tobytes())
+            self._idx.flush()
+            os.fsync(self._idx.fileno())
+
+    def _record_end(self, height: int, log_size: int) -> Optional[int]:
+        offset = self._offsets[height]
+        self._log.seek(offset)
+        (length,) = RECORD_HEADER.unpack(self._log.read(RECORD_HEADER.size))
+        end = offset + RECORD_HEADER.size + length
+        return end if end <= log_size else None
+
+    def _remap(self):
+        self._log.flush()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        size = os.fstat(self._log.fileno()).st_size
+        if size:
+            self._map = mmap.mmap(self._log.fileno(), size, access=mmap.ACCESS_READ)
+
+    def _read(self, height: int) -> Block:
+        block = self._cache.get(height)
+        if block is not None:
+            return block
+        offset = self._offsets[height]
+        if self._map is None or offset + RECORD_HEADER.size > len(self._map):
+            self._remap()
+        (length,) = RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > len(self._map):
+            self._remap()
+        block = Block.from_dict(json.loads(self._map[start:start + length]))
+        self._cache.put(height, block)
+        return block
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, item):
+        with self._lock:
+            if isinstance(item, slice):
+                return [self._read(height) for height in range(*item.indices(len(self)))]
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError("block height out of range")
+            return self._read(item)
+
+    def __iter__(self) -> Iterator[Block]:
+        for height in range(len(self)):
+            yield self[height]
+
+    def __reversed__(self) -> Iterator[Block]:
+        for height in range(len(self) - 1, -1, -1):
+            yield self[height]
+
+    def __delitem__(self, item):
+        """Supports only `del store[height:]`: drops the top of the chain, e.g. during a reorganization."""
+        if not isinstance(item, slice) or item.stop is not None or item.step is not None:
+            raise TypeError("only trailing slices (del store[height:]) can be deleted")
+        with self._lock:
+            height = item.indices(len(self))[0]
+            if height >= len(self):
+                return
+            self._end = self._offsets[height]
+            del self._offsets[height:]
+            self._cache.clear()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._log.flush()
+            self._log.truncate(self._end)
+            self._idx.flush()
+            self._idx.truncate(height * self._offsets.itemsize)
+            self.sync()
+            self._remap()
+
+    def append(self, block: Block):
+        data = json.dumps(block.to_dict(), separators=(",", ":")).encode()
+        with self._lock:
+            offset = self._end
+            self._log.write(RECORD_HEADER.pack(len(data)) + data)
+            self._end += RECORD_HEADER.size + len(data)
+            self._idx.write(struct.pack("<Q", offset))
+            self._offsets.append(offset)
+            self._cache.put(len(self._offsets) - 1, block)
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+    def sync(self):
+        """Flushes and fsyncs pending appends; the log always reaches disk before the index."""
+        with self._lock:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._idx.flush()
+            os.fsync(self._idx.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.sync()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._log.close()
+            self._idx.close()
@@ -0,0 +1,242 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import requests
+
+import codec
+from blockchain import Block, Blockchain, listed_transactions
+from difficulty import check_timestamp, target_work
+from merkle import merkle_root
+
+
+# Largest header and body ranges requested from a peer at once
+HEADER_BATCH = 2000
+BODY_BATCH = 500
+
+
+class SyncError(Exception):
+    pass
+
+
+class HTTPPeer:
+    """A remote node reached through its REST API, preferring the compact binary encoding."""
+
+    def __init__(self, url: str, timeout: float = 10.0, session: Optional[requests.Session] = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def _get(self, path: str, params: Dict[str, Any]) -> Any:
+        response = self.session.get(f"{self.url}{path}", params=params, timeout=self.timeout,
+                                    headers={"Accept": f"{codec.CONTENT_TYPE}, application/json;q=0.9"})
+        response.raise_for_status()
+        if response.headers.get("content-type", "").startswith(codec.CONTENT_TYPE):
+            return codec.decode(response.content, transactions=True)
+        return response.json()
+
+    def headers(self, from_height: int, count: int) -> Dict[str, Any]:
+        """Returns {"headers": [...], "length": chain length}."""
+        return self._get("/headers", {"from": from_height, "count": count})
+
+    def blocks(self, from_height: int, limit: int) -> List[Dict[str, Any]]:
+        return self._get("/chain", {"from_height": from_height, "limit": limit})["chain"]
+
+    def __repr__(self):
+        return self.url
+
+
+class LocalPeer:
+    """An in-process stand-in for a remote node, for tests and simulations."""
+
+    def __init__(self, blockchain: Blockchain, name: str = "local"):
+        self.blockchain = blockchain
+        self.url = name
+
+    def headers(self, from_height: int, count: int) -> Dict[str, Any]:
+        return self.blockchain.get_headers(from_height, count)
+
+    def blocks(self, from_height: int, limit: int) -> List[Dict[str, Any]]:
+        with self.blockchain.lock.read():
+            return [block.to_dict() for block in self.blockchain.chain[from_height:from_height + limit]]
+
+    def __repr__(self):
+        return self.url
+
+
+class NodeSync:
+    """
+    Keeps a Blockchain in step with registered peers.
+
+    Syncing with a peer finds the last common block, downloads and checks the peer's headers
+    above it, and compares accumulated proof-of-work. Only if the peer's branch has more work
+    are the block bodies fetched, in parallel from every peer that serves matching blocks, and
+    the local chain reorganized onto that branch.
+    """
+
+    def __init__(self, blockchain: Blockchain, fetch_workers: int = 4):
+        self.blockchain = blockchain
+        self.fetch_workers = fetch_workers
+        self.peers: Dict[str, Any] = {}
+        self._sync_lock = threading.Lock()
+
+    def register_peer(self, peer) -> Any:
+        """Adds a peer object, or a base URL for an HTTPPeer."""
+        if isinstance(peer, str):
+            peer = HTTPPeer(peer)
+        self.peers[peer.url] = peer
+        return peer
+
+    def remove_peer(self, url: str):
+        self.peers.pop(url, None)
+
+    def block_work(self, header: Dict[str, Any]) -> int:
+        """Expected number of hashes needed to find a block like this one."""
+        return target_work(int(header["target"], 16))
+
+    def sync(self) -> List[Dict[str, Any]]:
+        """Syncs with every registered peer in turn and returns one report per peer."""
+        reports = []
+        for peer in list(self.peers.values()):
+            try:
+                reports.append({"peer": peer.url, **self.sync_with(peer)})
+            except (SyncError, requests.RequestException, KeyError, TypeError, ValueError) as e:
+                reports.append({"peer": peer.url, "status": "error", "detail": str(e)})
+        return reports
+
+    def sync_with(self, peer) -> Dict[str, Any]:
+        with self._sync_lock:
+            local_tip = self.blockchain.get_last_block().hash
+            peer_length = peer.headers(0, 1)["length"]
+            if type(peer_length) is not int:
+                raise SyncError("Peer sent an invalid chain length.")
+            fork_height = self._find_fork(peer, peer_length)
+            headers = self._download_headers(peer, fork_height, peer_length)
+            if not headers:
+                return {"status": "up_to_date", "height": len(self.blockchain.chain) - 1}
+
+            chain = self.blockchain.chain
+            local_work = sum(self.block_work(block.header()) for block in chain[fork_height + 1:])
+            peer_work = sum(self.block_work(header) for header in headers)
+            if peer_work <= local_work:
+                return {"status": "local_chain_has_more_work", "height": len(chain) - 1}
+
+            bodies = self._download_bodies(peer, headers)
+            replaced = len(chain) - 1 - fork_height
+            # Verify signatures before taking the write lock; reorganize then hits the cache
+            self.blockchain.verify_transactions(listed_transactions(bodies))
+            with self.blockchain.lock.write():
+                # The work comparison above is only meaningful if nothing was appended meanwhile
+                if self.blockchain.get_last_block().hash != local_tip:
+                    raise SyncError("Local chain changed during sync; try again.")
+                if not self.blockchain.reorganize(fork_height, bodies):
+                    raise SyncError("Peer's blocks failed validation.")
+            return {
+                "status": "synced",
+                "fork_height": fork_height,
+                "blocks_replaced": replaced,
+                "blocks_added": len(headers),
+                "height": len(self.blockchain.chain) - 1,
+            }
+
+    def _matches(self, peer, height: int) -> bool:
+        headers = peer.headers(height, 1)["headers"]
+        try:
+            return bool(headers) and headers[0]["hash"] == self.blockchain.chain[height].hash
+        except (KeyError, TypeError):
+            raise SyncError(f"Peer sent a malformed header at height {height}.") from None
+
+    def _find_fork(self, peer, peer_length: int) -> int:
+        """Height of the last block both chains share: exponential probing, then binary search."""
+        top = min(len(self.blockchain.chain), peer_length) - 1
+        if top < 0:
+            raise SyncError("Peer has an empty chain.")
+        mismatch, height, step = None, top, 1
+        while not self._matches(peer, height):
+            if height == 0:
+                raise SyncError("Peer has a different genesis block.")
+            mismatch = height
+            height = max(0, height - step)
+            step *= 2
+        if mismatch is None:
+            return height
+        low, high = height, mismatch
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._matches(peer, middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _download_headers(self, peer, fork_height: int, peer_length: int) -> List[Dict[str, Any]]:
+        """Fetches and checks the peer's headers above the fork: linkage, hashes, targets, timestamps and proof-of-work."""
+        headers: List[Dict[str, Any]] = []
+        blocks: List[Block] = []
+        chain = self.blockchain.chain
+        previous_hash = chain[fork_height].hash
+
+        def block_at(height: int) -> Block:
+            return chain[height] if height <= fork_height else blocks[height - fork_height - 1]
+
+        for start in range(fork_height + 1, peer_length, HEADER_BATCH):
+            batch = peer.headers(start, min(HEADER_BATCH, peer_length - start))["headers"]
+            if not batch:
+                break
+            if not isinstance(batch, list):
+                raise SyncError(f"Peer sent malformed headers from height {start}.")
+            for offset, header in enumerate(batch):
+                try:
+                    block = Block.from_dict(header)
+                    if block.index != start + offset:
+                        raise SyncError(f"Peer sent headers out of order at height {start + offset}.")
+                    if block.previous_hash != previous_hash or block.hash != block.calculate_hash():
+                        raise SyncError(f"Peer sent an invalid header at height {block.index}.")
+                    expected = self.blockchain.difficulty_adjuster.target_for(block.index, block_at)
+                    if int(block.target, 16) != expected or not block.meets_target():
+                        raise SyncError(f"Peer sent a header without enough work at height {block.index}.")
+                    reason = check_timestamp(block.timestamp, block.index, block_at)
+                except (AttributeError, KeyError, TypeError, ValueError):
+                    # e.g. a missing field, or a target or timestamp of the wrong type
+                    raise SyncError(f"Peer sent a malformed header at height {start + offset}.") from None
+                if reason is not None:
+                    raise SyncError(f"Peer sent an invalid header at height {block.index}: {reason}.")
+                previous_hash = block.hash
+                headers.append(header)
+                blocks.append(block)
+        return headers
+
+    def _fetch_range(self, peers: List[Any], primary, headers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fetches bodies for consecutive headers, trying each peer and falling back to `primary`."""
+        start, count = headers[0]["index"], len(headers)
+        for peer in peers + [primary]:
+            try:
+                bodies = peer.blocks(start, count)
+            except (requests.RequestException, KeyError, ValueError):
+                continue
+            try:
+                if len(bodies) == count and all(map(self._body_matches, bodies, headers)):
+                    return bodies
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue  # Malformed blocks don't match either
+        raise SyncError(f"No peer served matching blocks {start}..{start + count - 1}.")
+
+    @staticmethod
+    def _body_matches(body: Dict[str, Any], header: Dict[str, Any]) -> bool:
+        block = Block.from_dict(body)
+        block.merkle_root = merkle_root(block.transaction_hashes())
+        return block.calculate_hash() == header["hash"]
+
+    def _download_bodies(self, primary, headers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Spreads body ranges round-robin over every registered peer, in parallel."""
+        peers = list(self.peers.values()) or [primary]
+        ranges = [headers[i:i + BODY_BATCH] for i in range(0, len(headers), BODY_BATCH)]
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            futures = [
+                pool.submit(self._fetch_range, peers[i % len(peers):] + peers[:i % len(peers)], primary, chunk)
+                for i, chunk in enumerate(ranges)
+            ]
+            bodies: List[Dict[str, Any]] = []
+            for future in futures:
+                bodies.extend(future.result())
+        return bodies
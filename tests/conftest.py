@@ -0,0 +1,44 @@
+import os
+import sys
+
+# The modules live at the repository root, as when running the node or the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Blockchain  # noqa: E402
+from key_signature_generator import generate_key_pair, key_id, sign_transaction  # noqa: E402
+from merkle import transaction_hash  # noqa: E402
+from verification import signing_payload  # noqa: E402
+
+
+class Key:
+    """A key pair and its address, able to sign transactions."""
+
+    def __init__(self):
+        self.private_pem, self.public_pem = generate_key_pair()
+        self.address = key_id(self.public_pem)
+
+    def sign(self, transaction, sender=None):
+        tx = dict(transaction, sender=sender or self.address, public_key=self.public_pem)
+        tx["signature"] = sign_transaction(self.private_pem, signing_payload(tx).decode())
+        return tx
+
+    def spend(self, inputs, outputs, sender=None):
+        """A signed transaction spending `inputs` (txid, index, amount) into `outputs` (address, amount)."""
+        return self.sign({
+            "receiver": outputs[0][0],
+            "amount": outputs[0][1],
+            "input_utxos": [{"txid": txid, "index": index, "amount": amount} for txid, index, amount in inputs],
+            "output_utxos": [{"txid": "", "index": index, "amount": amount, "address": address}
+                             for index, (address, amount) in enumerate(outputs)],
+        }, sender)
+
+
+def new_chain(**kwargs):
+    """A small in-memory chain that mines in a few milliseconds."""
+    return Blockchain(mining_workers=1, difficulty=1, **kwargs)
+
+
+def coinbase_of(block):
+    """(txid, index, amount) of the output paid by a block's coinbase."""
+    coinbase = block.transactions[0]
+    return transaction_hash(coinbase), 0, coinbase["output_utxos"][0]["amount"]
@@ -0,0 +1,33 @@
+import codec
+from blockchain import Block
+from conftest import Key, new_chain
+from merkle import transaction_hash
+from utxo import coinbase_transaction
+
+
+def transactions():
+    alice = Key()
+    payment = alice.spend([("ab" * 32, 0, 50.0)], [("Bob ✓", 0.1), (alice.address, 49.9)])
+    # Shaped as the API stores it: UTXOs without an address keep "address": None
+    payment["input_utxos"][0]["address"] = None
+    odd = alice.spend([("cd" * 32, 7, 1e-7)], [(alice.address, 1e-7)])
+    odd["amount"] = 10 ** 20
+    return [coinbase_transaction(1, alice.address, 50.0), payment, odd]
+
+
+def test_transactions_round_trip_with_the_same_txids():
+    originals = transactions()
+    for decoded, original in zip(codec.decode(codec.encode(originals), transactions=True), originals):
+        assert transaction_hash(decoded) == transaction_hash(original)
+        assert dict(decoded) == original
+
+
+def test_blocks_round_trip_with_the_same_hashes():
+    blockchain = new_chain()
+    block = Block(1, transactions(), 1704067260.25, blockchain.chain[0].hash, blockchain.next_target())
+    block.mine_block(workers=1)
+    decoded = codec.decode(codec.encode({"chain": [block.to_dict()]}), transactions=True)["chain"][0]
+    restored = Block.from_dict(decoded)
+    assert restored.transaction_hashes() == block.transaction_hashes()
+    assert restored.calculate_hash() == block.hash
+    assert restored.to_dict() == block.to_dict()
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from conftest import new_chain
+from storage import RECORD_HEADER, BlockStore
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """A block store holding a few mined blocks, closed; returns its path and the block hashes."""
+    path = str(tmp_path / "chain")
+    blockchain = new_chain(store=BlockStore(path))
+    for _ in range(3):
+        blockchain.mine_block(miner_address="a" * 32)
+    hashes = [block.hash for block in blockchain.chain]
+    blockchain.chain.close()
+    blockchain.headers.close()
+    return path, hashes
+
+
+def test_reopens_with_every_block(stored):
+    path, hashes = stored
+    store = BlockStore(path)
+    assert [block.hash for block in store] == hashes
+    store.close()
+
+
+def test_torn_tail_is_dropped(stored):
+    path, hashes = stored
+    log = os.path.join(path, "blocks.log")
+    size = os.path.getsize(log)
+    with open(log, "ab") as f:
+        f.write(RECORD_HEADER.pack(1000) + b'{"index": 4, "transac')  # A crash mid-append
+    store = BlockStore(path)
+    assert [block.hash for block in store] == hashes
+    assert os.path.getsize(log) == size
+    # Appends continue where the last complete block ended
+    blockchain = new_chain(store=store)
+    blockchain.mine_block(miner_address="a" * 32)
+    store.close()
+    assert len(BlockStore(path)) == len(hashes) + 1
+
+
+def test_torn_last_record_and_index_are_dropped(stored):
+    path, hashes = stored
+    log, idx = os.path.join(path, "blocks.log"), os.path.join(path, "blocks.idx")
+    with open(log, "r+b") as f:
+        f.truncate(os.path.getsize(log) - 5)  # The last block was only partly written
+    with open(idx, "r+b") as f:
+        f.truncate(os.path.getsize(idx) - 3)
+    store = BlockStore(path)
+    assert [block.hash for block in store] == hashes[:-1]
+    store.close()
+
+
+def test_unindexed_records_are_indexed(stored):
+    path, hashes = stored
+    idx = os.path.join(path, "blocks.idx")
+    with open(idx, "r+b") as f:
+        f.truncate(8)  # Only the genesis block's offset reached the index
+    store = BlockStore(path)
+    assert [block.hash for block in store] == hashes
+    store.close()
+
+
+def test_appends_are_synced_within_the_interval(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+    store = BlockStore(str(tmp_path / "chain"), sync_every=1000, sync_interval=0.05)
+    new_chain(store=store)  # Appends the genesis block
+    deadline = time.monotonic() + 5
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(synced) == 2  # The log, then the index
+    store.close()
@@ -0,0 +1,197 @@
+import time
+from unittest.mock import ANY
+
+import pytest
+
+from blockchain import Block
+from conftest import Key, coinbase_of, new_chain
+from merkle import transaction_hash
+from sync import LocalPeer, NodeSync, SyncError
+from utxo import coinbase_transaction
+
+
+@pytest.fixture
+def forked():
+    """
+    Two nodes sharing a block that pays alice. Node `a` then mines alice's payment to bob in one
+    more block; node `b` mines two empty blocks instead, so it has more work.
+    """
+    alice, bob, miner = Key(), Key(), Key()
+    a, b = new_chain(), new_chain()
+    reward = coinbase_of(a.mine_block(miner_address=alice.address))
+    NodeSync(b).sync_with(LocalPeer(a, "a"))
+    payment = alice.spend([reward], [(bob.address, 20.0), (alice.address, 30.0)])
+    a.add_transaction(payment)
+    a.mine_block()
+    b.mine_block(miner_address=miner.address)
+    b.mine_block(miner_address=miner.address)
+    return a, b, payment, bob
+
+
+def test_reorganizes_to_the_chain_with_more_work(forked):
+    a, b, payment, bob = forked
+    report = NodeSync(a).sync_with(LocalPeer(b, "b"))
+    assert report["status"] == "synced"
+    assert report["fork_height"] == 1
+    assert [block.hash for block in a.chain] == [block.hash for block in b.chain]
+    # The payment was only in the abandoned block: it is unconfirmed again, still spendable
+    assert a.get_balance(bob.address) == 0.0
+    assert transaction_hash(payment) in a.mempool
+    a.mine_block()
+    assert a.get_balance(bob.address) == 20.0
+
+
+def append_invalid_block(blockchain):
+    """Appends a block that pays its coinbase more than the reward; its header is fine."""
+    last = blockchain.get_last_block()
+    height = len(blockchain.chain)
+    block = Block(height, [coinbase_transaction(height, Key().address, blockchain.mining_reward * 2)],
+                  time.time(), last.hash, blockchain.next_target())
+    block.mine_block(workers=1)
+    blockchain.chain.append(block)
+    blockchain.headers.append(block)
+
+
+def test_failed_reorganization_restores_the_chain(forked):
+    a, b, payment, bob = forked
+    append_invalid_block(b)
+    before = [block.hash for block in a.chain]
+    with pytest.raises(SyncError, match="failed validation"):
+        NodeSync(a).sync_with(LocalPeer(b, "b"))
+    assert [block.hash for block in a.chain] == before
+    assert a.get_balance(bob.address) == 20.0
+    assert transaction_hash(payment) in a.get_block(len(before) - 1).transaction_hashes()
+    assert transaction_hash(payment) not in a.mempool
+    # The restored chain keeps working
+    assert a.mine_block(miner_address=bob.address).index == len(before)
+
+
+def test_failed_reorganization_keeps_pending_transactions():
+    alice = Key()
+    a, b = new_chain(), new_chain()
+    reward = coinbase_of(a.mine_block(miner_address=alice.address))
+    NodeSync(b).sync_with(LocalPeer(a, "a"))
+    a.mine_block(miner_address=Key().address)
+    pending = alice.spend([reward], [(Key().address, 50.0)])
+    a.add_transaction(pending)
+    b.add_transaction(pending)
+    b.mine_block(miner_address=Key().address)
+    b.mine_block(miner_address=Key().address)
+    append_invalid_block(b)
+
+    with pytest.raises(SyncError, match="failed validation"):
+        NodeSync(a).sync_with(LocalPeer(b, "b"))
+    # It was confirmed by b's valid block, then disconnected with it
+    assert transaction_hash(pending) in a.mempool
+    assert transaction_hash(pending) in a.mine_block().transaction_hashes()
+
+
+def test_reorganization_rejects_a_malformed_transaction_list(forked):
+    a, b, payment, _ = forked
+    before = [block.hash for block in a.chain]
+    blocks = [dict(block.to_dict(), transactions=5) if block.index == 3 else block.to_dict() for block in b.chain[2:]]
+    assert not a.reorganize(1, blocks)
+    assert [block.hash for block in a.chain] == before
+    assert transaction_hash(payment) not in a.mempool
+
+
+def test_up_to_date_peer_changes_nothing(forked):
+    a, _, _, _ = forked
+    other = new_chain()
+    NodeSync(other).sync_with(LocalPeer(a, "a"))
+    assert NodeSync(other).sync_with(LocalPeer(a, "a"))["status"] == "up_to_date"
+
+
+def drop_undo_data(blockchain, reconstructible=True, monkeypatch=None):
+    """Forgets the in-memory undo data, as after a restart; optionally the chain can't rebuild it either."""
+    blockchain._undo.clear()
+    if not reconstructible:
+        monkeypatch.setattr("blockchain.block_undo", lambda block, output_at: None)
+
+
+@pytest.mark.parametrize("reconstructible", [True, False])
+def test_reorganization_keeps_pending_reservations(reconstructible, monkeypatch):
+    alice = Key()
+    a, b = new_chain(), new_chain()
+    reward = coinbase_of(a.mine_block(miner_address=alice.address))
+    NodeSync(b).sync_with(LocalPeer(a, "a"))
+    a.mine_block(miner_address=alice.address)
+    b.mine_block(miner_address=Key().address)
+    b.mine_block(miner_address=Key().address)
+    pending = alice.spend([reward], [(Key().address, 50.0)])
+    a.add_transaction(pending)
+    drop_undo_data(a, reconstructible, monkeypatch)
+
+    assert NodeSync(a).sync_with(LocalPeer(b, "b"))["status"] == "synced"
+    assert transaction_hash(pending) in a.mempool
+    with pytest.raises(ValueError, match="already spent by a pending transaction"):
+        a.add_transaction(alice.spend([reward], [(alice.address, 50.0)]))
+
+
+@pytest.mark.parametrize("undo_data", [True, False])
+def test_disconnects_a_block_spending_its_own_outputs(undo_data):
+    alice, x = Key(), Key()
+    a, b = new_chain(), new_chain()
+    reward = coinbase_of(a.mine_block(miner_address=alice.address))
+    NodeSync(b).sync_with(LocalPeer(a, "a"))
+    pay_x = alice.spend([reward], [(x.address, 50.0)])
+    x_pays_alice = x.spend([(transaction_hash(pay_x), 0, 50.0)], [(alice.address, 50.0)])
+    height = len(a.chain)
+    block = Block(height, [coinbase_transaction(height, x.address, a.mining_reward), pay_x, x_pays_alice],
+                  time.time(), a.get_last_block().hash, a.next_target())
+    block.mine_block(workers=1)
+    assert a.add_block(block.to_dict())
+    b.mine_block(miner_address=Key().address)
+    b.mine_block(miner_address=Key().address)
+    if not undo_data:
+        drop_undo_data(a)
+
+    assert NodeSync(a).sync_with(LocalPeer(b, "b"))["status"] == "synced"
+    assert a.get_balance(alice.address) == 50.0
+    assert a.get_balance(x.address) == 0.0
+    assert transaction_hash(pay_x) in a.mempool
+
+
+class TamperingPeer(LocalPeer):
+    """A peer that serves its headers and blocks after passing them through `tamper`."""
+
+    def __init__(self, blockchain, headers=None, blocks=None):
+        super().__init__(blockchain, "tampering")
+        self.tamper_headers, self.tamper_blocks = headers, blocks
+
+    def headers(self, from_height, count):
+        response = super().headers(from_height, count)
+        if self.tamper_headers and from_height > 1:
+            response = dict(response, headers=[self.tamper_headers(dict(h)) for h in response["headers"]])
+        return response
+
+    def blocks(self, from_height, limit):
+        return [self.tamper_blocks(dict(block)) for block in super().blocks(from_height, limit)]
+
+
+def without_target(header):
+    del header["target"]
+    return header
+
+
+@pytest.mark.parametrize("tamper", [without_target, lambda header: dict(header, timestamp="now"), lambda _: 5])
+def test_malformed_headers_are_a_sync_error(forked, tamper):
+    a, b, _, _ = forked
+    before = [block.hash for block in a.chain]
+    node_sync = NodeSync(a)
+    node_sync.register_peer(TamperingPeer(b, headers=tamper))
+    with pytest.raises(SyncError, match="Peer sent"):
+        node_sync.sync_with(node_sync.peers["tampering"])
+    # POST /sync reports it for that peer rather than failing
+    assert node_sync.sync() == [{"peer": "tampering", "status": "error", "detail": ANY}]
+    assert [block.hash for block in a.chain] == before
+
+
+@pytest.mark.parametrize("transactions", [[1], 5, None])
+def test_malformed_bodies_are_fetched_from_another_peer(forked, transactions):
+    a, b, _, _ = forked
+    node_sync = NodeSync(a)
+    node_sync.register_peer(TamperingPeer(b, blocks=lambda block: dict(block, transactions=transactions)))
+    report = node_sync.sync_with(LocalPeer(b, "b"))
+    assert report["status"] == "synced"
+    assert [block.hash for block in a.chain] == [block.hash for block in b.chain]
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from blockchain import Block
+from conftest import Key, coinbase_of, new_chain
+from merkle import transaction_hash
+from utxo import coinbase_transaction
+
+
+@pytest.fixture
+def funded():
+    """A chain whose only coins are a block reward paid to alice."""
+    alice = Key()
+    blockchain = new_chain()
+    block = blockchain.mine_block(miner_address=alice.address)
+    return blockchain, alice, coinbase_of(block)
+
+
+def test_spend_with_change(funded):
+    blockchain, alice, reward = funded
+    bob = Key()
+    blockchain.add_transaction(alice.spend([reward], [(bob.address, 10.0), (alice.address, 40.0)]))
+    blockchain.mine_block()
+    assert blockchain.get_balance(bob.address) == 10.0
+    assert blockchain.get_balance(alice.address) == 40.0
+
+
+def test_double_spend_between_pending_transactions(funded):
+    blockchain, alice, reward = funded
+    blockchain.add_transaction(alice.spend([reward], [(Key().address, 50.0)]))
+    with pytest.raises(ValueError, match="already spent by a pending transaction"):
+        blockchain.add_transaction(alice.spend([reward], [(Key().address, 50.0)]))
+
+
+def test_double_spend_of_a_mined_output(funded):
+    blockchain, alice, reward = funded
+    blockchain.add_transaction(alice.spend([reward], [(Key().address, 50.0)]))
+    blockchain.mine_block()
+    with pytest.raises(ValueError, match="does not exist or is already spent"):
+        blockchain.add_transaction(alice.spend([reward], [(Key().address, 50.0)]))
+
+
+def test_double_spend_within_one_transaction(funded):
+    blockchain, alice, reward = funded
+    with pytest.raises(ValueError, match="same UTXO twice"):
+        blockchain.add_transaction(alice.spend([reward, reward], [(alice.address, 100.0)]))
+
+
+def test_outputs_may_not_exceed_inputs(funded):
+    blockchain, alice, reward = funded
+    with pytest.raises(ValueError, match="exceed"):
+        blockchain.add_transaction(alice.spend([reward], [(alice.address, 60.0)]))
+    with pytest.raises(ValueError, match="positive"):
+        blockchain.add_transaction(alice.spend([reward], [(alice.address, 90.0), (alice.address, -40.0)]))
+
+
+def test_theft_with_a_spoofed_sender(funded):
+    blockchain, alice, reward = funded
+    mallory = Key()
+    with pytest.raises(ValueError, match="Sender is not the address"):
+        blockchain.add_transaction(mallory.spend([reward], [(mallory.address, 50.0)], sender=alice.address))
+    assert blockchain.get_balance(alice.address) == 50.0
+
+
+def test_theft_of_another_address_outputs(funded):
+    blockchain, alice, reward = funded
+    mallory = Key()
+    with pytest.raises(ValueError, match="not owned by the sender"):
+        blockchain.add_transaction(mallory.spend([reward], [(mallory.address, 50.0)]))
+
+
+def test_only_a_coinbase_issues_coins(funded):
+    blockchain, alice, _ = funded
+    with pytest.raises(ValueError, match="no inputs"):
+        blockchain.add_transaction(alice.spend([], [(alice.address, 1000.0)]))
+
+
+def test_block_with_an_overpaying_coinbase_is_rejected(funded):
+    blockchain, alice, _ = funded
+    last = blockchain.get_last_block()
+    height = len(blockchain.chain)
+    block = Block(height, [coinbase_transaction(height, alice.address, blockchain.mining_reward + 1)],
+                  time.time(), last.hash, blockchain.next_target())
+    block.mine_block(workers=1)
+    assert blockchain.add_blocks([block.to_dict()])[0]["status"] == "rejected"
+    assert len(blockchain.chain) == height
+    assert blockchain.get_balance(alice.address) == 50.0
+
+
+@pytest.mark.parametrize("transactions", [5, "abc", {"txid": "ab"}])
+def test_block_with_a_malformed_transaction_list_is_rejected(funded, transactions):
+    blockchain, alice, _ = funded
+    block = dict(blockchain.get_last_block().to_dict(), index=len(blockchain.chain), transactions=transactions)
+    assert blockchain.add_blocks([block]) == [{"status": "rejected", "detail": "Malformed block."}]
+    assert len(blockchain.chain) == 2
+    assert blockchain.get_balance(alice.address) == 50.0
+
+
+def mined_block(blockchain, transactions):
+    last = blockchain.get_last_block()
+    block = Block(len(blockchain.chain), transactions, time.time(), last.hash, blockchain.next_target())
+    block.mine_block(workers=1)
+    return block
+
+
+@pytest.mark.parametrize("amount", ["50", True, float("nan"), float("inf")])
+def test_rejected_block_leaves_the_utxo_set_unchanged(funded, amount):
+    blockchain, alice, reward = funded
+    x = Key()
+    pay_x = alice.spend([reward], [(x.address, 50.0)])
+    # Signed correctly (signing_payload converts the amount), but not a valid amount
+    malformed = x.spend([(transaction_hash(pay_x), 0, 50.0)], [(x.address, amount)])
+    block = mined_block(blockchain, [pay_x, malformed])
+    try:
+        assert not blockchain.add_block(block.to_dict())
+    except (KeyError, TypeError, ValueError):
+        pass  # Reported as a malformed block
+    assert len(blockchain.chain) == 2
+    assert blockchain.get_balance(alice.address) == 50.0
+    assert blockchain.get_balance(x.address) == 0.0
+    blockchain.add_transaction(alice.spend([reward], [(x.address, 50.0)]))
+
+
+def test_coinbase_without_an_owner_leaves_the_utxo_set_unchanged(funded):
+    blockchain, alice, reward = funded
+    x = Key()
+    height = len(blockchain.chain)
+    coinbase = coinbase_transaction(height, x.address, 1.0)
+    del coinbase["receiver"], coinbase["output_utxos"][0]["address"]
+    block = mined_block(blockchain, [coinbase, alice.spend([reward], [(x.address, 50.0)])])
+    assert blockchain.add_blocks([block.to_dict()])[0]["status"] == "rejected"
+    assert blockchain.get_balance(alice.address) == 50.0
+    assert blockchain.get_balance(x.address) == 0.0
+
+
+def test_apply_block_rolls_back_on_any_error(funded):
+    blockchain, alice, reward = funded
+    x = Key()
+    pay_x = alice.spend([reward], [(x.address, 50.0)])
+    malformed = dict(x.spend([(transaction_hash(pay_x), 0, 50.0)], [(x.address, 50.0)]), output_utxos=5)
+    block = Block(len(blockchain.chain), [pay_x], time.time(), blockchain.get_last_block().hash)
+    block.transactions.append(malformed)  # Bypasses compaction, as no validated block could hold it
+    with pytest.raises(Exception):
+        blockchain.utxos.apply_block(block)
+    assert blockchain.get_balance(alice.address) == 50.0
+    assert blockchain.get_balance(x.address) == 0.0
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import wallet_api
+from key_signature_generator import Wallet
+from verification import SignatureVerifier
+
+
+@pytest.fixture
+def wallet(tmp_path, monkeypatch):
+    wallet = Wallet(str(tmp_path / "wallet.json"))
+    monkeypatch.setattr(wallet_api, "wallet", wallet)
+    return wallet
+
+
+def test_signs_for_local_clients(wallet):
+    client = TestClient(wallet_api.app, client=("127.0.0.1", 50000))
+    key_id = client.post("/keys", json={"count": 1}).json()["keys"][0]["key_id"]
+    transaction = {"sender": key_id, "receiver": "b" * 32, "amount": 1.0,
+                   "input_utxos": [{"txid": "ab" * 32, "index": 0, "amount": 1.0}],
+                   "output_utxos": [{"txid": "", "index": 0, "amount": 1.0, "address": "b" * 32}]}
+    signed = client.post("/sign", json={"key_id": key_id, "transaction": transaction}).json()["transaction"]
+    assert SignatureVerifier().verify(signed)
+
+
+@pytest.mark.parametrize("host", ["testclient", "localhost", "192.168.1.5"])
+def test_refuses_other_clients(wallet, host):
+    response = TestClient(wallet_api.app, client=(host, 50000)).post("/keys", json={"count": 1})
+    assert response.status_code == 403
+    assert len(wallet) == 0
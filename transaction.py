@@ -0,0 +1,123 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Union
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+
+from merkle import transaction_hash
+from verification import LRUCache
+
+
+# PEM -> compressed point (b"" when the PEM would not come back byte-for-byte), and the reverse
+_compressed_keys = LRUCache(4096)
+_pem_keys = LRUCache(4096)
+
+
+def public_key_pem(point: bytes) -> str:
+    """The SubjectPublicKeyInfo PEM for a compressed P-256 point."""
+    pem = _pem_keys.get(point)
+    if pem is None:
+        key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), point)
+        pem = key.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+        _pem_keys.put(point, pem)
+    return pem
+
+
+def compress_public_key(pem: str) -> Optional[bytes]:
+    """The 33-byte compressed point for a P-256 PEM key, or None unless it converts back exactly."""
+    point = _compressed_keys.get(pem)
+    if point is None:
+        point = b""
+        try:
+            key = serialization.load_pem_public_key(pem.encode())
+            if isinstance(key, ec.EllipticCurvePublicKey) and isinstance(key.curve, ec.SECP256R1):
+                candidate = key.public_bytes(serialization.Encoding.X962, serialization.PublicFormat.CompressedPoint)
+                if public_key_pem(candidate) == pem:
+                    point = candidate
+        except (ValueError, TypeError, UnsupportedAlgorithm):
+            pass
+        _compressed_keys.put(pem, point)
+    return point or None
+
+
+def signature_hex(raw: bytes) -> str:
+    """The hex DER signature for a raw 64-byte r || s signature."""
+    return encode_dss_signature(int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:], "big")).hex()
+
+
+def compress_signature(signature: str) -> Optional[bytes]:
+    """The raw 64-byte r || s form of a hex DER signature, or None unless it converts back exactly."""
+    try:
+        r, s = decode_dss_signature(bytes.fromhex(signature))
+    except ValueError:
+        return None
+    if not (0 <= r < 1 << 256 and 0 <= s < 1 << 256):
+        return None
+    raw = r.to_bytes(32, "big") + s.to_bytes(32, "big")
+    return raw if signature_hex(raw) == signature else None
+
+
+class Transaction(Mapping):
+    """
+    A transaction as held in a block: its fields in slots rather than a dict, with the public key
+    as a compressed P-256 point and the signature as raw r || s whenever those convert back to
+    exactly the original strings (otherwise the strings are kept). It reads like the original
+    dict, so code written against transaction dicts works unchanged, and hashes the same.
+    """
+
+    __slots__ = ("sender", "receiver", "amount", "public_key", "signature", "input_utxos", "output_utxos", "_txid")
+    FIELDS = ("sender", "receiver", "amount", "public_key", "signature", "input_utxos", "output_utxos")
+
+    def __init__(self, sender: str, receiver: str, amount: float, public_key: Union[str, bytes],
+                 signature: Union[str, bytes], input_utxos: list, output_utxos: list):
+        self.sender = sender
+        self.receiver = receiver
+        self.amount = amount
+        self.public_key = public_key
+        self.signature = signature
+        self.input_utxos = input_utxos
+        self.output_utxos = output_utxos
+        self._txid: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Transaction":
+        public_key, signature = data["public_key"], data["signature"]
+        if isinstance(public_key, str):
+            public_key = compress_public_key(public_key) or public_key
+        if isinstance(signature, str):
+            signature = compress_signature(signature) or signature
+        return cls(data["sender"], data["receiver"], data["amount"], public_key, signature,
+                   data["input_utxos"], data["output_utxos"])
+
+    @property
+    def txid(self) -> str:
+        if self._txid is None:
+            self._txid = transaction_hash(dict(self))
+        return self._txid
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if isinstance(value, bytes):
+            # 33 bytes is a compressed point and 64 a raw signature, whichever field holds them
+            return public_key_pem(value) if len(value) == 33 else signature_hex(value)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"Transaction({dict(self)!r})"
+
+
+def compact_transaction(transaction: Mapping) -> Mapping:
+    """A Transaction for a dict with exactly the standard fields; anything else is kept as it is."""
+    if isinstance(transaction, dict) and transaction.keys() == set(Transaction.FIELDS):
+        return Transaction.from_dict(transaction)
+    return transaction
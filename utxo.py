@@ -0,0 +1,298 @@
+import math
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Optional, Set, Iterable, Mapping, Callable
+
+from merkle import transaction_hash
+from verification import address_of
+
+
+OutPoint = Tuple[str, int]  # (txid, output index)
+
+# Tolerance when comparing float amounts
+EPSILON = 1e-9
+
+# The sender of a block's coinbase: its first transaction, which has no inputs and pays the miner
+COINBASE = "coinbase"
+# New coins a coinbase may issue, on top of the fees of the block's other transactions
+BLOCK_REWARD = 50.0
+
+
+class UTXOEntry:
+    __slots__ = ("amount", "address")
+
+    def __init__(self, amount: float, address: str):
+        self.amount = amount
+        self.address = address
+
+
+class BlockUndo:
+    """What applying one block changed, so it can be reverted."""
+    __slots__ = ("spent", "created")
+
+    def __init__(self):
+        self.spent: List[Tuple[OutPoint, UTXOEntry]] = []
+        self.created: List[OutPoint] = []
+
+
+def transaction_inputs(transaction: Dict[str, Any]) -> List[OutPoint]:
+    return [(utxo["txid"], utxo["index"]) for utxo in transaction.get("input_utxos") or []]
+
+
+def is_coinbase(transaction: Any) -> bool:
+    return (isinstance(transaction, Mapping) and transaction.get("sender") == COINBASE
+            and not transaction.get("input_utxos"))
+
+
+def coinbase_transaction(height: int, address: str, amount: float) -> Dict[str, Any]:
+    """The coinbase of the block at `height`, paying `amount` to `address`. It is not signed; the
+    height keeps its txid unique."""
+    return {
+        "sender": COINBASE, "receiver": address, "amount": amount, "public_key": "", "signature": "",
+        "input_utxos": [], "output_utxos": [{"txid": "", "index": 0, "amount": amount, "address": address}],
+        "height": height,
+    }
+
+
+def _amount(value: Any) -> float:
+    """An output amount, which must be a finite int or float (not a bool or a string)."""
+    if type(value) not in (int, float) or (type(value) is float and not math.isfinite(value)):
+        raise ValueError("Output amounts must be finite numbers.")
+    return value
+
+
+def _check_outputs(transaction: Dict[str, Any]) -> float:
+    """Raises ValueError for an output amount that is not a positive number; returns the total of the outputs."""
+    amounts = [_amount(utxo["amount"]) for utxo in transaction.get("output_utxos") or []]
+    if any(not amount > 0 for amount in amounts):
+        raise ValueError("Output amounts must be positive.")
+    return sum(amounts)
+
+
+def transaction_outputs(transaction: Dict[str, Any], txid: str) -> List[Tuple[OutPoint, UTXOEntry]]:
+    """Outputs are keyed by the creating transaction's hash and their position; they belong to
+    their `address`, or to the transaction's receiver when no address is given. Raises
+    ValueError for an output without an owner or a valid amount."""
+    outputs = []
+    for index, utxo in enumerate(transaction.get("output_utxos") or []):
+        if not isinstance(utxo, Mapping):
+            raise ValueError("Output is not an object.")
+        address = utxo.get("address") or transaction.get("receiver")
+        if not isinstance(address, str) or not address:
+            raise ValueError("Output has no address and the transaction no receiver.")
+        outputs.append(((txid, index), UTXOEntry(_amount(utxo["amount"]), address)))
+    return outputs
+
+
+def block_undo(block, output_at: Callable[[OutPoint], Optional[UTXOEntry]]) -> Optional[BlockUndo]:
+    """
+    What applying `block` changed, reconstructed from the block itself for blocks whose undo
+    data was not kept (e.g. applied before a restart). `output_at` returns the output an outpoint
+    referred to, read from the transaction that created it; if it returns None, so does this.
+    """
+    undo = BlockUndo()
+    transactions = list(block.transactions)
+    if transactions and is_coinbase(transactions[0]):
+        transactions = transactions[1:] + transactions[:1]  # apply_block creates the coinbase's outputs last
+    for transaction in transactions:
+        for outpoint in transaction_inputs(transaction):
+            entry = output_at(outpoint)
+            if entry is None:
+                return None
+            undo.spent.append((outpoint, entry))
+        undo.created.extend(outpoint for outpoint, _ in transaction_outputs(transaction, transaction_hash(transaction)))
+    return undo
+
+
+class UTXOSet:
+    """
+    Unspent transaction outputs keyed by (txid, index), with a per-address index and running
+    balances, updated incrementally as blocks are appended.
+
+    Only a block's coinbase issues new coins: at most `block_reward` plus the fees of the block's
+    other transactions. Every other transaction must come from the address of its signing key
+    (see verification.address_of), spend existing outputs owned by that address, at most once,
+    and may not create more than it spends. Outputs spent by accepted pending transactions are
+    reserved so a second pending transaction cannot spend them too.
+    """
+
+    def __init__(self, block_reward: float = BLOCK_REWARD):
+        self.block_reward = block_reward
+        self.utxos: Dict[OutPoint, UTXOEntry] = {}
+        self.by_address: Dict[str, Set[OutPoint]] = defaultdict(set)
+        self.balances: Dict[str, float] = defaultdict(float)
+        self.reserved: Dict[OutPoint, str] = {}  # outpoint -> txid of the pending spender
+        self._lock = threading.RLock()
+
+    def rebuild(self, chain):
+        """Replays every block of `chain` from scratch."""
+        with self._lock:
+            self.utxos.clear()
+            self.by_address.clear()
+            self.balances.clear()
+            self.reserved.clear()
+            for block in chain:
+                self.apply_block(block)
+
+    def _add(self, outpoint: OutPoint, entry: UTXOEntry):
+        self.utxos[outpoint] = entry
+        self.by_address[entry.address].add(outpoint)
+        self.balances[entry.address] += entry.amount
+
+    def _remove(self, outpoint: OutPoint) -> UTXOEntry:
+        entry = self.utxos.pop(outpoint)
+        addresses = self.by_address[entry.address]
+        addresses.discard(outpoint)
+        self.balances[entry.address] -= entry.amount
+        if not addresses:
+            del self.by_address[entry.address]
+            del self.balances[entry.address]
+        return entry
+
+    def check_transaction(self, transaction: Dict[str, Any], txid: Optional[str] = None,
+                          allow_reserved: bool = False) -> float:
+        """
+        Raises ValueError if the transaction spends nothing or missing, spent, reserved or foreign
+        outputs, or names a sender other than its key's address. The signature itself is checked
+        elsewhere. Returns the fee: what the inputs hold beyond the outputs.
+        """
+        inputs = transaction_inputs(transaction)
+        if not inputs:
+            raise ValueError("Transaction has no inputs; only a block's coinbase issues new coins.")
+        txid = txid or transaction_hash(transaction)
+        if len(set(inputs)) != len(inputs):
+            raise ValueError("Transaction spends the same UTXO twice.")
+        owner = address_of(transaction["public_key"])
+        if transaction["sender"] != owner:
+            raise ValueError("Sender is not the address of the transaction's public key.")
+        total_in = 0.0
+        with self._lock:
+            for outpoint in inputs:
+                entry = self.utxos.get(outpoint)
+                if entry is None:
+                    raise ValueError(f"UTXO {outpoint[0]}:{outpoint[1]} does not exist or is already spent.")
+                if not allow_reserved and self.reserved.get(outpoint, txid) != txid:
+                    raise ValueError(f"UTXO {outpoint[0]}:{outpoint[1]} is already spent by a pending transaction.")
+                if entry.address != owner:
+                    raise ValueError(f"UTXO {outpoint[0]}:{outpoint[1]} is not owned by the sender.")
+                total_in += entry.amount
+        total_out = _check_outputs(transaction)
+        if total_out > total_in + EPSILON:
+            raise ValueError("Transaction outputs exceed its inputs.")
+        return max(0.0, total_in - total_out)
+
+    def reserve(self, transaction: Dict[str, Any], txid: Optional[str] = None) -> float:
+        """Checks a pending transaction, marks its inputs as taken and returns its fee."""
+        txid = txid or transaction_hash(transaction)
+        with self._lock:
+            fee = self.check_transaction(transaction, txid)
+            for outpoint in transaction_inputs(transaction):
+                self.reserved[outpoint] = txid
+            return fee
+
+    def release(self, transaction: Dict[str, Any], txid: Optional[str] = None):
+        """Frees the inputs reserved by a pending transaction that was dropped."""
+        txid = txid or transaction_hash(transaction)
+        with self._lock:
+            for outpoint in transaction_inputs(transaction):
+                if self.reserved.get(outpoint) == txid:
+                    del self.reserved[outpoint]
+
+    def _create_outputs(self, transaction: Dict[str, Any], txid: str, undo: BlockUndo):
+        for outpoint, entry in transaction_outputs(transaction, txid):
+            if outpoint in self.utxos:
+                raise ValueError(f"UTXO {outpoint[0]}:{outpoint[1]} already exists.")
+            self._add(outpoint, entry)
+            undo.created.append(outpoint)
+
+    def _apply_transaction(self, transaction: Dict[str, Any], undo: BlockUndo) -> float:
+        """Applies a transaction that is not a coinbase; returns its fee."""
+        txid = transaction_hash(transaction)
+        fee = self.check_transaction(transaction, txid, allow_reserved=True)
+        for outpoint in transaction_inputs(transaction):
+            undo.spent.append((outpoint, self._remove(outpoint)))
+        self._create_outputs(transaction, txid, undo)
+        return fee
+
+    def apply_block(self, block) -> BlockUndo:
+        """
+        Spends and creates the outputs of every transaction in `block`, in order, starting with
+        its coinbase if it has one. If any transaction is invalid, or the coinbase issues more
+        than the reward plus fees, everything applied so far is rolled back and ValueError is
+        raised; a malformed transaction may raise another exception, after the same rollback.
+        """
+        undo = BlockUndo()
+        transactions = block.transactions
+        with self._lock:
+            try:
+                coinbase = transactions[0] if transactions and is_coinbase(transactions[0]) else None
+                fees = 0.0
+                for transaction in transactions[1:] if coinbase is not None else transactions:
+                    fees += self._apply_transaction(transaction, undo)
+                if coinbase is not None:
+                    if coinbase.get("height") != block.index:
+                        raise ValueError("Coinbase height does not match the block.")
+                    if _check_outputs(coinbase) > self.block_reward + fees + EPSILON:
+                        raise ValueError("Coinbase pays more than the block reward plus fees.")
+                    self._create_outputs(coinbase, transaction_hash(coinbase), undo)
+            except Exception:
+                # Also for malformed data, so a rejected block never leaves part of itself applied
+                self.rollback(undo)
+                raise
+            for outpoint, _ in undo.spent:
+                self.reserved.pop(outpoint, None)
+        return undo
+
+    def split_applicable(self, transactions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Splits pending transactions into those that can be applied in order on top of the
+        current set and those that no longer can (e.g. a received block spent their inputs).
+        The set itself is left unchanged.
+        """
+        valid, invalid = [], []
+        undo = BlockUndo()
+        with self._lock:
+            for transaction in transactions:
+                tx_undo = BlockUndo()
+                try:
+                    self._apply_transaction(transaction, tx_undo)
+                    valid.append(transaction)
+                except Exception:
+                    self.rollback(tx_undo)
+                    invalid.append(transaction)
+                    continue
+                undo.spent.extend(tx_undo.spent)
+                undo.created.extend(tx_undo.created)
+            self.rollback(undo)
+        return valid, invalid
+
+    def rollback(self, undo: BlockUndo):
+        """Reverts the changes recorded by apply_block."""
+        with self._lock:
+            # Spent outputs first: one created and spent within the block is then removed as created
+            for outpoint, entry in reversed(undo.spent):
+                self._add(outpoint, entry)
+            for outpoint in reversed(undo.created):
+                self._remove(outpoint)
+
+    def entries(self) -> List[Tuple[OutPoint, float, str]]:
+        """Every unspent output as (outpoint, amount, address), e.g. for a snapshot."""
+        with self._lock:
+            return [(outpoint, entry.amount, entry.address) for outpoint, entry in self.utxos.items()]
+
+    def load(self, entries: Iterable[Tuple[OutPoint, float, str]]):
+        """Adds unspent outputs saved by entries(), e.g. from a snapshot."""
+        with self._lock:
+            for outpoint, amount, address in entries:
+                self._add(outpoint, UTXOEntry(amount, address))
+
+    def balance(self, address: str) -> float:
+        with self._lock:
+            return self.balances.get(address, 0.0)
+
+    def utxos_for(self, address: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"txid": txid, "index": index, "amount": self.utxos[(txid, index)].amount}
+                for txid, index in sorted(self.by_address.get(address, ()))
+            ]
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from blockchain import Block
+from difficulty import DifficultyAdjuster, check_timestamp
+from merkle import merkle_root
+from utxo import is_coinbase
+from verification import SignatureVerifier
+
+
+def check_block_range(blocks: List[Block], previous_hash: Optional[str]) -> Optional[Tuple[int, str]]:
+    """
+    Checks linkage, Merkle roots, hashes and proof-of-work against each block's own target for
+    consecutive blocks; whether those targets are the right ones is checked separately.
+    `previous_hash` is the hash of the block before the first one (None for the genesis block).
+    Returns (height, reason) for the first bad block, or None.
+    """
+    for block in blocks:
+        if previous_hash is not None and block.previous_hash != previous_hash:
+            return block.index, "previous hash does not match"
+        if block.merkle_root != merkle_root(block.transaction_hashes()):
+            return block.index, "Merkle root does not match transactions"
+        if block.hash != block.calculate_hash():
+            return block.index, "hash does not match header"
+        if previous_hash is not None and not block.meets_target():
+            return block.index, "insufficient proof-of-work"
+        previous_hash = block.hash
+    return None
+
+
+class ChainVerifier:
+    """
+    Validates a whole chain: hashes, linkage and proof-of-work in parallel across worker
+    processes, each block's target against the retargeting rules, then every transaction
+    signature in batches.
+
+    After a successful run the tip is recorded as a trusted checkpoint in `checkpoint_path`
+    (if given), so the next run only checks blocks above it. A checkpoint whose hash no longer
+    matches the chain is ignored.
+    """
+
+    def __init__(self, difficulty: DifficultyAdjuster, verifier: Optional[SignatureVerifier] = None,
+                 checkpoint_path: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_size: int = 2000, signature_batch_size: int = 5000):
+        self.difficulty = difficulty
+        self.verifier = verifier or SignatureVerifier()
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.signature_batch_size = signature_batch_size
+        self.checkpoints: List[Dict[str, Any]] = self._load_checkpoints()
+
+    def _load_checkpoints(self) -> List[Dict[str, Any]]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return []
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def add_checkpoint(self, height: int, block_hash: str):
+        self.checkpoints = [cp for cp in self.checkpoints if cp["height"] < height]
+        self.checkpoints.append({"height": height, "hash": block_hash})
+        if self.checkpoint_path:
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.checkpoints, f)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def trusted_height(self, chain) -> int:
+        """Height of the highest checkpoint that still matches `chain`, or -1."""
+        for checkpoint in reversed(self.checkpoints):
+            height = checkpoint["height"]
+            if height < len(chain) and chain[height].hash == checkpoint["hash"]:
+                return height
+        return -1
+
+    def verify(self, chain, check_signatures: bool = True, record_checkpoint: bool = True) -> Dict[str, Any]:
+        """Verifies every block above the last matching checkpoint and returns a report."""
+        started = time.perf_counter()
+        start = self.trusted_height(chain) + 1
+        end = len(chain)
+        error = self._check_headers(chain, start, end)
+        # Only targets below the first bad header matter; a bad target there is the earlier error
+        error = self._check_targets(chain, start, end if error is None else error[0]) or error
+        if error is None and check_signatures:
+            error = self._check_signatures(chain, start, end)
+
+        if error is None and record_checkpoint and end > start:
+            self.add_checkpoint(end - 1, chain[end - 1].hash)
+        elapsed = time.perf_counter() - started
+        return {
+            "valid": error is None,
+            "from_height": start,
+            "to_height": end - 1,
+            "blocks": end - start,
+            "elapsed": elapsed,
+            "blocks_per_sec": (end - start) / elapsed if elapsed else 0.0,
+            "error": None if error is None else {"height": error[0], "reason": error[1]},
+        }
+
+    def _check_headers(self, chain, start: int, end: int) -> Optional[Tuple[int, str]]:
+        jobs = []
+        for lo in range(start, end, self.chunk_size):
+            hi = min(end, lo + self.chunk_size)
+            previous_hash = chain[lo - 1].hash if lo > 0 else None
+            jobs.append((chain[lo:hi], previous_hash))
+        if not jobs:
+            return None
+
+        if self.workers == 1 or len(jobs) == 1:
+            results = (check_block_range(*job) for job in jobs)
+            return next((result for result in results if result is not None), None)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for result in pool.map(check_block_range, *zip(*jobs)):
+                if result is not None:
+                    return result  # Chunks come back in order, so this is the lowest bad height
+        return None
+
+    def _check_targets(self, chain, start: int, end: int) -> Optional[Tuple[int, str]]:
+        """Checks each block's target and timestamp against the blocks before it."""
+        now = time.time()
+        for height in range(max(start, 1), end):
+            if int(chain[height].target, 16) != self.difficulty.target_for(height, chain.__getitem__):
+                return height, "unexpected proof-of-work target"
+            reason = check_timestamp(chain[height].timestamp, height, chain.__getitem__, now)
+            if reason is not None:
+                return height, reason
+        return None
+
+    def _check_signatures(self, chain, start: int, end: int) -> Optional[Tuple[int, str]]:
+        batch: List[Dict[str, Any]] = []
+        heights: List[int] = []
+
+        def flush() -> Optional[Tuple[int, str]]:
+            results = self.verifier.verify_batch(batch, workers=self.workers, use_processes=self.workers > 1)
+            for height, valid in zip(heights, results):
+                if not valid:
+                    return height, "invalid transaction signature"
+            batch.clear()
+            heights.clear()
+            return None
+
+        for height in range(start, end):
+            for transaction in chain[height].transactions:
+                if is_coinbase(transaction):
+                    continue  # Unsigned; UTXOSet.apply_block checks what it pays
+                batch.append(transaction)
+                heights.append(height)
+            if len(batch) >= self.signature_batch_size:
+                error = flush()
+                if error is not None:
+                    return error
+        return flush() if batch else None
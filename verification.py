@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from hashlib import sha256
+from typing import List, Dict, Any, Optional
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.exceptions import InvalidSignature
+
+from merkle import serialize_transaction, transaction_hash
+
+
+def _signed_utxo(utxo: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {"txid": utxo["txid"], "index": int(utxo["index"]), "amount": float(utxo["amount"])}
+    if utxo.get("address") is not None:
+        fields["address"] = utxo["address"]
+    return fields
+
+
+def address_of(public_key_pem: str) -> str:
+    """
+    The address a key owns: the first 32 hex digits of the SHA-256 of its PEM. Outputs paid to it
+    can only be spent by transactions carrying that key and signed with it.
+    """
+    return sha256(public_key_pem.encode()).hexdigest()[:32]
+
+
+def signing_payload(transaction: Dict[str, Any]) -> bytes:
+    """
+    The bytes a sender signs: the canonical serialization (see merkle.serialize_transaction) of
+    every field but the signature, so no part of a signed transaction can be altered. Amounts
+    are floats and an output without an address omits it, matching what the API stores.
+    """
+    return serialize_transaction({
+        "sender": transaction["sender"],
+        "receiver": transaction["receiver"],
+        "amount": float(transaction["amount"]),
+        "public_key": transaction["public_key"],
+        "input_utxos": [_signed_utxo(utxo) for utxo in transaction.get("input_utxos") or []],
+        "output_utxos": [_signed_utxo(utxo) for utxo in transaction.get("output_utxos") or []],
+    })
+
+
+class LRUCache:
+    """A small thread-safe LRU map."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SignatureVerifier:
+    """
+    Verifies transaction signatures, caching parsed public keys (by PEM digest) and
+    verification results (by transaction hash) so no transaction is verified twice.
+    """
+
+    def __init__(self, key_cache_size: int = 4096, result_cache_size: int = 100_000):
+        self.keys = LRUCache(key_cache_size)
+        self.results = LRUCache(result_cache_size)
+
+    def load_public_key(self, public_key_pem: str):
+        """Parses (or reuses) an EC public key; raises ValueError for anything else, e.g. an RSA or Ed25519 key."""
+        digest = sha256(public_key_pem.encode()).digest()
+        key = self.keys.get(digest)
+        if key is None:
+            key = serialization.load_pem_public_key(public_key_pem.encode())
+            if not isinstance(key, ec.EllipticCurvePublicKey):
+                raise ValueError("Public key is not an EC key.")
+            self.keys.put(digest, key)
+        return key
+
+    def verify(self, transaction: Dict[str, Any], txid: Optional[str] = None) -> bool:
+        """Returns whether the signature is valid; raises ValueError for malformed keys or signatures."""
+        txid = txid or transaction_hash(transaction)
+        cached = self.results.get(txid)
+        if cached is not None:
+            return cached
+        public_key = self.load_public_key(transaction["public_key"])
+        try:
+            public_key.verify(bytes.fromhex(transaction["signature"]), signing_payload(transaction),
+                              ec.ECDSA(hashes.SHA256()))
+            valid = True
+        except InvalidSignature:
+            valid = False
+        self.results.put(txid, valid)
+        return valid
+
+    @staticmethod
+    def _txid_or_none(transaction: Dict[str, Any]) -> Optional[str]:
+        try:
+            return transaction_hash(transaction)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def _verify_or_false(self, transaction: Dict[str, Any]) -> bool:
+        try:
+            return self.verify(transaction)
+        except (ValueError, KeyError, TypeError):
+            return False
+
+    def verify_batch(self, transactions: List[Dict[str, Any]], workers: Optional[int] = None,
+                     use_processes: bool = False) -> List[bool]:
+        """
+        Verifies many transactions at once and returns one result per transaction, in order.
+        Malformed transactions count as invalid instead of raising. Cached results are answered
+        directly; the rest are spread over a thread pool, or a process pool with `use_processes`.
+        """
+        txids = [self._txid_or_none(tx) for tx in transactions]
+        # A transaction that cannot even be hashed (e.g. not a dict) is malformed
+        results: List[Optional[bool]] = [False if txid is None else self.results.get(txid) for txid in txids]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        todo = [transactions[i] for i in pending]
+        if use_processes:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                verified = list(pool.map(_verify_in_process, todo, chunksize=max(1, len(todo) // 64)))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                verified = list(pool.map(self._verify_or_false, todo))
+
+        for i, valid in zip(pending, verified):
+            results[i] = valid
+            self.results.put(txids[i], valid)
+        return results
+
+
+# Each worker process keeps its own key cache across batch chunks
+_process_verifier: Optional[SignatureVerifier] = None
+
+
+def _verify_in_process(transaction: Dict[str, Any]) -> bool:
+    global _process_verifier
+    if _process_verifier is None:
+        _process_verifier = SignatureVerifier(result_cache_size=1)
+    return _process_verifier._verify_or_false(transaction)
@@ -0,0 +1,124 @@
+import os
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from key_signature_generator import Wallet
+from merkle import transaction_hash
+
+# Local signing service for the client: holds private keys and signs transactions with them.
+# It must only be reachable from this machine; run it with
+#   uvicorn wallet_api:app --host 127.0.0.1 --port 8100
+app = FastAPI()
+# Keys are kept in this file, readable only by its owner
+wallet = Wallet(os.environ.get("BLOCKCHAIN_WALLET_PATH", "wallet.json"))
+
+MAX_KEYS_PER_REQUEST = 10_000
+MAX_SIGN_BATCH = 10_000
+# Peer addresses of loopback connections; tests connect as one of them explicitly
+LOCAL_CLIENTS = {"127.0.0.1", "::1"}
+
+
+class UTXO(BaseModel):
+    txid: str
+    index: int
+    amount: float
+    address: Optional[str] = None
+
+class UnsignedTransaction(BaseModel):
+    sender: str
+    receiver: str
+    amount: float
+    input_utxos: List[UTXO]
+    output_utxos: List[UTXO]
+
+class KeyRequest(BaseModel):
+    count: int = 1
+
+class ImportRequest(BaseModel):
+    private_key: str
+
+class SignRequest(BaseModel):
+    key_id: str
+    transaction: UnsignedTransaction
+
+class SignBatchRequest(BaseModel):
+    # One key for every transaction, or one key id per transaction
+    key_id: Optional[str] = None
+    key_ids: Optional[List[str]] = None
+    transactions: List[UnsignedTransaction]
+
+
+@app.middleware("http")
+async def local_only(request: Request, call_next):
+    """Refuses anyone but this machine, even if the server was bound to a public address."""
+    if request.client is None or request.client.host not in LOCAL_CLIENTS:
+        return JSONResponse({"detail": "The wallet only accepts local connections."}, status_code=403)
+    return await call_next(request)
+
+
+def key_info(key_id: str):
+    return {"key_id": key_id, "public_key": wallet.public_key(key_id)}
+
+
+def unsigned_dict(transaction: UnsignedTransaction):
+    # The same shape the node stores (UTXOs keep "address": None), so /sign's txid matches the node's;
+    # the signature does not depend on it, as verification.signing_payload omits empty addresses
+    return transaction.dict()
+
+
+@app.get("/keys")
+def list_keys():
+    return {"keys": [key_info(key_id) for key_id in wallet.key_ids()]}
+
+
+@app.post("/keys")
+def generate_keys(request: KeyRequest):
+    """Generates `count` key pairs, in parallel for large counts."""
+    if not 1 <= request.count <= MAX_KEYS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Count must be between 1 and {MAX_KEYS_PER_REQUEST}.")
+    return {"keys": [key_info(key_id) for key_id in wallet.generate(request.count)]}
+
+
+@app.post("/keys/import")
+def import_key(request: ImportRequest):
+    try:
+        return key_info(wallet.add(request.private_key))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid private key: {e}")
+
+
+@app.get("/keys/{key_id}")
+def get_key(key_id: str):
+    if key_id not in wallet:
+        raise HTTPException(status_code=404, detail="Key not found.")
+    return key_info(key_id)
+
+
+@app.post("/sign")
+def sign(request: SignRequest):
+    """Returns the transaction with `public_key` and `signature` filled in, ready for /new_transaction."""
+    if request.key_id not in wallet:
+        raise HTTPException(status_code=404, detail="Key not found.")
+    signed = wallet.sign(request.key_id, unsigned_dict(request.transaction))
+    return {"txid": transaction_hash(signed), "transaction": signed}
+
+
+@app.post("/sign_batch")
+def sign_batch(request: SignBatchRequest):
+    """Signs many transactions (in parallel for large batches), e.g. for POST /new_transactions."""
+    if len(request.transactions) > MAX_SIGN_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SIGN_BATCH} transactions per request.")
+    key_ids = request.key_ids if request.key_ids is not None else request.key_id
+    if key_ids is None:
+        raise HTTPException(status_code=400, detail="Give key_id or key_ids.")
+    missing = [key_id for key_id in ([key_ids] if isinstance(key_ids, str) else key_ids) if key_id not in wallet]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Key not found: {missing[0]}")
+    try:
+        signed = wallet.sign_many(key_ids, [unsigned_dict(tx) for tx in request.transactions])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"transactions": signed}